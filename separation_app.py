@@ -2,6 +2,7 @@ import os
 import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox
+import tkinter.font
 import customtkinter as ctk
 import platform
 import subprocess
@@ -9,19 +10,25 @@ import threading
 import queue
 import json 
 from pkg_resources import resource_filename
-<<<<<<< HEAD
-import museval 
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
 # Separation classes in separators directory
-import separators.spleeter_separator as spleeter
-import separators.demucs_separator as demucs
-import separators.openunmix_separator as openunmix
+# Backends are imported and built lazily by the registry
+import separators.registry as registry
+import separators.job_queue as job_queue
+import separators.model_registry as model_registry
+import separators.decode_cache as decode_cache
+import separators.result_cache as result_cache
+import separators.catalog as catalog
+import separators.dir_scanner as dir_scanner
+import separators.pipeline as pipeline
+import separators.evaluation as evaluation
+import separators.events as events
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+OUTPUT_PAGE_SIZE = 200  # Outputs listed per page in each Output tab list
+
 def open_file(path):
     if platform.system() == "Windows":
         os.startfile(path)
@@ -31,52 +38,212 @@ def open_file(path):
         subprocess.call(("xdg-open", path))
 
 class ProgressWindow(ctk.CTkToplevel):
-    def __init__(self, parent, title="Processing..."):
+    def __init__(self, parent, job_queue, title="Processing..."):
         super().__init__(parent)
         self.title(title)
-        self.geometry("400x150")
-        self.transient(parent)
-        self.grab_set()  # Modal
+        self.geometry("500x400")
+        self.transient(parent)  # Not modal, so more songs can be queued while it runs
         self.canceled = False
+        self.job_queue = job_queue
 
         # Center on parent
         self.geometry("+%d+%d" % (parent.winfo_rootx() + 50, parent.winfo_rooty() + 50))
 
         label = ctk.CTkLabel(self, text="Separation in progress...", font=ctk.CTkFont(size=14))
-        label.pack(pady=20)
+        label.pack(pady=(20, 10))
 
-        self.progress = ctk.CTkProgressBar(self, mode="indeterminate")
+        self.progress = ctk.CTkProgressBar(self, mode="determinate")
         self.progress.pack(pady=10, padx=20, fill="x")
-        self.progress.start()  # Indeterminate animation
+        self.progress.set(0)
 
         status_label = ctk.CTkLabel(self, text="Loading model...", font=ctk.CTkFont(size=12))
         status_label.pack(pady=5)
 
+        # Per-job states
+        self.jobs_listbox = tk.Listbox(self, height=10)
+        self.jobs_listbox.pack(pady=5, padx=20, fill="both", expand=True)
+
         btn_frame = ctk.CTkFrame(self)
         btn_frame.pack(pady=10, fill="x", padx=20)
 
-        cancel_btn = ctk.CTkButton(btn_frame, text="Cancel", command=self.cancel)
+        self.throughput_label = ctk.CTkLabel(btn_frame, text="Throughput: - songs/h", anchor="w")
+        self.throughput_label.pack(side="left", padx=10)
+
+        # Latest message and time spent per stage, from the event stream
+        self.activity_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=11), anchor="w")
+        self.activity_label.pack(padx=20, fill="x", before=btn_frame)
+        self.timings_label = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=11), anchor="w")
+        self.timings_label.pack(padx=20, fill="x", before=btn_frame)
+        self.events = events.get_stream().subscribe(events.Recorder())
+        self.timings = events.get_stream().subscribe(events.SpanTotals())
+        self.tracker = events.get_stream().subscribe(events.ProgressTracker())
+        self.bind("<Destroy>", self.on_destroy)
+
+        cancel_btn = ctk.CTkButton(btn_frame, text="Cancel", command=self.cancel, width=100)
         cancel_btn.pack(side="right", padx=10)
 
+        clear_btn = ctk.CTkButton(btn_frame, text="Clear Finished", command=self.clear_finished, width=100)
+        clear_btn.pack(side="right", padx=10)
+
         self.status_label = status_label
         self.parent = parent
 
     def update_status(self, message):
         self.status_label.configure(text=message)
 
+    def refresh(self):
+        """Redraw job states, overall progress and throughput from the job queue."""
+        jobs = self.job_queue.jobs()
+        counts = self.job_queue.counts()
+        finished = counts[job_queue.DONE] + counts[job_queue.FAILED] + counts[job_queue.CANCELED]
+        # Running jobs count with the fraction of their separation reported from inside inference
+        running = 0.0
+        rows = []
+        for job in jobs:
+            row = job.describe()
+            status = self.tracker.status(job.id) if job.state == job_queue.RUNNING else None
+            if status is not None and status[0] == job.stage:
+                _, fraction, eta = status
+                row += f" {fraction:.0%}" + (f", {events.format_eta(eta)} left" if eta is not None else "")
+                if job.stage == pipeline.SEPARATE:
+                    running += fraction
+            if job.state == job_queue.RUNNING and job.stage in (pipeline.ENCODE, pipeline.TRANSCRIBE):
+                running += 1.0
+            rows.append(row)
+        self.progress.set(min(1.0, (finished + running) / len(jobs)) if jobs else 0)
+        self.update_status(f"{finished}/{len(jobs)} finished, {counts[job_queue.RUNNING]} running, "
+                           f"{counts[job_queue.FAILED]} failed")
+        self.throughput_label.configure(text=f"Throughput: {self.job_queue.throughput():.1f} songs/h")
+        messages = [event for event in self.events.drain() if event["event"] == "log"]
+        if messages:
+            self.activity_label.configure(text=f"{messages[-1]['source']}: {messages[-1]['message']}"[:100])
+        self.timings_label.configure(text="  ".join(f"{name} {seconds:.1f}s"
+                                                    for name, seconds in self.timings.totals().items()))
+        if list(self.jobs_listbox.get(0, tk.END)) != rows:
+            view = self.jobs_listbox.yview()[0]
+            self.jobs_listbox.delete(0, tk.END)
+            for row in rows:
+                self.jobs_listbox.insert(tk.END, row)
+            self.jobs_listbox.yview_moveto(view)
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            events.get_stream().unsubscribe(self.events)
+            events.get_stream().unsubscribe(self.timings)
+            events.get_stream().unsubscribe(self.tracker)
+
+    def clear_finished(self):
+        self.job_queue.clear_finished()
+        self.refresh()
+
     def cancel(self):
         self.canceled = True
+        canceled = self.job_queue.cancel_pending()
+        # Running songs stop at their next checkpoint (window, shift or segment) and remove their temp files
+        stopped = self.job_queue.cancel_running()
         self.destroy()
-        messagebox.showinfo("Canceled", "Separation canceled.")
+        messagebox.showinfo("Canceled", f"Separation canceled ({canceled} queued songs removed, "
+                                        f"{stopped} running songs stopped).")
 
     def close(self, success=True):
-        self.progress.stop()
         if success:
             self.destroy()
         else:
             self.status_label.configure(text="Error occurred. Check console.")
             # Auto-close after 3s or manual
 
+class VirtualListbox(tk.Frame):
+    def __init__(self, parent, **kwargs):
+        """
+        Listbox that only holds the rows currently in view, so folders with 50k+ entries stay responsive.
+
+        Rows are kept in `items` (display strings); selection is tracked by item index and supports
+        click, Ctrl+click and Shift+click like tk.EXTENDED.
+        """
+        super().__init__(parent)
+        self.items = []
+        self.first = 0  # Index of the item in the top row
+        self.selected = set()
+        self.anchor = None
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.listbox = tk.Listbox(self, selectmode=tk.MULTIPLE, exportselection=False, activestyle="none", **kwargs)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.listbox.bind("<Configure>", lambda e: self.refresh())
+        self.listbox.bind("<Button-1>", lambda e: self._click(e, "set"))
+        self.listbox.bind("<Control-Button-1>", lambda e: self._click(e, "toggle"))
+        self.listbox.bind("<Shift-Button-1>", lambda e: self._click(e, "range"))
+        self.listbox.bind("<B1-Motion>", lambda e: "break")
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(1))
+
+    def bind_double_click(self, callback):
+        self.listbox.bind("<Double-Button-1>", callback)
+
+    def visible_rows(self):
+        height = self.listbox.winfo_height()
+        line = max(1, tk.font.Font(font=self.listbox.cget("font")).metrics("linespace") + 1)
+        return max(1, height // line)
+
+    def set_items(self, items):
+        self.items = list(items)
+        self.first = 0
+        self.selected.clear()
+        self.anchor = None
+        self.refresh()
+
+    def append(self, items):
+        self.items.extend(items)
+        self.refresh()
+
+    def refresh(self):
+        rows = self.visible_rows()
+        self.first = max(0, min(self.first, len(self.items) - rows))
+        self.listbox.delete(0, tk.END)
+        view = self.items[self.first:self.first + rows]
+        if view:
+            self.listbox.insert(tk.END, *view)
+        for row in range(len(view)):
+            if self.first + row in self.selected:
+                self.listbox.selection_set(row)
+        total = max(1, len(self.items))
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + rows) / total))
+
+    def yview(self, *args):
+        rows = self.visible_rows()
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * len(self.items))
+        elif args[0] == "scroll":
+            self.first += int(args[1]) * (rows if args[2] == "pages" else 1)
+        self.refresh()
+
+    def scroll(self, units):
+        self.yview("scroll", units * 3, "units")
+        return "break"
+
+    def _click(self, event, mode):
+        index = self.first + self.listbox.nearest(event.y)
+        if index >= len(self.items):
+            return "break"
+        if mode == "toggle":
+            self.selected.symmetric_difference_update({index})
+            self.anchor = index
+        elif mode == "range" and self.anchor is not None:
+            low, high = sorted((self.anchor, index))
+            self.selected = set(range(low, high + 1))
+        else:
+            self.selected = {index}
+            self.anchor = index
+        self.refresh()
+        return "break"
+
+    def curselection(self):
+        """Selected item indices, like tk.Listbox.curselection()."""
+        return tuple(sorted(self.selected))
+
 class SeparationApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -93,15 +260,40 @@ class SeparationApp(ctk.CTk):
         for folder in self.output_folders.values():
             os.makedirs(folder, exist_ok=True)
         
-        # Instantiate separator objects
-        self.spleeter_sep = spleeter.SpleeterSeparator()
-        self.demucs_sep = demucs.DemucsSeparator()
-        self.openunmix_sep = openunmix.OpenUnmixSeparator()
+        # Transcription models are shared by all tools and evicted when over the RAM budget
+        model_registry.get_registry().set_budget(self.transcription_ram_budget_mb)
+        # Decoded input audio is kept on disk and reused by every tool
+        decode_cache.get_cache().set_max_mb(self.decode_cache_mb)
+        # Repeated jobs (same song, tool, model and shifts) reuse earlier stems
+        result_cache.get_cache().set_max_mb(self.result_cache_mb)
+        # Optional JSON lines log of every message and timed stage
+        if self.event_log:
+            events.get_stream().subscribe(events.JsonlWriter(self.event_log))
+
+        # Separator backends are built the first time they are selected or used
+        self.separator_registry = registry.SeparatorRegistry()
+
+        # Index of produced outputs; finished jobs are added to it instead of rescanning the folders
+        self.catalog = catalog.OutputCatalog()
+        self.catalog_dirty = False
+        self.output_page = 0
+
+        # Songs move through decode, separate, encode and transcribe stages that run side by side;
+        # max_workers songs are separated at a time
+        self.pipeline = pipeline.StagedPipeline(separate_workers=self.max_workers)
+        # Batch queue; its workers feed the pipeline in submit order until every stage is busy
+        self.job_queue = job_queue.JobQueue(self.run_job, max_workers=self.pipeline.capacity,
+                                            on_job_done=self.catalog_job, defer_start=True)
+        self.progress_window = None
+        self.finished_seen = 0
 
         # Data lists
         self.songs = []
         self.folders = []
         self.all_items = []  # Tracks all listbox items (folders and songs)
+        # Input folders are listed in the background and cached until they change
+        self.dir_scanner = dir_scanner.DirectoryScanner()
+        self.input_scan_token = None
         self.vocals = []
         self.instrumentals = []
         self.transcriptions = []
@@ -135,7 +327,6 @@ class SeparationApp(ctk.CTk):
         )
         output_button.grid(row=1, column=0, padx=20, pady=10, sticky="ew")
 
-<<<<<<< HEAD
         self.evaluation_button = ctk.CTkButton(
             self.sidebar, 
             text="Evaluation", 
@@ -145,27 +336,17 @@ class SeparationApp(ctk.CTk):
         self.evaluation_button.grid(row=2, column=0, padx=20, pady=10, sticky="ew")
         self.evaluation_button.grid_remove()  # Hide initially
 
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         settings_button = ctk.CTkButton(
             self.sidebar, 
             text="Settings", 
             command=self.show_settings,
             width=180
         )
-<<<<<<< HEAD
         settings_button.grid(row=4, column=0, padx=20, pady=10, sticky="ew")
 
         # Appearance mode selection (bottom-aligned)
         appearance_mode_label = ctk.CTkLabel(self.sidebar, text="Appearance Mode:", anchor="w")
         appearance_mode_label.grid(row=5, column=0, padx=20, pady=(20, 0), sticky="w")
-=======
-        settings_button.grid(row=2, column=0, padx=20, pady=10, sticky="ew")
-
-        # Appearance mode selection (bottom-aligned)
-        appearance_mode_label = ctk.CTkLabel(self.sidebar, text="Appearance Mode:", anchor="w")
-        appearance_mode_label.grid(row=4, column=0, padx=20, pady=(20, 0), sticky="w")
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
         appearance_mode_optionemenu = ctk.CTkOptionMenu(
             self.sidebar, 
@@ -173,20 +354,12 @@ class SeparationApp(ctk.CTk):
             command=self.change_appearance_mode_event,
             width=160
         )
-<<<<<<< HEAD
         appearance_mode_optionemenu.grid(row=6, column=0, padx=20, pady=(10, 10), sticky="ew")
-=======
-        appearance_mode_optionemenu.grid(row=5, column=0, padx=20, pady=(10, 10), sticky="ew")
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         appearance_mode_optionemenu.set("Dark")
 
         # UI Scaling (Zoom) selection (bottom-aligned)
         scaling_label = ctk.CTkLabel(self.sidebar, text="UI Scaling:", anchor="w")
-<<<<<<< HEAD
         scaling_label.grid(row=7, column=0, padx=20, pady=(10, 0), sticky="w")
-=======
-        scaling_label.grid(row=6, column=0, padx=20, pady=(10, 0), sticky="w")
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
         scaling_optionemenu = ctk.CTkOptionMenu(
             self.sidebar, 
@@ -194,11 +367,7 @@ class SeparationApp(ctk.CTk):
             command=self.change_scaling_event,
             width=160
         )
-<<<<<<< HEAD
         scaling_optionemenu.grid(row=8, column=0, padx=20, pady=(10, 20), sticky="ew")
-=======
-        scaling_optionemenu.grid(row=7, column=0, padx=20, pady=(10, 20), sticky="ew")
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         scaling_optionemenu.set("100%")
 
         # Content frame
@@ -213,34 +382,31 @@ class SeparationApp(ctk.CTk):
         self.input_frame = ctk.CTkFrame(self.content_frame)
         self.output_frame = ctk.CTkFrame(self.content_frame)
         self.settings_frame = ctk.CTkFrame(self.content_frame)
-<<<<<<< HEAD
         self.evaluation_frame = ctk.CTkFrame(self.content_frame) 
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
         # Create tab contents
         self.create_input_tab()
         self.create_output_tab()
         self.create_settings_tab() 
-<<<<<<< HEAD
         self.create_evaluation_tab()
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
         # Initially show input
         self.show_input()
 
         # Load initial songs and outputs
         self.load_input()
-        self.load_outputs()
+        self.sync_outputs()
 
         # Buttons in input tab
         self.input_button = input_button
         self.output_button = output_button
-<<<<<<< HEAD
         self.toggle_evaluation()
         self.settings_button = settings_button
 
+        # Watch the job queue from the Tk thread
+        self.after(500, self.poll_queue)
+        self.after(60000, self.unload_idle_backends)
+
     def load_settings(self):
         defaults = {
             "input_folder": "input",
@@ -248,6 +414,13 @@ class SeparationApp(ctk.CTk):
             "instrumentals_folder": "output/instrumentals",
             "transcriptions_folder": "output/text",
             "enable_evaluation": False,
+            "max_workers": 1,
+            "unload_idle_minutes": 15,
+            "job_timeout_minutes": 0,
+            "transcription_ram_budget_mb": 4096,
+            "decode_cache_mb": 2048,
+            "result_cache_mb": 4096,
+            "event_log": "",
             "separator_models": {
                 "Spleeter": [],
                 "Demucs": ["mdx", "mdx_extra", "htdemucs"],
@@ -258,17 +431,6 @@ class SeparationApp(ctk.CTk):
                 "wav2vec2": ["facebook/wav2vec2-base-960h", "facebook/wav2vec2-large-960h"],
                 "coqui": ["model.pbmm"]
             }
-=======
-        self.settings_button = settings_button
-
-    def load_settings(self):
-        """Load default folders from settings.json, with fallbacks."""
-        defaults = {
-            "input_folder": "/input",
-            "vocals_folder": "output/vocals",
-            "instrumentals_folder": "output/instrumentals",
-            "transcriptions_folder": "output/text"
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         }
         if os.path.exists(self.settings_file):
             try:
@@ -280,8 +442,14 @@ class SeparationApp(ctk.CTk):
                     "instrumentals": data.get("instrumentals_folder", defaults["instrumentals_folder"]),
                     "transcriptions": data.get("transcriptions_folder", defaults["transcriptions_folder"])
                 }
-<<<<<<< HEAD
                 self.enable_evaluation = data.get("enable_evaluation", defaults["enable_evaluation"])
+                self.max_workers = data.get("max_workers", defaults["max_workers"])
+                self.unload_idle_minutes = data.get("unload_idle_minutes", defaults["unload_idle_minutes"])
+                self.job_timeout_minutes = data.get("job_timeout_minutes", defaults["job_timeout_minutes"])
+                self.transcription_ram_budget_mb = data.get("transcription_ram_budget_mb", defaults["transcription_ram_budget_mb"])
+                self.decode_cache_mb = data.get("decode_cache_mb", defaults["decode_cache_mb"])
+                self.result_cache_mb = data.get("result_cache_mb", defaults["result_cache_mb"])
+                self.event_log = data.get("event_log", defaults["event_log"])
                 self.separator_models = data.get("separator_models", defaults["separator_models"])
                 self.transcription_models = data.get("transcription_models", defaults["transcription_models"])
             except (json.JSONDecodeError, KeyError):
@@ -298,47 +466,40 @@ class SeparationApp(ctk.CTk):
             "transcriptions": defaults["transcriptions_folder"]
         }
         self.enable_evaluation = defaults["enable_evaluation"]
+        self.max_workers = defaults["max_workers"]
+        self.unload_idle_minutes = defaults["unload_idle_minutes"]
+        self.job_timeout_minutes = defaults["job_timeout_minutes"]
+        self.transcription_ram_budget_mb = defaults["transcription_ram_budget_mb"]
+        self.decode_cache_mb = defaults["decode_cache_mb"]
+        self.result_cache_mb = defaults["result_cache_mb"]
+        self.event_log = defaults["event_log"]
         self.separator_models = defaults["separator_models"]
         self.transcription_models = defaults["transcription_models"]
         self.save_settings()
         
     def save_settings(self):
         """Save current folders, models, and settings to settings.json."""
-=======
-            except (json.JSONDecodeError, KeyError):
-                print("Warning: Invalid settings.json, using defaults.")
-                self.input_folder = defaults["input_folder"]
-                self.output_folders = {k: v for k, v in defaults.items() if k != "input_folder"}
-        else:
-            self.input_folder = defaults["input_folder"]
-            self.output_folders = {k: v for k, v in defaults.items() if k != "input_folder"}
-        # Save defaults if file doesn't exist
-        self.save_settings()
-    
-    def save_settings(self):
-        """Save current folders to settings.json."""
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         data = {
             "input_folder": self.input_folder,
             "vocals_folder": self.output_folders["vocals"],
             "instrumentals_folder": self.output_folders["instrumentals"],
-<<<<<<< HEAD
             "transcriptions_folder": self.output_folders["transcriptions"],
             "enable_evaluation": self.enable_evaluation,
+            "max_workers": self.max_workers,
+            "unload_idle_minutes": self.unload_idle_minutes,
+            "job_timeout_minutes": self.job_timeout_minutes,
+            "transcription_ram_budget_mb": self.transcription_ram_budget_mb,
+            "decode_cache_mb": self.decode_cache_mb,
+            "result_cache_mb": self.result_cache_mb,
+            "event_log": self.event_log,
             "separator_models": self.separator_models,
             "transcription_models": self.transcription_models
-=======
-            "transcriptions_folder": self.output_folders["transcriptions"]
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         }
         try:
             with open(self.settings_file, "w") as f:
                 json.dump(data, f, indent=4)
-<<<<<<< HEAD
             self.toggle_evaluation()
             print(f"Settings saved to {self.settings_file}")
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         except Exception as e:
             print(f"Error saving settings: {e}")
 
@@ -346,23 +507,16 @@ class SeparationApp(ctk.CTk):
         self.input_frame.grid(row=0, column=0, sticky="nsew")
         self.output_frame.grid_forget()
         self.settings_frame.grid_forget()
-<<<<<<< HEAD
         self.evaluation_frame.grid_forget()
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
     def show_output(self):
         self.output_frame.grid(row=0, column=0, sticky="nsew")
         self.input_frame.grid_forget()
-<<<<<<< HEAD
         self.evaluation_frame.grid_forget()
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         self.settings_frame.grid_forget()
         # Highlight active button
         self.output_button.configure(fg_color=("#DCE4EE", "#1f538d"))
         self.input_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
-<<<<<<< HEAD
         self.evaluation_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
         self.settings_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
 
@@ -377,26 +531,16 @@ class SeparationApp(ctk.CTk):
         self.output_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
         self.settings_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
 
-=======
-        self.settings_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
-    
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
     def show_settings(self):
         self.settings_frame.grid(row=0, column=0, sticky="nsew")
         self.input_frame.grid_forget()
         self.output_frame.grid_forget()
-<<<<<<< HEAD
         self.evaluation_frame.grid_forget()
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         # Highlight active button
         self.settings_button.configure(fg_color=("#DCE4EE", "#1f538d"))
         self.input_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
         self.output_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
-<<<<<<< HEAD
         self.evaluation_button.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
     def change_appearance_mode_event(self, new_appearance_mode: str):
         ctk.set_appearance_mode(new_appearance_mode)
@@ -431,13 +575,16 @@ class SeparationApp(ctk.CTk):
         self.change_folder_button = ctk.CTkButton(path_frame, text="Change Folder/New Folder", command=self.change_input_folder)
         self.change_folder_button.grid(row=2, column=1, sticky="ew", padx=5)
 
+        self.queue_folder_button = ctk.CTkButton(path_frame, text="Queue Folder", command=self.queue_folder)
+        self.queue_folder_button.grid(row=2, column=2, sticky="ew", padx=5)
+
         self.add_song_button = ctk.CTkButton(path_frame, text="Add Song", command=self.add_song)
         self.add_song_button.grid(row=2, column=3, sticky="ew", padx=5)
 
         # Songs/Folders list
-        self.songs_listbox = tk.Listbox(frame)
+        self.songs_listbox = VirtualListbox(frame)  # Shift/Ctrl to select many songs
         self.songs_listbox.grid(row=1, column=0, sticky="nsew", padx=10, pady=(0,10))
-        self.songs_listbox.bind("<Double-Button-1>", self.on_listbox_double_click)
+        self.songs_listbox.bind_double_click(self.on_listbox_double_click)
 
         # Separation menu frame 
         sep_scrollable = ctk.CTkScrollableFrame(frame, width=350, height=600) 
@@ -495,16 +642,18 @@ class SeparationApp(ctk.CTk):
         self.sr_entry = ctk.CTkEntry(self.wav_flac_frame, textvariable=self.sr_var, width=150, placeholder_text="44100")
         self.sr_entry.grid(row=3, column=0, sticky="ew", padx=20, pady=5)
 
-        # Bit depth radiobuttons (for Demucs WAV)
+        # Bit depth radiobuttons (for WAV)
         self.bit_depth_frame = ctk.CTkFrame(self.wav_flac_frame)
         self.bit_depth_frame.grid(row=4, column=0, sticky="ew", padx=20, pady=5)
         self.bit_depth_frame.grid_remove()
 
-        self.bit_depth_var = tk.BooleanVar(value=True)
-        self.int24_radiobutton = ctk.CTkRadioButton(self.bit_depth_frame, text="24-bit", variable=self.bit_depth_var, value=True)
-        self.int24_radiobutton.grid(row=0, column=0, sticky="w", padx=20, pady=5)
-        self.float32_radiobutton = ctk.CTkRadioButton(self.bit_depth_frame, text="Float32 (bigger)", variable=self.bit_depth_var, value=False)
-        self.float32_radiobutton.grid(row=1, column=0, sticky="w", padx=20, pady=5)
+        self.bit_depth_var = tk.IntVar(value=24)
+        self.int16_radiobutton = ctk.CTkRadioButton(self.bit_depth_frame, text="16-bit", variable=self.bit_depth_var, value=16)
+        self.int16_radiobutton.grid(row=0, column=0, sticky="w", padx=20, pady=5)
+        self.int24_radiobutton = ctk.CTkRadioButton(self.bit_depth_frame, text="24-bit", variable=self.bit_depth_var, value=24)
+        self.int24_radiobutton.grid(row=1, column=0, sticky="w", padx=20, pady=5)
+        self.float32_radiobutton = ctk.CTkRadioButton(self.bit_depth_frame, text="Float32 (bigger)", variable=self.bit_depth_var, value=32)
+        self.float32_radiobutton.grid(row=2, column=0, sticky="w", padx=20, pady=5)
 
         # MP3 options
         self.mp3_frame = ctk.CTkFrame(sep_scrollable)
@@ -572,14 +721,17 @@ class SeparationApp(ctk.CTk):
         self.separate_button = ctk.CTkButton(sep_scrollable, text="Separate", command=self.separate_audio)
         self.separate_button.grid(row=17, column=0, sticky="ew", padx=20, pady=(20,10))
 
-        # Initial tool change to set defaults
-        self.on_tool_change()
+        # Initial tool change to set defaults (without loading the default backend)
+        self.on_tool_change(preload=False)
 
     def update_mp3_preset_label(self, value):
         self.mp3_preset_value_label.configure(text=f"Current: {int(value)}")
 
-    def on_tool_change(self):
+    def on_tool_change(self, preload=True):
         tool = self.ai_tool_var.get()
+        if preload and not self.separator_registry.is_loaded(tool):
+            # Build the backend in the background so the window stays responsive
+            self.separator_registry.preload_async(tool)
         try:
             if tool == "Spleeter":
                 self.model_label.grid_remove()
@@ -615,8 +767,8 @@ class SeparationApp(ctk.CTk):
         if fmt in ["wav", "flac"]:
             self.wav_flac_frame.grid()  # Show WAV/FLAC options
             self.mp3_frame.grid_remove()  # Hide MP3 options
-            if tool == "Demucs" and fmt == "wav":
-                self.bit_depth_frame.grid()  # Show bit depth for Demucs WAV
+            if fmt == "wav":
+                self.bit_depth_frame.grid()  # Show bit depth for WAV
             else:
                 self.bit_depth_frame.grid_remove()  # Hide bit depth
         elif fmt == "mp3":
@@ -666,64 +818,121 @@ class SeparationApp(ctk.CTk):
     def create_output_tab(self):
         frame = self.output_frame
         frame.grid_columnconfigure(0, weight=1)
-        frame.grid_rowconfigure((1,3,5), weight=1)
+        frame.grid_rowconfigure((2,4,6), weight=1)
+
+        # Filter and paging bar (queries the output catalog)
+        filter_frame = ctk.CTkFrame(frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=(10,0))
+        filter_frame.grid_columnconfigure(0, weight=1)
+
+        self.output_filter_var = tk.StringVar()
+        filter_entry = ctk.CTkEntry(filter_frame, textvariable=self.output_filter_var, placeholder_text="Filter by name")
+        filter_entry.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
+        self.output_filter_var.trace_add("write", lambda *args: self.filter_outputs())
+
+        self.output_tool_var = tk.StringVar(value="All Tools")
+        tool_menu = ctk.CTkOptionMenu(filter_frame, variable=self.output_tool_var, values=["All Tools"] + list(registry.SEPARATORS),
+                                      command=lambda *args: self.filter_outputs())
+        tool_menu.grid(row=0, column=1, padx=5, pady=5)
+
+        prev_btn = ctk.CTkButton(filter_frame, text="<", width=30, command=lambda: self.change_output_page(-1))
+        prev_btn.grid(row=0, column=2, padx=(5,0), pady=5)
+        self.output_page_label = ctk.CTkLabel(filter_frame, text="Page 1 / 1")
+        self.output_page_label.grid(row=0, column=3, padx=5, pady=5)
+        next_btn = ctk.CTkButton(filter_frame, text=">", width=30, command=lambda: self.change_output_page(1))
+        next_btn.grid(row=0, column=4, padx=(0,5), pady=5)
 
         # Transcriptions section
         trans_label = ctk.CTkLabel(frame, text="Transcriptions", font=ctk.CTkFont(size=18, weight="bold"))
-        trans_label.grid(row=0, column=0, sticky="w", padx=10, pady=(10,5))
+        trans_label.grid(row=1, column=0, sticky="w", padx=10, pady=(10,5))
 
         trans_btn = ctk.CTkButton(frame, text="Change Folder", command=lambda: self.change_output_folder("transcriptions"))
-        trans_btn.grid(row=0, column=1, sticky="e", padx=10, pady=(10,5))
+        trans_btn.grid(row=1, column=1, sticky="e", padx=10, pady=(10,5))
 
         self.trans_listbox = tk.Listbox(frame)
-        self.trans_listbox.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=10)
+        self.trans_listbox.grid(row=2, column=0, columnspan=2, sticky="nsew", padx=10)
         self.trans_listbox.bind("<Double-Button-1>", self.open_selected_transcription)
 
         # Vocals section
         vocals_label = ctk.CTkLabel(frame, text="Vocals", font=ctk.CTkFont(size=18, weight="bold"))
-        vocals_label.grid(row=2, column=0, sticky="w", padx=10, pady=(20,5))
+        vocals_label.grid(row=3, column=0, sticky="w", padx=10, pady=(20,5))
 
         vocals_btn = ctk.CTkButton(frame, text="Change Folder", command=lambda: self.change_output_folder("vocals"))
-        vocals_btn.grid(row=2, column=1, sticky="e", padx=10, pady=(20,5))
+        vocals_btn.grid(row=3, column=1, sticky="e", padx=10, pady=(20,5))
 
         self.vocals_listbox = tk.Listbox(frame)
-        self.vocals_listbox.grid(row=3, column=0, columnspan=2, sticky="nsew", padx=10)
+        self.vocals_listbox.grid(row=4, column=0, columnspan=2, sticky="nsew", padx=10)
         self.vocals_listbox.bind("<Double-Button-1>", self.open_selected_vocal)
 
         # Instrumentals section
         instr_label = ctk.CTkLabel(frame, text="Instrumentals", font=ctk.CTkFont(size=18, weight="bold"))
-        instr_label.grid(row=4, column=0, sticky="w", padx=10, pady=(20,5))
+        instr_label.grid(row=5, column=0, sticky="w", padx=10, pady=(20,5))
 
         instr_btn = ctk.CTkButton(frame, text="Change Folder", command=lambda: self.change_output_folder("instrumentals"))
-        instr_btn.grid(row=4, column=1, sticky="e", padx=10, pady=(20,5))
+        instr_btn.grid(row=5, column=1, sticky="e", padx=10, pady=(20,5))
 
         self.instr_listbox = tk.Listbox(frame)
-        self.instr_listbox.grid(row=5, column=0, columnspan=2, sticky="nsew", padx=10)
+        self.instr_listbox.grid(row=6, column=0, columnspan=2, sticky="nsew", padx=10)
         self.instr_listbox.bind("<Double-Button-1>", self.open_selected_instrumental)
 
     def load_input(self):
-        self.songs_listbox.delete(0, tk.END)
+        """List the input folder; a cached listing shows at once, otherwise batches stream in from a scan."""
+        self.path_var.set(self.input_folder)
         self.folders.clear()
         self.songs.clear()
-        self.all_items.clear()  # Clear all items
+        self.all_items.clear()
+        self.songs_listbox.set_items([])
+        self.input_scan_token = None
         if not os.path.isdir(self.input_folder):
             return
 
-        items = sorted(os.listdir(self.input_folder))
-        for item in items:
-            full_path = os.path.join(self.input_folder, item)
-            if os.path.isdir(full_path):
-                self.all_items.append(('folder', full_path))
-                self.folders.append(full_path)
-                self.songs_listbox.insert(tk.END, f"[Folder] {item}")
-            elif item.lower().endswith(('.mp3', '.wav', '.flac', '.m4a')):
-                song_data = {'path': full_path, 'name': item}
+        entries = self.dir_scanner.cached(self.input_folder)
+        if entries is not None:
+            self.show_input_entries(entries)
+            return
+        self.input_scan_token = self.dir_scanner.scan(self.input_folder)
+        self.after(50, self.poll_input_scan)
+
+    def add_input_entries(self, entries):
+        """Append scanner entries (is_folder, name, path) to the item lists; returns their display names."""
+        names = []
+        for is_folder, name, path in entries:
+            if is_folder:
+                self.all_items.append(('folder', path))
+                self.folders.append(path)
+                names.append(f"[Folder] {name}")
+            else:
+                song_data = {'path': path, 'name': name}
                 self.all_items.append(('song', song_data))
                 self.songs.append(song_data)
-                self.songs_listbox.insert(tk.END, item)
+                names.append(name)
+        return names
 
-        # Update path bar
-        self.path_var.set(self.input_folder)
+    def show_input_entries(self, entries):
+        self.folders.clear()
+        self.songs.clear()
+        self.all_items.clear()
+        self.songs_listbox.set_items(self.add_input_entries(entries))
+
+    def poll_input_scan(self):
+        """Drain scanner results on the main thread; messages of scans the user navigated away from are dropped."""
+        token = self.input_scan_token
+        if token is None:
+            return
+        while True:
+            try:
+                kind, msg_token, entries = self.dir_scanner.results.get_nowait()
+            except queue.Empty:
+                break
+            if msg_token != token:
+                continue
+            if kind == "batch":
+                self.songs_listbox.append(self.add_input_entries(entries))
+            else:  # "done": replace the unsorted batches with the sorted listing
+                self.show_input_entries(entries)
+                self.input_scan_token = None
+                return
+        self.after(50, self.poll_input_scan)
     
     def change_input_folder(self):
         folder = filedialog.askdirectory(title="Select Input Folder")
@@ -778,114 +987,112 @@ class SeparationApp(ctk.CTk):
         self.load_input()
 
     def load_outputs(self):
-        # Clear and load vocals
-        self.vocals_listbox.delete(0, tk.END)
-        self.vocals.clear()
-        vocals_dir = self.output_folders["vocals"]
-        if os.path.isdir(vocals_dir):
-            for f in sorted(os.listdir(vocals_dir)):
-                if f.lower().endswith(('.mp3', '.wav', '.flac', '.m4a')):
-                    full_path = os.path.join(vocals_dir, f)
-                    self.vocals.append({'path': full_path, 'name': f})
-                    self.vocals_listbox.insert(tk.END, f)
-
-        # Clear and load instrumentals
-        self.instr_listbox.delete(0, tk.END)
-        self.instrumentals.clear()
-        instr_dir = self.output_folders["instrumentals"]
-        if os.path.isdir(instr_dir):
-            for f in sorted(os.listdir(instr_dir)):
-                if f.lower().endswith(('.mp3', '.wav', '.flac', '.m4a')):
-                    full_path = os.path.join(instr_dir, f)
-                    self.instrumentals.append({'path': full_path, 'name': f})
-                    self.instr_listbox.insert(tk.END, f)
-
-        # Clear and load transcriptions
-        self.trans_listbox.delete(0, tk.END)
-        self.transcriptions.clear()
-        trans_dir = self.output_folders["transcriptions"]
-        if os.path.isdir(trans_dir):
-            for f in sorted(os.listdir(trans_dir)):
-                if f.lower().endswith(('.txt', '.lrc')):
-                    full_path = os.path.join(trans_dir, f)
-                    self.transcriptions.append({'path': full_path, 'name': f})
-                    self.trans_listbox.insert(tk.END, f)
+        """Show the current page of each output list, queried from the catalog with the active filter."""
+        text = self.output_filter_var.get().strip() or None
+        tool = self.output_tool_var.get()
+        tool = None if tool == "All Tools" else tool
+        sections = [
+            ("vocals", self.vocals_listbox, self.vocals),
+            ("instrumentals", self.instr_listbox, self.instrumentals),
+            ("transcriptions", self.trans_listbox, self.transcriptions),
+        ]
+        counts = [self.catalog.count(kind, self.output_folders[kind], text, tool) for kind, _, _ in sections]
+        pages = max(1, -(-max(counts) // OUTPUT_PAGE_SIZE))
+        self.output_page = min(self.output_page, pages - 1)
+        for kind, listbox, items in sections:
+            listbox.delete(0, tk.END)
+            items.clear()
+            for row in self.catalog.query(kind, self.output_folders[kind], text, tool,
+                                          offset=self.output_page * OUTPUT_PAGE_SIZE, limit=OUTPUT_PAGE_SIZE):
+                items.append({'path': row['path'], 'name': row['name']})
+                listbox.insert(tk.END, row['name'])
+        self.output_page_label.configure(text=f"Page {self.output_page + 1} / {pages}")
+
+    def filter_outputs(self):
+        self.output_page = 0
+        self.load_outputs()
+
+    def change_output_page(self, step):
+        self.output_page = max(0, self.output_page + step)
+        self.load_outputs()
+
+    def sync_outputs(self):
+        """Show the catalog now and reconcile it with the output folders in the background."""
+        self.load_outputs()
+        folders = dict(self.output_folders)
+
+        def sync():
+            for kind, folder in folders.items():
+                try:
+                    self.catalog.sync_folder(folder, kind)
+                except Exception as e:
+                    print(f"Catalog: Could not sync {folder}: {e}")
+            self.catalog_dirty = True  # Picked up by poll_queue on the Tk thread
+
+        threading.Thread(target=sync, name="catalog-sync", daemon=True).start()
+
+    def catalog_job(self, job):
+        """Record the files a finished job wrote (even a failed one may have written some). Runs in a queue worker thread."""
+        if job.outputs:
+            self.catalog.add_job(job)
+            self.catalog_dirty = True
 
     def change_output_folder(self, filetype):
         folder = filedialog.askdirectory(title=f"Select {filetype.capitalize()} Output Folder")
         if folder:
             self.output_folders[filetype] = folder
-            self.load_outputs()
+            self.output_page = 0
+            self.sync_outputs()
             # Prompt to save as default
             if messagebox.askyesno("Save as Default", f"Save this folder as the new default {filetype} folder?"):
                 self.save_settings()
                 
     def create_settings_tab(self):
         frame = self.settings_frame
-<<<<<<< HEAD
         frame.grid_columnconfigure((0, 1), weight=1)
         
         # Folder label
         settings_label = ctk.CTkLabel(frame, text="Default Folders Settings", font=ctk.CTkFont(size=20, weight="bold"))
         settings_label.grid(row=0, column=0, pady=(20, 20))
-=======
-        frame.grid_columnconfigure(0, weight=1)
-        frame.grid_rowconfigure(0, weight=1)
-
-        settings_label = ctk.CTkLabel(frame, text="Default Folders Settings", font=ctk.CTkFont(size=20, weight="bold"))
-        settings_label.grid(row=0, column=0, pady=(20, 20))
-
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         # Input folder
         input_label = ctk.CTkLabel(frame, text="Input Folder:", anchor="w")
         input_label.grid(row=1, column=0, sticky="w", padx=20, pady=(10, 0))
         self.settings_input_var = tk.StringVar(value=self.input_folder)
         input_entry = ctk.CTkEntry(frame, textvariable=self.settings_input_var, width=400)
         input_entry.grid(row=2, column=0, sticky="ew", padx=20, pady=5)
-<<<<<<< HEAD
-=======
-
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         # Vocals folder
         vocals_label = ctk.CTkLabel(frame, text="Vocals Folder:", anchor="w")
         vocals_label.grid(row=3, column=0, sticky="w", padx=20, pady=(10, 0))
         self.settings_vocals_var = tk.StringVar(value=self.output_folders["vocals"])
         vocals_entry = ctk.CTkEntry(frame, textvariable=self.settings_vocals_var, width=400)
         vocals_entry.grid(row=4, column=0, sticky="ew", padx=20, pady=5)
-<<<<<<< HEAD
-=======
-
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         # Instrumentals folder
         instr_label = ctk.CTkLabel(frame, text="Instrumentals Folder:", anchor="w")
         instr_label.grid(row=5, column=0, sticky="w", padx=20, pady=(10, 0))
         self.settings_instr_var = tk.StringVar(value=self.output_folders["instrumentals"])
         instr_entry = ctk.CTkEntry(frame, textvariable=self.settings_instr_var, width=400)
         instr_entry.grid(row=6, column=0, sticky="ew", padx=20, pady=5)
-<<<<<<< HEAD
-=======
-
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         # Transcriptions folder
         trans_label = ctk.CTkLabel(frame, text="Transcriptions Folder:", anchor="w")
         trans_label.grid(row=7, column=0, sticky="w", padx=20, pady=(10, 0))
         self.settings_trans_var = tk.StringVar(value=self.output_folders["transcriptions"])
         trans_entry = ctk.CTkEntry(frame, textvariable=self.settings_trans_var, width=400)
         trans_entry.grid(row=8, column=0, sticky="ew", padx=20, pady=5)
-<<<<<<< HEAD
+        # Parallel separation jobs
+        workers_label = ctk.CTkLabel(frame, text="Parallel Separation Jobs (workers):", anchor="w")
+        workers_label.grid(row=9, column=0, sticky="w", padx=20, pady=(10, 0))
+        self.settings_workers_var = tk.StringVar(value=str(self.max_workers))
+        workers_entry = ctk.CTkEntry(frame, textvariable=self.settings_workers_var, width=400)
+        workers_entry.grid(row=10, column=0, sticky="ew", padx=20, pady=5)
         
-=======
-
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         # Buttons
         button_frame = ctk.CTkFrame(frame)
-        button_frame.grid(row=9, column=0, pady=(20, 20))
+        button_frame.grid(row=11, column=0, pady=(20, 20))
         save_btn = ctk.CTkButton(button_frame, text="Save Changes", command=self.save_settings_changes)
         save_btn.grid(row=0, column=0, padx=10)
         restore_btn = ctk.CTkButton(button_frame, text="Restore Defaults", command=self.restore_defaults)
         restore_btn.grid(row=0, column=1, padx=10)
 
-<<<<<<< HEAD
         # Models label in second column
         model_label = ctk.CTkLabel(frame, text="Model Dropdown Menu Settings", font=ctk.CTkFont(size=20, weight="bold"))
         model_label.grid(row=0, column=1, pady=(20, 20))
@@ -924,14 +1131,11 @@ class SeparationApp(ctk.CTk):
         eval_checkbox = ctk.CTkCheckBox(frame, text="Enable Evaluation Tab", variable=self.enable_eval_var)
         eval_checkbox.grid(row=11, column=1, sticky="w", padx=20, pady=5)
 
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
     def save_settings_changes(self):
         self.input_folder = self.settings_input_var.get()
         self.output_folders["vocals"] = self.settings_vocals_var.get()
         self.output_folders["instrumentals"] = self.settings_instr_var.get()
         self.output_folders["transcriptions"] = self.settings_trans_var.get()
-<<<<<<< HEAD
         try:
             self.separator_models["Demucs"] = json.loads(self.demucs_models_text.get("0.0", "end"))
             self.separator_models["OpenUnmix"] = json.loads(self.openunmix_models_text.get("0.0", "end"))
@@ -941,31 +1145,38 @@ class SeparationApp(ctk.CTk):
         except json.JSONDecodeError:
             messagebox.showerror("Error", "Invalid JSON in model fields.")
             return
-=======
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
+        try:
+            self.max_workers = max(1, int(self.settings_workers_var.get()))
+        except ValueError:
+            messagebox.showerror("Error", "Number of parallel jobs must be a whole number.")
+            return
+        self.pipeline.set_separate_workers(self.max_workers)
+        self.job_queue.set_max_workers(self.pipeline.capacity)
         self.save_settings()
         os.makedirs(self.input_folder, exist_ok=True)
         for folder in self.output_folders.values():
             os.makedirs(folder, exist_ok=True)
         self.load_input()
-        self.load_outputs()
-<<<<<<< HEAD
+        self.sync_outputs()
         # Refresh model dropdowns in the input tab to reflect new settings
-        self.on_tool_change()
+        self.on_tool_change(preload=False)
         self.on_trans_tool_change()
         messagebox.showinfo("Settings Saved", "Default folders and models updated and saved.")
-=======
-        messagebox.showinfo("Settings Saved", "Default folders updated and saved.")
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
 
     def restore_defaults(self):
         defaults = {
             "input_folder": "input",
             "vocals_folder": "output/vocals",
             "instrumentals_folder": "output/instrumentals",
-<<<<<<< HEAD
             "transcriptions_folder": "output/text",
             "enable_evaluation": False,
+            "max_workers": 1,
+            "unload_idle_minutes": 15,
+            "job_timeout_minutes": 0,
+            "transcription_ram_budget_mb": 4096,
+            "decode_cache_mb": 2048,
+            "result_cache_mb": 4096,
+            "event_log": "",
             "separator_models": {
                 "Spleeter": [],
                 "Demucs": ["mdx", "mdx_extra", "htdemucs"],
@@ -985,6 +1196,13 @@ class SeparationApp(ctk.CTk):
             "transcriptions": defaults["transcriptions_folder"]
         }
         self.enable_evaluation = defaults["enable_evaluation"]
+        self.max_workers = defaults["max_workers"]
+        self.unload_idle_minutes = defaults["unload_idle_minutes"]
+        self.job_timeout_minutes = defaults["job_timeout_minutes"]
+        self.transcription_ram_budget_mb = defaults["transcription_ram_budget_mb"]
+        self.decode_cache_mb = defaults["decode_cache_mb"]
+        self.result_cache_mb = defaults["result_cache_mb"]
+        self.event_log = defaults["event_log"]
         self.separator_models = defaults["separator_models"]
         self.transcription_models = defaults["transcription_models"]
         
@@ -992,18 +1210,13 @@ class SeparationApp(ctk.CTk):
         self.save_settings()
         
         # Update UI variables
-=======
-            "transcriptions_folder": "output/text"
-        }
-        self.input_folder = defaults["input_folder"]
-        self.output_folders = {k: v for k, v in defaults.items() if k != "input_folder"}
-        self.save_settings()
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
         self.settings_input_var.set(self.input_folder)
         self.settings_vocals_var.set(self.output_folders["vocals"])
         self.settings_instr_var.set(self.output_folders["instrumentals"])
         self.settings_trans_var.set(self.output_folders["transcriptions"])
-<<<<<<< HEAD
+        self.settings_workers_var.set(str(self.max_workers))
+        self.pipeline.set_separate_workers(self.max_workers)
+        self.job_queue.set_max_workers(self.pipeline.capacity)
         self.enable_eval_var.set(self.enable_evaluation)
         
         # Update model textboxes
@@ -1025,7 +1238,7 @@ class SeparationApp(ctk.CTk):
         
         # Reload data
         self.load_input()
-        self.load_outputs()
+        self.sync_outputs()
         
         # Show success and switch to settings tab
         messagebox.showinfo("Defaults Restored", "All settings reset to defaults.")
@@ -1046,58 +1259,83 @@ class SeparationApp(ctk.CTk):
         eval_label = ctk.CTkLabel(frame, text="Model Evaluation", font=ctk.CTkFont(size=20, weight="bold"))
         eval_label.grid(row=0, column=0, pady=(20, 20))
         
-        # Single song multiple tools and models test
+        # Benchmark of several tools and models on a reference dataset
         single_song_frame = ctk.CTkFrame(frame)
         single_song_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
-        single_song_frame.grid_columnconfigure(1, weight=1)
-        # Song selection
-        song_label = ctk.CTkLabel(single_song_frame, text="Enter path to the song", anchor="w")
+        single_song_frame.grid_columnconfigure(0, weight=1)
+        # Dataset selection
+        song_label = ctk.CTkLabel(single_song_frame, text="Dataset folder (MUSDB-style: one folder per track with mixture.wav, vocals.wav and the other stems)", anchor="w")
         song_label.grid(row=1, column=0, sticky="w", padx=20, pady=(10, 0))
         self.song_path = tk.StringVar(value=self.input_folder)
         song_path = ctk.CTkEntry(single_song_frame, textvariable=self.song_path, width=400)
         song_path.grid(row=2, column=0, sticky="ew", padx=20, pady=5)
+        # Configurations to compare
+        configs_label = ctk.CTkLabel(single_song_frame, text="Configurations (tool:model:shifts, comma separated)", anchor="w")
+        configs_label.grid(row=3, column=0, sticky="w", padx=20, pady=(10, 0))
+        default_configs = ["spleeter"] + [f"{tool.lower()}:{models[0]}" for tool, models in self.separator_models.items()
+                                          if tool != "Spleeter" and models]
+        self.eval_configs_var = tk.StringVar(value=", ".join(default_configs))
+        configs_entry = ctk.CTkEntry(single_song_frame, textvariable=self.eval_configs_var, width=400)
+        configs_entry.grid(row=4, column=0, sticky="ew", padx=20, pady=5)
         # Run Evaluation Button
-        run_btn = ctk.CTkButton(single_song_frame, text="Run Evaluation", command=self.run_evaluation)
-        run_btn.grid(row=3, column=0, pady=(20, 20))
+        self.eval_run_button = ctk.CTkButton(single_song_frame, text="Run Evaluation", command=self.run_evaluation)
+        self.eval_run_button.grid(row=5, column=0, pady=(20, 20))
         # Results Display
-        results_label = ctk.CTkLabel(single_song_frame, text="Results:", anchor="w")
-        results_label.grid(row=4, column=0, sticky="w", padx=20, pady=(10, 0))
+        results_label = ctk.CTkLabel(single_song_frame, text="Results (median over tracks):", anchor="w")
+        results_label.grid(row=6, column=0, sticky="w", padx=20, pady=(10, 0))
         self.results_text = ctk.CTkTextbox(single_song_frame, width=400, height=200)
-        self.results_text.grid(row=5, column=0, sticky="ew", padx=20, pady=5)
+        self.results_text.grid(row=7, column=0, sticky="ew", padx=20, pady=5)
+        self.evaluation_thread = None
+        self.evaluation_result = None
+        self.evaluation_progress = []
+
+    def run_evaluation(self):
+        """Separate and score the dataset with every configuration in a background thread."""
+        dataset = self.song_path.get().strip()
+        if not evaluation.find_tracks(dataset):
+            messagebox.showwarning("No dataset", "No track folders with mixture.wav and vocals.wav found in this folder.")
+            return
+        try:
+            configs = [evaluation.parse_config(text.strip()) for text in self.eval_configs_var.get().split(",")
+                       if text.strip()]
+        except ValueError as e:
+            messagebox.showerror("Invalid configuration", str(e))
+            return
+        if not configs or (self.evaluation_thread is not None and self.evaluation_thread.is_alive()):
+            return
+        out_dir = os.path.join(os.path.dirname(self.output_folders["vocals"]) or ".", "evaluation")
+
+        def scored(label, name, result):
+            # Called on the evaluation thread; poll_evaluation shows the lines
+            status = "failed: " + result["error"] if "error" in result else evaluation.format_track(result)
+            self.evaluation_progress.append(f"{label} / {name}: {status}")
 
-    def run_evaluation(self): 
-        song_path = self.song_path.get()
-        if not song_path:
-            messagebox.showwarning("No Selection", "Please select a song.")
+        def evaluate():
+            try:
+                summary = evaluation.evaluate(dataset, configs, out_dir, separators=self.separator_registry,
+                                              on_result=scored)
+                self.evaluation_result = evaluation.format_summary(summary) + f"\n\nPer-track results: {out_dir}"
+            except Exception as e:
+                self.evaluation_result = f"Evaluation failed: {e}"
+
+        self.evaluation_result = None
+        self.evaluation_progress = []
+        self.results_text.delete("0.0", "end")
+        self.results_text.insert("end", f"Evaluating {len(configs)} configuration(s)...\n")
+        self.eval_run_button.configure(state="disabled")
+        self.evaluation_thread = threading.Thread(target=evaluate, name="evaluation", daemon=True)
+        self.evaluation_thread.start()
+        self.after(500, self.poll_evaluation)
+
+    def poll_evaluation(self):
+        if self.evaluation_result is None:
+            while self.evaluation_progress:
+                self.results_text.insert("end", self.evaluation_progress.pop(0) + "\n")
+            self.after(500, self.poll_evaluation)
             return
-        # Fixed parameters for comparison
-        fmt, sr, bitrate = "wav", 44100, None
-        results = {}
-        for tool in ["Spleeter", "Demucs", "OpenUnmix"]:
-            # Run separation (simplified, assuming no transcription)
-            if tool == "Spleeter":
-                success = self.spleeter_sep.separate(song['path'], os.path.splitext(song_name)[0], "/tmp/vocals", "/tmp/instr", fmt, sr, bitrate, False, None, None)
-                vocals_path = "/tmp/vocals/vocals.wav"
-                instr_path = "/tmp/instr/accompaniment.wav"
-            # Add similar for Demucs and OpenUnmix
-            if success:
-                # Compute metrics (assuming ground-truth paths; adjust as needed)
-                gt_vocals = song['path']  # Placeholder
-                gt_instr = song['path']  # Placeholder
-                sdr, sir, sar = museval.evaluate([vocals_path, instr_path], [gt_vocals, gt_instr])
-                results[tool] = {"SDR": sdr.mean(), "SIR": sir.mean(), "SAR": sar.mean()}
-        # Display results
         self.results_text.delete("0.0", "end")
-        for tool, metrics in results.items():
-            self.results_text.insert("end", f"{tool}: SDR={metrics['SDR']:.2f}, SIR={metrics['SIR']:.2f}, SAR={metrics['SAR']:.2f}\n")
-=======
-        os.makedirs(self.input_folder, exist_ok=True)
-        for folder in self.output_folders.values():
-            os.makedirs(folder, exist_ok=True)
-        self.load_input()
-        self.load_outputs()
-        messagebox.showinfo("Defaults Restored", "Folders reset to defaults.")
->>>>>>> 92d0912b5e9008ba592c2475dd2727cd6f93247a
+        self.results_text.insert("end", self.evaluation_result + "\n")
+        self.eval_run_button.configure(state="normal")
 
     def open_selected_song(self, event=None):
         sel = self.songs_listbox.curselection()
@@ -1127,87 +1365,98 @@ class SeparationApp(ctk.CTk):
         idx = sel[0]
         open_file(self.transcriptions[idx]['path'])
 
+    def collect_separation_options(self):
+        """Snapshot the current tool/model/format settings for newly queued jobs."""
+        ai_tool = self.ai_tool_var.get()
+        fmt = self.format_var.get()
+        options = {
+            "model": self.model_var.get(),
+            "fmt": fmt,
+            "sr": int(self.sr_var.get()) if fmt in ["wav", "flac"] else None,
+            "bitrate": int(self.bitrate_var.get()) if fmt == "mp3" else None,
+            "bit_depth": self.bit_depth_var.get() if fmt == "wav" else None,
+            "mp3_preset": int(self.mp3_preset_slider.get()) if fmt == "mp3" and ai_tool == "Demucs" else None,
+            "shifts": int(self.shifts_var.get()) if ai_tool == "Demucs" else None,
+            "do_transcribe": self.transcript_var.get(),
+            "trans_tool": self.trans_tool_var.get(),
+            "trans_model": self.transcript_model.get(),
+            # A song still running after this long is stopped and marked failed (0 = no limit)
+            "timeout": self.job_timeout_minutes * 60 if self.job_timeout_minutes else None,
+        }
+        return ai_tool, options
+
+    def enqueue_songs(self, paths):
+        try:
+            ai_tool, options = self.collect_separation_options()
+        except ValueError:
+            messagebox.showerror("Invalid settings", "Sample rate, bitrate and shifts must be whole numbers.")
+            return
+        jobs = [
+            job_queue.SeparationJob(path, ai_tool, self.output_folders["vocals"], self.output_folders["instrumentals"],
+                                    self.output_folders["transcriptions"], options)
+            for path in paths
+        ]
+        self.job_queue.submit_many(jobs)
+        print(f"Queued {len(jobs)} songs for separation with {ai_tool}.")
+        self.show_progress_window()
+
     def separate_audio(self):
         sel = self.songs_listbox.curselection()
         if not sel:
-            messagebox.showwarning("No selection", "Please select a song to separate.")
-            return
-        idx = sel[0]
-        item_type, item_data = self.all_items[idx]
-        if item_type != 'song':
-            messagebox.showwarning("Invalid selection", "Please select a song to separate, not a folder.")
+            messagebox.showwarning("No selection", "Please select songs or folders to separate.")
             return
-
-        song = item_data
-        input_path = song['path']
-        song_name = os.path.splitext(os.path.basename(song['name']))[0]
-
-        ai_tool = self.ai_tool_var.get()
-        do_transcribe = self.transcript_var.get()
-        whisper_model = self.transcript_model.get()
-        model = self.model_var.get()
-        fmt = self.format_var.get()
-        sr = int(self.sr_var.get()) if fmt in ["wav", "flac"] else None
-        bitrate = int(self.bitrate_var.get()) if fmt == "mp3" else None
-        bit_depth = self.bit_depth_var.get() if fmt == "wav" and ai_tool == "Demucs" else None
-        mp3_preset = int(self.mp3_preset_slider.get()) if fmt == "mp3" and ai_tool == "Demucs" else None
-        shifts = int(self.shifts_var.get()) if ai_tool == "Demucs" else None
-        
-        # Prepare output folders
-        vocals_folder = self.output_folders["vocals"]
-        instr_folder = self.output_folders["instrumentals"]
-        trans_folder = self.output_folders["transcriptions"]
-
-        # Start threaded separation with progress
-        self.status_queue = queue.Queue()
-        thread = threading.Thread(target=self.separate_in_thread, args=(input_path, song_name, vocals_folder, instr_folder, trans_folder, ai_tool, model, fmt, sr, bitrate, do_transcribe, whisper_model, song, bit_depth, mp3_preset, shifts))
-        thread.daemon = True
-        thread.start()
-    
-    def separate_in_thread(self, input_path, song_name, vocals_folder, instr_folder, trans_folder, ai_tool, model, fmt, sr, bitrate, do_transcribe, whisper_model, song, bit_depth, mp3_preset, shifts):
-        progress = ProgressWindow(self, f"Separating with {ai_tool}...")
-        try:
-            self.status_queue.put("Loading model...")
-            progress.update_status("Loading model")
-
-            success = False
-            if ai_tool == "Spleeter":
-                self.status_queue.put("Separating using Spleeter...")
-                progress.update_status("Separating using Spleeter")
-                success = self.spleeter_sep.separate(input_path, song_name, vocals_folder, instr_folder, fmt, sr, bitrate, do_transcribe, trans_folder, whisper_model)
-            elif ai_tool == "Demucs":
-                self.status_queue.put("Separating using Demucs...")
-                progress.update_status("Separating using Demucs")
-                success = self.demucs_sep.separate(input_path, song_name, vocals_folder, instr_folder, model, fmt, sr, bitrate, bit_depth, mp3_preset, shifts, do_transcribe, trans_folder, whisper_model)
-            elif ai_tool == "OpenUnmix":
-                self.status_queue.put("Separating using OpenUnmix...")
-                progress.update_status("Separating using OpenUnmix")
-                success = self.openunmix_sep.separate(input_path, song_name, vocals_folder, instr_folder, model, fmt, sr, bitrate, do_transcribe, trans_folder, whisper_model)
+        paths = []
+        for idx in sel:
+            item_type, item_data = self.all_items[idx]
+            if item_type == 'song':
+                paths.append(item_data['path'])
             else:
-                raise ValueError(f"Unknown AI tool: {ai_tool}")
-
-            if progress.canceled:
-                self.status_queue.put("Canceled")
-                progress.update_status("Canceled")
-                return
-
-            self.status_queue.put("Saving files...")
-            progress.update_status("Saving files")
+                paths.extend(job_queue.collect_songs(item_data))
+        if not paths:
+            messagebox.showwarning("Invalid selection", "No songs found in the selection.")
+            return
+        self.enqueue_songs(paths)
 
-            # Update UI on main thread
-            self.after(0, self.load_outputs)
-            self.after(0, lambda: messagebox.showinfo("Separation done", f"Separated '{song['name']}' using {ai_tool}."))
-            self.status_queue.put("Success")
-            progress.update_status("Separation done")
+    def queue_folder(self):
+        paths = job_queue.collect_songs(self.input_folder)
+        if not paths:
+            messagebox.showwarning("No songs", f"No songs found in '{self.input_folder}'.")
             return
-        
-        except Exception as e:
-            print(f"Thread error: {e}")
-            self.status_queue.put("Error")
-            self.after(0, lambda: messagebox.showerror("Error", f"Unexpected error: {e}"))
-        finally:
-            progress.close(success=(self.status_queue.get() == "Success"))
-                
+        if messagebox.askyesno("Queue Folder", f"Queue all {len(paths)} songs from '{self.input_folder}' (including subfolders)?"):
+            self.enqueue_songs(paths)
+
+    def show_progress_window(self):
+        if self.progress_window is None or not self.progress_window.winfo_exists():
+            self.progress_window = ProgressWindow(self, self.job_queue, "Separation queue")
+        self.progress_window.refresh()
+
+    def run_job(self, job, start):
+        """Separate one queued song through the staged pipeline. Runs in a queue worker thread."""
+        with self.separator_registry.use(job.tool) as separator:
+            return self.pipeline.run(separator, job, start)
+
+    def unload_idle_backends(self):
+        """Free separator backends that have not been used for unload_idle_minutes."""
+        self.after(60000, self.unload_idle_backends)
+        if self.unload_idle_minutes and self.unload_idle_minutes > 0:
+            self.separator_registry.unload_idle(self.unload_idle_minutes * 60)
+
+    def poll_queue(self):
+        """Refresh the queue window and output lists from the Tk thread."""
+        self.after(500, self.poll_queue)
+        if self.progress_window is not None and self.progress_window.winfo_exists():
+            self.progress_window.refresh()
+        if self.catalog_dirty:
+            self.catalog_dirty = False
+            self.load_outputs()
+        finished = self.job_queue.finished_count
+        if finished != self.finished_seen:
+            self.finished_seen = finished
+            if self.job_queue.is_idle:
+                counts = self.job_queue.counts()
+                messagebox.showinfo("Separation done", f"Queue finished: {counts[job_queue.DONE]} separated, "
+                                    f"{counts[job_queue.FAILED]} failed, {counts[job_queue.CANCELED]} canceled.")
+
 if __name__ == "__main__":
     app = SeparationApp()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import sys
+
+from separators.cli import main
+
+sys.exit(main())
@@ -0,0 +1,135 @@
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import soundfile as sf
+from separators import resample
+
+SUPPORTED_FORMATS = ("wav", "flac", "mp3")
+# Bit depth -> soundfile subtype; FLAC has no float subtype and falls back to 24-bit
+WAV_SUBTYPES = {16: "PCM_16", 24: "PCM_24", 32: "FLOAT"}
+FLAC_SUBTYPES = {16: "PCM_16", 24: "PCM_24", 32: "PCM_24"}
+BLOCK_FRAMES = 1 << 18
+
+
+def bits(bit_depth):
+    """Normalize a bit depth option: 16, 24 or 32 (float). True/None mean 24-bit, False means float."""
+    if bit_depth is None or bit_depth is True:
+        return 24
+    if bit_depth is False:
+        return 32
+    if int(bit_depth) not in WAV_SUBTYPES:
+        raise ValueError(f"Unsupported bit depth {bit_depth}. Supported: {list(WAV_SUBTYPES)}")
+    return int(bit_depth)
+
+
+def as_frames(audio):
+    """
+    Return audio as a float32 (frames, channels) array.
+
+    Accepts numpy arrays (including memmaps, which are not copied) and torch tensors,
+    mono 1-D input and channels-first (channels, frames) input.
+    """
+    if hasattr(audio, "detach"):
+        audio = audio.detach().cpu().numpy()
+    if not isinstance(audio, np.memmap):
+        audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim == 1:
+        return audio[:, None]
+    if audio.ndim != 2:
+        raise ValueError(f"Expected 1-D or 2-D audio, got shape {audio.shape}")
+    if audio.shape[0] < audio.shape[1] and audio.shape[0] <= 8:
+        return audio.T
+    return audio
+
+
+def _blocks(audio, sample_rate, out_sr, clip, block_frames):
+    """
+    Yield contiguous float32 blocks at out_sr, clamped to [-1, 1] or rescaled by the peak when
+    clip asks for it.
+    """
+    scale = 1.0
+    if clip == "rescale":
+        peak = max((float(np.abs(audio[i:i + block_frames]).max()) for i in range(0, len(audio), block_frames)),
+                   default=0.0)
+        scale = 1.0 / max(1.01 * peak, 1.0)
+    for block in resample.resample_blocks(audio, sample_rate, out_sr, block_frames):
+        if scale != 1.0:
+            block = block * scale
+        elif clip == "clamp":
+            block = np.clip(block, -1.0, 1.0)
+        yield np.ascontiguousarray(block)
+
+
+def _mp3_command(path, sample_rate, channels, bitrate, mp3_preset):
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-y", "-f", "f32le", "-ar", str(sample_rate),
+           "-ac", str(channels), "-i", "-", "-codec:a", "libmp3lame", "-b:a", f"{int(str(bitrate).rstrip('k'))}k"]
+    if mp3_preset is not None:
+        cmd += ["-compression_level", str(mp3_preset)]
+    cmd.append(path)
+    return cmd
+
+
+def write_audio(path, audio, sample_rate, fmt="wav", out_sr=None, bit_depth=24, bitrate=192,
+                mp3_preset=None, clip="clamp", block_frames=BLOCK_FRAMES):
+    """
+    Encode a float waveform straight to its final file, block by block.
+
+    :param path: Destination file.
+    :param audio: Float waveform (see as_frames); a memmap is streamed without being loaded.
+    :param sample_rate: Rate of audio.
+    :param fmt: "wav", "flac" or "mp3".
+    :param out_sr: Rate of the written file (None keeps sample_rate); see resample.py.
+    :param bit_depth: 16, 24 or 32 (float) for WAV/FLAC.
+    :param bitrate: MP3 bitrate in kbps (int or "192k").
+    :param mp3_preset: LAME quality, 2=best quality, 7=fastest.
+    :param clip: "clamp", "rescale" (divide by the peak if it exceeds 1) or None.
+    :return: path
+    """
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Supported: {list(SUPPORTED_FORMATS)}")
+    audio = as_frames(audio)
+    bit_depth = bits(bit_depth)
+    if bit_depth == 32 and fmt == "wav" and clip == "clamp":
+        clip = None  # Float WAV keeps peaks above full scale
+    out_sr = int(out_sr or sample_rate)
+    blocks = _blocks(audio, sample_rate, out_sr, clip, block_frames)
+
+    if fmt in ("wav", "flac"):
+        subtype = (WAV_SUBTYPES if fmt == "wav" else FLAC_SUBTYPES)[bit_depth]
+        with sf.SoundFile(path, "w", samplerate=out_sr, channels=audio.shape[1],
+                          subtype=subtype, format=fmt.upper()) as f:
+            for block in blocks:
+                f.write(block)
+        return path
+
+    # MP3: one LAME encoder process fed through a pipe
+    proc = subprocess.Popen(_mp3_command(path, out_sr, audio.shape[1], bitrate, mp3_preset),
+                            stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for block in blocks:
+            proc.stdin.write(block.tobytes())
+        proc.stdin.close()
+        proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode '{path}': {proc.stderr.read().decode(errors='replace')}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stderr.close()
+    return path
+
+
+def write_stems(stems, sample_rate, fmt="wav", **kwargs):
+    """
+    Write several stems concurrently (libsndfile and ffmpeg do the work outside the GIL).
+
+    :param stems: List of (path, audio) pairs.
+    :param kwargs: Passed to write_audio.
+    :return: List of written paths, in the order of stems.
+    """
+    if len(stems) <= 1:
+        return [write_audio(path, audio, sample_rate, fmt, **kwargs) for path, audio in stems]
+    with ThreadPoolExecutor(max_workers=len(stems), thread_name_prefix="write") as pool:
+        futures = [pool.submit(write_audio, path, audio, sample_rate, fmt, **kwargs) for path, audio in stems]
+        return [future.result() for future in futures]
@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+from separators import audio_writer, decode_cache, evaluation, events, job_queue, registry, result_cache
+
+try:
+    import resource  # Peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+SAMPLE_RATE = 44100
+LENGTHS = (30.0, 120.0)  # Seconds of synthetic audio per configuration
+FORMATS = ("wav", "flac", "mp3")
+CONFIGS = ("spleeter",
+           "demucs:mdx", "demucs:mdx_extra", "demucs:htdemucs", "demucs:htdemucs:2", "demucs:mdx:5",
+           "openunmix:umxl", "openunmix:umxhq", "openunmix:umx", "openunmix:umxse")
+TOLERANCE = 0.2  # Relative slowdown (or growth) that counts as a regression ...
+MIN_DELTA = {"seconds": 0.05, "rtf": 0.01, "mb": 20.0}  # ... when it also exceeds these absolute amounts
+
+
+def synthetic_song(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """
+    Stereo test song: a vibrato "voice" with harmonics and syllables, a bass line, chords and noise hits.
+
+    Deterministic for a given seed, so every configuration (and every run) separates the same audio.
+    :return: (frames, 2) float32 array.
+    """
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * sample_rate)
+    t = np.arange(frames) / sample_rate
+    beat = 0.5  # 120 BPM
+
+    melody = 220 * 2 ** (rng.integers(0, 8, size=int(seconds / beat) + 1)[(t // beat).astype(int)] / 12)
+    phase = 2 * np.pi * np.cumsum(melody * (1 + 0.01 * np.sin(2 * np.pi * 5.5 * t))) / sample_rate
+    syllables = np.clip(np.sin(np.pi * t / beat) ** 2 * 1.5, 0, 1)
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6)) * syllables * 0.25
+
+    bass = 0.3 * np.sin(2 * np.pi * 55 * 2 ** (((t // (4 * beat)) % 4) * 5 / 12) * t)
+    chords = 0.1 * sum(np.sin(2 * np.pi * f * t) for f in (261.6, 329.6, 392.0))
+    hits = rng.standard_normal(frames) * np.exp(-(t % beat) * 30) * 0.2
+
+    mix = np.stack([voice * 0.9 + bass + chords * 1.2 + hits, voice * 1.1 + bass + chords * 0.8 + hits], axis=1)
+    return (mix / max(1.0, np.abs(mix).max() / 0.9)).astype(np.float32)
+
+
+def write_songs(directory, lengths=LENGTHS):
+    """Write one synthetic song per length; returns [(seconds, path)]."""
+    os.makedirs(directory, exist_ok=True)
+    songs = []
+    for seconds in lengths:
+        path = os.path.join(directory, f"synthetic_{seconds:g}s.wav")
+        if not os.path.exists(path):
+            sf.write(path, synthetic_song(seconds), SAMPLE_RATE, subtype="PCM_16")
+        songs.append((seconds, path))
+    return songs
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # Bytes on macOS, KB elsewhere
+
+
+def measure(config, songs, formats, work_dir, separators=None):
+    """
+    Benchmark one configuration in the calling process.
+
+    Both caches are disabled so every song is decoded and separated for real.
+    :param config: Configuration dict (see evaluation.parse_config).
+    :param songs: [(seconds, path)] as returned by write_songs.
+    :return: {"config", "load_seconds", "runs": {seconds: {...}}, "peak_rss_mb"}.
+    """
+    decode_cache.get_cache().set_max_mb(0)
+    result_cache.get_cache().set_max_mb(0)
+    label = evaluation.config_name(config)
+    result = {"config": config}
+
+    start = time.perf_counter()
+    separator = (separators or registry.SeparatorRegistry()).get(config["tool"])
+    if hasattr(separator, "warm_up"):
+        # Model weights are part of the cold start
+        model = config.get("model")
+        if model:
+            separator.warm_up(model)
+        else:
+            separator.warm_up()
+    result["load_seconds"] = round(time.perf_counter() - start, 3)
+
+    options = {"model": config.get("model"), "shifts": config.get("shifts"), "fmt": "wav", "long_form": False}
+    out_dir = os.path.join(work_dir, label)
+    os.makedirs(out_dir, exist_ok=True)
+    result["runs"] = {}
+    for seconds, path in songs:
+        job = job_queue.SeparationJob(path, config["tool"], out_dir, out_dir, out_dir, options)
+        track = separator.prepare(job.input_path, job.song_name, out_dir, out_dir, out_dir,
+                                  outputs=job.outputs, **job_queue.job_kwargs(job))
+        cpu = time.process_time()
+        start = time.perf_counter()
+        separator.decode(track)
+        decoded = time.perf_counter()
+        separator.infer(track)
+        inferred = time.perf_counter()
+        run = {
+            "decode_seconds": round(decoded - start, 3),
+            "infer_seconds": round(inferred - decoded, 3),
+            "rtf": round((inferred - start) / seconds, 4),  # Below 1 is faster than real time
+            "cpu_seconds": round(time.process_time() - cpu, 3),
+            "encode_seconds": {},
+        }
+        for fmt in formats:
+            stems = [(os.path.join(out_dir, f"{job.song_name}_{stem}.{fmt}"), audio)
+                     for stem, audio in track.stems.items()]
+            start = time.perf_counter()
+            try:
+                audio_writer.write_stems(stems, track.sample_rate, fmt, out_sr=SAMPLE_RATE, bit_depth=24, bitrate=192)
+                run["encode_seconds"][fmt] = round(time.perf_counter() - start, 3)
+            except Exception as e:
+                events.log("Benchmark", f"Encoding {fmt} failed: {e}", level="error")
+                run["encode_seconds"][fmt] = None
+            for stem_path, _ in stems:
+                if os.path.exists(stem_path):
+                    os.remove(stem_path)
+        track.release()
+        result["runs"][f"{seconds:g}"] = run
+        events.log("Benchmark", f"{label} on {seconds:g}s: RTF {run['rtf']:.3f}")
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def _measure_quietly(config, songs, formats, work_dir):
+    # Runs in a fresh process; its messages must not end up in the CLI's JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return measure(config, songs, formats, work_dir)
+
+
+def run_config(config, songs, formats, work_dir):
+    """Benchmark one configuration in a new process, so load time is cold and peak RSS is its own."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure_quietly, config, songs, formats, work_dir).result()
+
+
+def run(configs, lengths=LENGTHS, formats=FORMATS, work_dir=None):
+    """
+    Benchmark every configuration on synthetic songs of the given lengths.
+
+    :param configs: Configuration dicts (see evaluation.parse_config).
+    :return: Results dict {"machine", "lengths", "formats", "results": {config name: result}}; a
+             configuration that fails has {"config", "error"} as its result.
+    """
+    with contextlib.ExitStack() as stack:
+        work_dir = work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix="benchmark_"))
+        songs = write_songs(os.path.join(work_dir, "songs"), lengths)
+        results = {}
+        for config in configs:
+            label = evaluation.config_name(config)
+            events.log("Benchmark", f"{label}")
+            try:
+                results[label] = run_config(config, songs, formats, os.path.join(work_dir, "out"))
+            except Exception as e:
+                events.log("Benchmark", f"{label} failed: {e}", level="error")
+                results[label] = {"config": config, "error": str(e)}
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count()},
+        "lengths": list(lengths),
+        "formats": list(formats),
+        "results": results,
+    }
+
+
+def _measurements(result):
+    """(name, value, unit) of every comparable number in one configuration's result."""
+    yield "load_seconds", result.get("load_seconds"), "seconds"
+    yield "peak_rss_mb", result.get("peak_rss_mb"), "mb"
+    for length, run in result.get("runs", {}).items():
+        for key in ("decode_seconds", "infer_seconds", "cpu_seconds"):
+            yield f"{length}s.{key}", run.get(key), "seconds"
+        yield f"{length}s.rtf", run.get("rtf"), "rtf"
+        for fmt, seconds in run.get("encode_seconds", {}).items():
+            yield f"{length}s.encode_seconds.{fmt}", seconds, "seconds"
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """
+    Compare benchmark results with a saved baseline; every measurement is lower-is-better.
+
+    :return: List of {"config", "measurement", "baseline", "current", "change"} for each measurement
+             more than tolerance (relative) and MIN_DELTA (absolute) above its baseline, plus
+             configurations that ran in the baseline but fail now.
+    """
+    regressions = []
+    for label, result in current["results"].items():
+        base = baseline.get("results", {}).get(label)
+        if base is None or "error" in base:
+            continue
+        if "error" in result:
+            regressions.append({"config": label, "measurement": "error", "baseline": None,
+                                "current": result["error"], "change": None})
+            continue
+        before = {name: value for name, value, _ in _measurements(base)}
+        for name, value, unit in _measurements(result):
+            old = before.get(name)
+            if value is None or old is None:
+                continue
+            if value > old * (1 + tolerance) and value - old > MIN_DELTA[unit]:
+                regressions.append({"config": label, "measurement": name, "baseline": old, "current": value,
+                                    "change": round(value / old - 1, 3) if old else None})
+    return regressions
+
+
+def format_regressions(regressions):
+    """One line per regression, for logs."""
+    lines = []
+    for r in regressions:
+        if r["measurement"] == "error":
+            lines.append(f"{r['config']}: failed ({r['current']})")
+        else:
+            change = f" (+{r['change']:.0%})" if r["change"] is not None else ""
+            lines.append(f"{r['config']} {r['measurement']}: {r['baseline']} -> {r['current']}{change}")
+    return "\n".join(lines)
+
+
+def save(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,106 @@
+import time
+import threading
+import contextlib
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint of a job that was canceled or ran out of time."""
+
+    def __init__(self, reason="canceled", timed_out=False):
+        super().__init__(reason)
+        self.reason = reason
+        self.timed_out = timed_out
+
+
+class CancelToken:
+    def __init__(self, timeout=None):
+        """
+        Cancellation flag of one job, checked by the separation and transcription loops.
+
+        Long computations call check() between their chunks (windows, shifts, segments), which
+        raises Cancelled once cancel() was called or the timeout passed, so a canceled song stops
+        within one chunk instead of running to the end.
+
+        :param timeout: Seconds the job may run after start(), not counting time it is paused
+                        (waiting in front of a pipeline stage); None or 0 means no limit.
+        """
+        self.timeout = timeout
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+        self._elapsed = 0.0  # Seconds run before the last pause
+        self._resumed = None  # When the clock last started running, None while it is paused
+
+    def start(self, timeout=None):
+        """Start the timeout clock (when the job starts running, not when it is queued)."""
+        with self._lock:
+            if timeout is not None:
+                self.timeout = timeout
+            self._started = True
+            self._elapsed = 0.0
+            self._resumed = time.monotonic()
+
+    def pause(self):
+        """Stop the timeout clock while the job waits for the next stage."""
+        with self._lock:
+            if self._resumed is not None:
+                self._elapsed += time.monotonic() - self._resumed
+                self._resumed = None
+
+    def resume(self):
+        with self._lock:
+            if self._started and self._resumed is None:
+                self._resumed = time.monotonic()
+
+    @property
+    def elapsed(self):
+        """Seconds the clock has run since start()."""
+        with self._lock:
+            running = time.monotonic() - self._resumed if self._resumed is not None else 0.0
+            return self._elapsed + running
+
+    def cancel(self, reason="canceled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def timed_out(self):
+        return bool(self.timeout) and self.elapsed >= self.timeout
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or self.timed_out
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+        if self.timed_out:
+            raise Cancelled(f"timed out after {self.timeout:g}s", timed_out=True)
+
+
+_local = threading.local()
+
+
+def current():
+    """Token of the job this thread is working on, or None."""
+    return getattr(_local, "token", None)
+
+
+@contextlib.contextmanager
+def use(token):
+    """Make token the one check() tests in this thread while inside the block."""
+    previous = current()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def check():
+    """Checkpoint for loops that do not know their job: raise Cancelled if the current job was canceled."""
+    token = getattr(_local, "token", None)
+    if token is not None:
+        token.check()
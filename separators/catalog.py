@@ -0,0 +1,147 @@
+import os
+import time
+import sqlite3
+import threading
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "separation_app", "catalog.sqlite")
+# Catalog kind -> file extensions listed for it (kinds match the app's output folder names)
+KINDS = {
+    "vocals": (".mp3", ".wav", ".flac", ".m4a"),
+    "instrumentals": (".mp3", ".wav", ".flac", ".m4a"),
+    "transcriptions": (".txt", ".lrc"),
+}
+# Key a separator uses in its `outputs` dict -> catalog kind
+OUTPUT_KINDS = {"vocals": "vocals", "instrumental": "instrumentals", "transcription": "transcriptions"}
+COLUMNS = ("path", "kind", "folder", "name", "source", "tool", "model", "fmt", "size", "duration", "created", "modified")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source TEXT,
+    tool TEXT,
+    model TEXT,
+    fmt TEXT,
+    size INTEGER,
+    duration REAL,
+    created REAL,
+    modified REAL
+);
+CREATE INDEX IF NOT EXISTS outputs_listing ON outputs (kind, folder, name);
+CREATE INDEX IF NOT EXISTS outputs_tool ON outputs (tool);
+CREATE INDEX IF NOT EXISTS outputs_source ON outputs (source);
+"""
+
+
+def audio_duration(path):
+    """Duration in seconds read from the file header, or None."""
+    try:
+        import soundfile as sf
+        info = sf.info(path)
+        return info.frames / info.samplerate
+    except Exception:
+        return None
+
+
+class OutputCatalog:
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        SQLite index of produced outputs (source track, tool, model, format, size, duration, timestamps).
+
+        Finished jobs are added one by one, so listing the output folders is a paged query instead
+        of a directory rescan. sync_folder() reconciles the index with files added or removed
+        outside the app. Safe to use from several threads.
+        """
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _row(self, path, kind, source=None, tool=None, model=None, duration=None, stat=None):
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        name = os.path.basename(path)
+        return (path, kind, os.path.dirname(path), name, source, tool, model,
+                os.path.splitext(name)[1].lstrip(".").lower(), stat.st_size, duration,
+                time.time(), stat.st_mtime)
+
+    def add(self, path, kind, source=None, tool=None, model=None):
+        """Record (or update) one output file."""
+        duration = audio_duration(path) if kind != "transcriptions" else None
+        row = self._row(path, kind, source, tool, model, duration)
+        with self._lock, self._db:
+            self._db.execute(f"INSERT OR REPLACE INTO outputs ({', '.join(COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(COLUMNS))})", row)
+
+    def add_job(self, job):
+        """Record the files a finished SeparationJob produced (its `outputs` dict)."""
+        for key, path in (getattr(job, "outputs", None) or {}).items():
+            kind = OUTPUT_KINDS.get(key)
+            if kind and path and os.path.exists(path):
+                self.add(path, kind, source=job.input_path, tool=job.tool, model=job.options.get("model"))
+
+    def remove(self, path):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM outputs WHERE path = ?", (os.path.abspath(path),))
+
+    def sync_folder(self, folder, kind):
+        """
+        Reconcile the catalog with one folder: add files missing from it, drop rows of deleted files.
+
+        Files found this way have no source/tool/model. Returns (added, removed) counts.
+        """
+        folder = os.path.abspath(folder)
+        found = {}
+        if os.path.isdir(folder):
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(KINDS[kind]):
+                        found[entry.path] = entry
+        with self._lock:
+            known = {row[0] for row in self._db.execute(
+                "SELECT path FROM outputs WHERE kind = ? AND folder = ?", (kind, folder))}
+        new = [self._row(path, kind, stat=found[path].stat()) for path in found.keys() - known]
+        gone = [(path,) for path in known - found.keys()]
+        with self._lock, self._db:
+            self._db.executemany(f"INSERT OR REPLACE INTO outputs ({', '.join(COLUMNS)}) "
+                                 f"VALUES ({', '.join('?' * len(COLUMNS))})", new)
+            self._db.executemany("DELETE FROM outputs WHERE path = ?", gone)
+        return len(new), len(gone)
+
+    def _where(self, kind, folder=None, text=None, tool=None):
+        clauses, params = ["kind = ?"], [kind]
+        if folder:
+            clauses.append("folder = ?")
+            params.append(os.path.abspath(folder))
+        if text:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if tool:
+            clauses.append("tool = ?")
+            params.append(tool)
+        return " AND ".join(clauses), params
+
+    def query(self, kind, folder=None, text=None, tool=None, offset=0, limit=200):
+        """One page of outputs ordered by file name, as a list of dicts (see COLUMNS)."""
+        where, params = self._where(kind, folder, text, tool)
+        with self._lock:
+            rows = self._db.execute(f"SELECT * FROM outputs WHERE {where} ORDER BY name LIMIT ? OFFSET ?",
+                                    params + [int(limit), int(offset)]).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, kind, folder=None, text=None, tool=None):
+        where, params = self._where(kind, folder, text, tool)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM outputs WHERE {where}", params).fetchone()[0]
@@ -0,0 +1,233 @@
+import os
+import subprocess
+import numpy as np
+from separators import cancellation, events
+
+# Inputs longer than this are separated window by window (see separate_file)
+LONG_FORM_SECONDS = 20 * 60
+WINDOW_SECONDS = 30.0
+OVERLAP_SECONDS = 2.0
+READ_BLOCK_SECONDS = 10.0
+
+
+def probe_duration(path):
+    """Duration of an audio file in seconds, or None if it cannot be determined without decoding."""
+    try:
+        import soundfile as sf
+        info = sf.info(path)
+        return info.frames / info.samplerate
+    except Exception:
+        pass
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", path],
+            capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except Exception:
+        return None
+
+
+def use_long_form(path, long_form=None):
+    """Resolve the long_form option: None means 'only for inputs longer than LONG_FORM_SECONDS'."""
+    if long_form is not None:
+        return bool(long_form)
+    duration = probe_duration(path)
+    return duration is not None and duration > LONG_FORM_SECONDS
+
+
+def stream_audio(path, sample_rate, channels=2, block_frames=None):
+    """
+    Decode a file with ffmpeg and yield float32 blocks of shape (frames, channels).
+
+    Only one block is held in memory at a time, so any input length can be streamed.
+    """
+    block_frames = block_frames or int(READ_BLOCK_SECONDS * sample_rate)
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-i", path, "-f", "f32le", "-acodec", "pcm_f32le",
+           "-ac", str(channels), "-ar", str(sample_rate), "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = proc.stdout.read(block_frames * channels * 4)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=np.float32).reshape(-1, channels)
+        proc.wait()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to decode '{path}': {proc.stderr.read().decode(errors='replace')}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+def _fit(block, frames):
+    """Trim or zero-pad a (frames, channels) block to exactly frames rows."""
+    if len(block) >= frames:
+        return block[:frames]
+    pad = np.zeros((frames - len(block),) + block.shape[1:], dtype=block.dtype)
+    return np.concatenate([block, pad])
+
+
+class OverlapAdd:
+    def __init__(self, overlap_frames):
+        """Linear crossfade of consecutive separated windows that overlap by overlap_frames."""
+        self.overlap = overlap_frames
+        ramp = np.linspace(0.0, 1.0, overlap_frames + 2, dtype=np.float32)[1:-1]
+        self.fade_in = ramp[:, None]
+        self.fade_out = 1.0 - self.fade_in
+        self.tails = None
+
+    def add(self, stems, last=False):
+        """
+        Merge one window of separated stems and return the frames that are final.
+
+        Every window but the last keeps its trailing overlap_frames back to crossfade them
+        with the head of the next window.
+        """
+        finished = {}
+        tails = {}
+        for name, estimate in stems.items():
+            estimate = np.array(estimate, dtype=np.float32)
+            if self.tails is not None and self.overlap:
+                head = self.tails[name] * self.fade_out + estimate[:self.overlap] * self.fade_in
+                estimate[:self.overlap] = head
+            if last or not self.overlap:
+                finished[name] = estimate
+            else:
+                finished[name] = estimate[:-self.overlap]
+                tails[name] = estimate[-self.overlap:]
+        self.tails = None if last else tails
+        return finished
+
+
+def window_count(frames, window_frames, overlap_frames):
+    """Number of windows separate_stream() cuts frames into."""
+    if frames <= window_frames:
+        return 1
+    return 1 + -(-(frames - window_frames) // (window_frames - overlap_frames))
+
+
+def separate_stream(blocks, separate_fn, sink, window_frames, overlap_frames, total_frames=None):
+    """
+    Separate an iterable of (frames, channels) blocks in overlapping windows.
+
+    :param blocks: Iterable of float32 arrays of any length (e.g. from stream_audio).
+    :param separate_fn: Callable taking a (frames, channels) window and returning {stem: (frames, channels)}.
+    :param sink: Callable(stem, block) receiving finished frames in order.
+    :param window_frames: Frames handed to separate_fn at once.
+    :param overlap_frames: Frames shared by consecutive windows (at most half a window).
+    :param total_frames: Length of the input if known; progress is then reported window by window
+                         (progress reported by separate_fn covers its own window).
+    :return: Number of frames written per stem.
+    :raises cancellation.Cancelled: Between windows once the current job is canceled; blocks is closed
+                                    then, which stops the ffmpeg process of stream_audio.
+    """
+    if not 0 <= overlap_frames <= window_frames // 2:
+        raise ValueError("overlap must be between 0 and half the window")
+    hop = window_frames - overlap_frames
+    count = window_count(total_frames, window_frames, overlap_frames) if total_frames else None
+    index = 0
+    ola = OverlapAdd(overlap_frames)
+    blocks = iter(blocks)
+    buffer = None
+    exhausted = False
+    written = 0
+    try:
+        while True:
+            cancellation.check()
+            while not exhausted and (buffer is None or len(buffer) < window_frames):
+                try:
+                    block = next(blocks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                buffer = block if buffer is None else np.concatenate([buffer, block])
+            if buffer is None or len(buffer) == 0:
+                break
+            last = exhausted and len(buffer) <= window_frames
+            window = buffer[:window_frames]
+            if count:
+                with events.part(min(index, count - 1), count):
+                    separated = separate_fn(window)
+                index += 1
+                events.progress(index, count, unit="windows")
+            else:
+                separated = separate_fn(window)
+            stems = {name: _fit(np.asarray(est), len(window)) for name, est in separated.items()}
+            finished = ola.add(stems, last=last)
+            for name, block in finished.items():
+                sink(name, block)
+            if finished:
+                written += len(next(iter(finished.values())))
+            if last:
+                break
+            buffer = buffer[hop:]
+    finally:
+        if hasattr(blocks, "close"):
+            blocks.close()
+    return written
+
+
+class MemmapStems:
+    def __init__(self, directory, channels=2):
+        """Sink for separate_stream that appends each stem to a raw float32 file in directory."""
+        self.directory = directory
+        self.channels = channels
+        self._files = {}
+        self._frames = {}
+
+    def __call__(self, name, block):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.directory, f"{name}.f32"), "wb")
+            self._frames[name] = 0
+        self._files[name].write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+        self._frames[name] += len(block)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def arrays(self):
+        """Memory-mapped (frames, channels) views of the finished stems."""
+        self.close()
+        return {
+            name: np.memmap(os.path.join(self.directory, f"{name}.f32"), dtype=np.float32, mode="r",
+                            shape=(frames, self.channels))
+            for name, frames in self._frames.items() if frames
+        }
+
+
+def separate_file(path, separate_fn, sample_rate, temp_dir, channels=2,
+                  window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+    """
+    Stream a file of any length through separate_fn with bounded memory.
+
+    Stems are stored as memory-mapped files in temp_dir, which must outlive the returned arrays.
+    Pass them to audio_writer.write_stems, which encodes them block by block.
+    """
+    sink = MemmapStems(temp_dir, channels)
+    duration = probe_duration(path)
+    try:
+        separate_stream(stream_audio(path, sample_rate, channels), separate_fn, sink,
+                        int(window_seconds * sample_rate), int(overlap_seconds * sample_rate),
+                        total_frames=int(duration * sample_rate) if duration else None)
+    finally:
+        sink.close()
+    return sink.arrays()
+
+
+def separate_array(audio, separate_fn, sample_rate, window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS):
+    """
+    Separate an in-memory (frames, channels) array window by window, reporting progress per window.
+
+    For models that only see a few seconds of context anyway (e.g. Spleeter), the crossfaded
+    windows give the same stems as one call on the whole song.
+    :return: {stem: (frames, channels) array}.
+    """
+    parts = {}
+    separate_stream([audio], separate_fn, lambda name, block: parts.setdefault(name, []).append(block),
+                    int(window_seconds * sample_rate), int(overlap_seconds * sample_rate), total_frames=len(audio))
+    return {name: np.concatenate(blocks) for name, blocks in parts.items()}
+
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+import separators.job_queue as job_queue
+import separators.events as events
+import separators.benchmark as benchmark
+import separators.evaluation as evaluation
+import separators.pipeline as pipeline
+import separators.registry as registry
+import separators.model_registry as model_registry
+import separators.decode_cache as decode_cache
+import separators.result_cache as result_cache
+
+TOOLS = sorted(name.lower() for name in registry.SEPARATORS)
+
+DEFAULT_MODELS = {"spleeter": None, "demucs": "mdx", "openunmix": "umxl"}
+
+
+def collect_inputs(paths, recursive=False):
+    """Expand files and directories given on the command line into a list of audio files."""
+    songs = []
+    for path in paths:
+        if os.path.isdir(path):
+            songs.extend(job_queue.collect_songs(path, recursive=recursive))
+        elif os.path.isfile(path):
+            songs.append(path)
+        else:
+            raise FileNotFoundError(f"Input not found: {path}")
+    return songs
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m separators", description="Headless audio separation.")
+    parser.add_argument("--events", metavar="FILE",
+                        help="Append every log message and timed span (decode, inference, encode, ...) to this "
+                             "JSON lines file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Separate a list of files or directories.")
+    run.add_argument("inputs", nargs="+", help="Audio files and/or directories to separate.")
+    run.add_argument("output", help="Output folder (vocals/, instrumentals/ and text/ are created inside).")
+    run.add_argument("--tool", choices=TOOLS, default="demucs")
+    run.add_argument("--model", help="Model name (e.g. mdx, htdemucs, umxl). Ignored by Spleeter.")
+    run.add_argument("--fmt", choices=["wav", "mp3", "flac"], default="wav")
+    run.add_argument("--sr", type=int, default=44100, help="Sample rate for WAV/FLAC output.")
+    run.add_argument("--bitrate", type=int, default=192, help="MP3 bitrate in kbps.")
+    run.add_argument("--bit-depth", type=int, choices=[16, 24, 32], default=24,
+                     help="WAV/FLAC bit depth; 32 writes float WAV (FLAC stays 24-bit).")
+    run.add_argument("--float32", action="store_true", help="Same as --bit-depth 32.")
+    run.add_argument("--mp3-preset", type=int, default=2, help="MP3 encoder preset, 2=best quality, 7=fastest (Demucs).")
+    run.add_argument("--shifts", type=int, default=1, help="Number of random shifts (Demucs).")
+    run.add_argument("--long-form", choices=["auto", "on", "off"], default="auto",
+                     help="Separate in streamed overlapping windows (auto: inputs longer than 20 minutes).")
+    run.add_argument("--workers", type=int, default=1, help="Number of songs separated in parallel.")
+    run.add_argument("--timeout", type=float, metavar="SECONDS",
+                     help="Stop a song (and mark it failed) once it has run this long.")
+    run.add_argument("--recursive", action="store_true", help="Include subfolders of input directories.")
+    run.add_argument("--transcribe", action="store_true", help="Transcribe the separated vocals.")
+    run.add_argument("--trans-tool", choices=["whisper", "wav2vec2", "coqui"], default="whisper")
+    run.add_argument("--trans-model", default="tiny")
+    run.add_argument("--trans-ram-budget", type=float, default=model_registry.DEFAULT_BUDGET_MB,
+                     help="RAM budget in MB for cached transcription models.")
+    run.add_argument("--decode-cache-mb", type=float, default=decode_cache.DEFAULT_CACHE_MB,
+                     help="Disk budget in MB for decoded input audio reused across runs (0 disables).")
+    run.add_argument("--result-cache-mb", type=float, default=result_cache.DEFAULT_CACHE_MB,
+                     help="Disk budget in MB for separated stems reused by identical jobs (0 disables).")
+    run.add_argument("--summary", help="Also write the JSON summary to this file.")
+
+    evaluate = commands.add_parser("evaluate", help="Score configurations with museval on a MUSDB-style dataset.")
+    evaluate.add_argument("dataset", help="Folder of track folders with mixture.wav, vocals.wav and the other stems.")
+    evaluate.add_argument("output", help="Folder for the separated stems and per-track results.")
+    evaluate.add_argument("--config", action="append", dest="configs", metavar="TOOL[:MODEL[:SHIFTS]]",
+                          help="Configuration to evaluate, e.g. demucs:htdemucs:2 (repeatable; default demucs:mdx).")
+    evaluate.add_argument("--track", action="append", dest="tracks", help="Only evaluate this track (repeatable).")
+    evaluate.add_argument("--workers", type=int, help="Processes computing metrics (default: all CPUs but one).")
+    evaluate.add_argument("--chunk-seconds", type=float, metavar="SECONDS",
+                          help="Score tracks in chunks of this length in parallel. Faster on a few long tracks, "
+                               "but the scores are approximate and not comparable with standard museval scores.")
+    evaluate.add_argument("--no-resume", dest="resume", action="store_false",
+                          help="Evaluate tracks again even if their results are already in the output folder.")
+    evaluate.add_argument("--summary", help="Also write the JSON summary to this file.")
+
+    bench = commands.add_parser("benchmark", help="Measure speed and memory of configurations on synthetic audio.")
+    bench.add_argument("output", help="JSON file for the results.")
+    bench.add_argument("--config", action="append", dest="configs", metavar="TOOL[:MODEL[:SHIFTS]]",
+                       help="Configuration to benchmark (repeatable; default: every tool and model).")
+    bench.add_argument("--length", action="append", dest="lengths", type=float, metavar="SECONDS",
+                       help="Length of a synthetic song (repeatable; default: 30 and 120).")
+    bench.add_argument("--format", action="append", dest="formats", choices=list(benchmark.FORMATS),
+                       help="Output format to time encoding for (repeatable; default: all).")
+    bench.add_argument("--baseline", help="Earlier results to compare with; regressions fail the run.")
+    bench.add_argument("--tolerance", type=float, default=benchmark.TOLERANCE,
+                       help="Relative increase over the baseline that counts as a regression.")
+    bench.add_argument("--summary", help="Also write the JSON summary to this file.")
+    return parser
+
+
+def job_options(args):
+    """Translate parsed arguments into the options dict stored in each SeparationJob."""
+    return {
+        "model": args.model or DEFAULT_MODELS[args.tool],
+        "fmt": args.fmt,
+        "sr": args.sr if args.fmt in ["wav", "flac"] else None,
+        "bitrate": args.bitrate if args.fmt == "mp3" else None,
+        "bit_depth": (32 if args.float32 else args.bit_depth) if args.fmt in ["wav", "flac"] else None,
+        "mp3_preset": args.mp3_preset if args.fmt == "mp3" else None,
+        "shifts": args.shifts,
+        "do_transcribe": args.transcribe,
+        "trans_tool": args.trans_tool,
+        "trans_model": args.trans_model,
+        "long_form": {"auto": None, "on": True, "off": False}[args.long_form],
+        "timeout": args.timeout,
+    }
+
+
+def run(args):
+    songs = collect_inputs(args.inputs, recursive=args.recursive)
+    tool_name = registry.canonical_tool(args.tool)
+    options = job_options(args)
+    vocals_folder = os.path.join(args.output, "vocals")
+    instr_folder = os.path.join(args.output, "instrumentals")
+    trans_folder = os.path.join(args.output, "text")
+    for folder in (vocals_folder, instr_folder, trans_folder):
+        os.makedirs(folder, exist_ok=True)
+
+    model_registry.get_registry().set_budget(args.trans_ram_budget)
+    decode_cache.get_cache().set_max_mb(args.decode_cache_mb)
+    result_cache.get_cache().set_max_mb(args.result_cache_mb)
+
+    started = time.time()
+    load_start = time.perf_counter()
+    separator = registry.SeparatorRegistry().get(tool_name)
+    if hasattr(separator, "warm_up"):
+        # Load model weights up front so per-song timings only measure separation
+        separator.warm_up(options["model"])
+    load_seconds = time.perf_counter() - load_start
+
+    # Decoding, encoding and transcription of other songs overlap with separation
+    stages = pipeline.StagedPipeline(separate_workers=args.workers)
+    queue = job_queue.JobQueue(lambda job, start: stages.run(separator, job, start),
+                               max_workers=stages.capacity, defer_start=True)
+    timings = events.get_stream().subscribe(events.SpanTotals())
+    try:
+        jobs = queue.submit_many(
+            job_queue.SeparationJob(song, tool_name, vocals_folder, instr_folder, trans_folder, options)
+            for song in songs
+        )
+        queue.wait()
+    except KeyboardInterrupt:
+        # Stop the running songs at their next checkpoint so their temp files are removed
+        queue.cancel_pending()
+        queue.cancel_running()
+        queue.wait()
+        raise
+    finally:
+        events.get_stream().unsubscribe(timings)
+    total_seconds = time.time() - started
+
+    counts = queue.counts()
+    return {
+        "tool": tool_name,
+        "options": options,
+        "workers": max(1, args.workers),
+        "songs": len(jobs),
+        "counts": counts,
+        "load_seconds": round(load_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "songs_per_hour": round(queue.throughput(), 2),
+        "stage_seconds": timings.totals(),
+        "jobs": [
+            {
+                "input": job.input_path,
+                "state": job.state,
+                "seconds": round(job.duration, 3) if job.duration is not None else None,
+                "stage_seconds": timings.totals(job.id),
+                "error": job.error,
+                "outputs": job.outputs,
+            }
+            for job in jobs
+        ],
+    }
+
+
+def run_evaluation(args):
+    configs = [evaluation.parse_config(text) for text in (args.configs or ["demucs:mdx"])]
+    results = evaluation.evaluate(args.dataset, configs, args.output, tracks=args.tracks, workers=args.workers,
+                                  chunk_seconds=args.chunk_seconds, resume=args.resume)
+    return {"counts": {job_queue.FAILED: sum(1 for result in results.values()
+                                             for track in result["tracks"].values() if "error" in track)},
+            "results": results}
+
+
+def run_benchmark(args):
+    configs = [evaluation.parse_config(text) for text in (args.configs or benchmark.CONFIGS)]
+    results = benchmark.run(configs, lengths=args.lengths or benchmark.LENGTHS,
+                            formats=args.formats or benchmark.FORMATS)
+    benchmark.save(results, args.output)
+    failed = [label for label, result in results["results"].items() if "error" in result]
+    regressions = []
+    if args.baseline:
+        regressions = benchmark.compare(results, benchmark.load(args.baseline), tolerance=args.tolerance)
+        if regressions:
+            print("Benchmark: Regressions against the baseline:\n" + benchmark.format_regressions(regressions))
+    return {"counts": {job_queue.FAILED: len(failed) + len(regressions)}, "failed": failed,
+            "regressions": regressions, "results": results}
+
+
+COMMANDS = {"run": run, "evaluate": run_evaluation, "benchmark": run_benchmark}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stdout = sys.stdout
+    writer = events.get_stream().subscribe(events.JsonlWriter(args.events)) if args.events else None
+    # Separator progress messages go to stderr so stdout only carries the JSON summary
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            summary = COMMANDS[args.command](args)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        finally:
+            if writer is not None:
+                events.get_stream().unsubscribe(writer)
+                writer.close()
+    text = json.dumps(summary, indent=2)
+    print(text, file=stdout)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0 if summary["counts"][job_queue.FAILED] == 0 else 1
@@ -1,46 +1,112 @@
 import os
 import stt
+import numpy as np
+from separators.model_registry import get_registry
+from separators import cancellation, chunked, events, transcription, vad
+
+CHUNK_SECONDS = 0.5  # Audio fed to the stream at a time
+SEGMENT_MIN_SECONDS = 10.0  # A stream is finished at the first quiet chunk after this long...
+SEGMENT_MAX_SECONDS = 30.0  # ... or after this long in any case
 
 class CoquiTranscription:
     def __init__(self, model_path="models/coqui/model.pbmm", scorer_path="models/coqui/model.scorer"):
         self.model_path = model_path
         self.scorer_path = scorer_path
-        self.model = None
-        self.load_model()
-
-    def load_model(self):
-        """Load the Coqui STT model."""
-        if not os.path.exists(self.model_path):
-            raise FileNotFoundError(f"Coqui model not found at '{self.model_path}'. Download from https://coqui.ai/models and place in 'models/coqui/'.")
-        self.model = stt.Model(self.model_path)
-        if os.path.exists(self.scorer_path):
-            self.model.enableExternalScorer(self.scorer_path)
-        print(f"Coqui: Model loaded from '{self.model_path}'.")
-
-    def transcribe(self, audio_path: str, output_path: str, model_name: str, verbose: bool = False):
+        self.registry = get_registry()
+
+    def _resolve_model_path(self, model_name):
+        """Model names from settings (e.g. "model.pbmm") are looked up next to the default model."""
+        if not model_name:
+            return self.model_path
+        if os.path.dirname(model_name):
+            return model_name
+        return os.path.join(os.path.dirname(self.model_path), model_name)
+
+    def load_model(self, model_name: str = None):
+        """Load the Coqui STT model through the shared model registry."""
+        model_path = self._resolve_model_path(model_name)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Coqui model not found at '{model_path}'. Download from https://coqui.ai/models and place in 'models/coqui/'.")
+        scorer_path = os.path.join(os.path.dirname(model_path), os.path.basename(self.scorer_path))
+        def loader():
+            model = stt.Model(model_path)
+            if os.path.exists(scorer_path):
+                model.enableExternalScorer(scorer_path)
+            events.log("Coqui", f"Model loaded from '{model_path}'.")
+            return model
+        # The native model is not a torch module, so account for it by its file sizes
+        size = os.path.getsize(model_path) + (os.path.getsize(scorer_path) if os.path.exists(scorer_path) else 0)
+        return self.registry.get("coqui", model_path, loader, size_bytes=size)
+
+    def _chunks(self, audio, sample_rate=None):
+        """16 kHz 16-bit PCM chunks of the input; files are decoded by ffmpeg as they are read."""
+        chunk = int(CHUNK_SECONDS * transcription.SPEECH_RATE)
+        if sample_rate is None:
+            blocks = (block[:, 0] for block in chunked.stream_audio(audio, transcription.SPEECH_RATE, channels=1,
+                                                                   block_frames=chunk))
+        else:
+            speech = transcription.speech_audio(audio, sample_rate)
+            blocks = (speech[start:start + chunk] for start in range(0, len(speech), chunk))
+        for block in blocks:
+            yield (np.clip(block, -1.0, 1.0) * 32767).astype(np.int16)
+
+    @staticmethod
+    def _write_segment(f, text, start, end):
+        if text.strip():
+            f.write(f"{start / transcription.SPEECH_RATE:.2f}s - {end / transcription.SPEECH_RATE:.2f}s: {text}\n")
+            f.flush()  # The transcript grows while the song is still being transcribed
+
+    def transcribe(self, audio, output_path: str, model_name: str = None, verbose: bool = False, sample_rate=None):
         """
-        Transcribe the audio file using Coqui STT and save to output_path.
+        Transcribe audio with Coqui STT's streaming API, appending timed segments to output_path as they finish.
+
+        Audio is fed in CHUNK_SECONDS chunks, and the stream is finished and restarted at a pause
+        after SEGMENT_MIN_SECONDS (at the latest after SEGMENT_MAX_SECONDS), so memory stays flat
+        for inputs of any length.
         
-        :param audio_path: Path to the audio file (e.g., vocals.wav).
+        :param audio: Path to the audio file (e.g., vocals.wav), or a float array of samples at sample_rate.
         :param output_path: Path to save the transcription (e.g., transcription.txt).
-        :param model_name: Not used (placeholder).
-        :param verbose: If True, enable verbose output.
+        :param model_name: Model file name in the models folder (e.g. "model.pbmm") or a path.
+        :param verbose: If True, print the partial result of the running segment after each chunk.
+        :param sample_rate: Rate of an in-memory array, which is downmixed to mono and resampled to 16 kHz.
         :return: True if successful, False otherwise.
         """
+        stream = None
         try:
-            if not os.path.exists(audio_path):
-                raise FileNotFoundError(f"Audio file not found: {audio_path}")
+            if sample_rate is None and not os.path.exists(audio):
+                raise FileNotFoundError(f"Audio file not found: {audio}")
             
-            # Transcribe
-            transcription = self.model.stt(stt.read_audio_file(audio_path))
-            
-            # Write to file
+            model = self.load_model(model_name)
+
             with open(output_path, "w", encoding="utf-8") as f:
-                f.write(f"Transcription (Coqui STT):\n{transcription}\n")
+                f.write("Transcription (Coqui STT):\n")
+                stream = model.createStream()
+                segment_start = position = 0
+                for samples in self._chunks(audio, sample_rate):
+                    cancellation.check()
+                    stream.feedAudioContent(samples)
+                    position += len(samples)
+                    length = (position - segment_start) / transcription.SPEECH_RATE
+                    level = vad.frame_energy_db(samples / 32768.0, transcription.SPEECH_RATE)
+                    quiet = level.max(initial=-np.inf) < vad.FLOOR_DB
+                    if length >= SEGMENT_MAX_SECONDS or (length >= SEGMENT_MIN_SECONDS and quiet):
+                        text, stream = stream.finishStream(), None
+                        self._write_segment(f, text, segment_start, position)
+                        stream = model.createStream()
+                        segment_start = position
+                    elif verbose:
+                        events.log("Coqui", f"... {stream.intermediateDecode()}")
+                text, stream = stream.finishStream(), None
+                self._write_segment(f, text, segment_start, position)
             
-            print(f"Coqui: Transcription saved to '{output_path}'.")
+            events.log("Coqui", f"Transcription saved to '{output_path}'.")
             return True
         
+        except cancellation.Cancelled:
+            raise  # Ends the job as canceled instead of as a failed transcription
         except Exception as e:
-            print(f"Coqui transcription error: {e}")
-            return False
\ No newline at end of file
+            events.log("Coqui", f"Transcription error: {e}", level="error")
+            return False
+        finally:
+            if stream is not None:
+                stream.freeStream()  # Release the native decoder state of an interrupted stream
@@ -0,0 +1,65 @@
+import numpy as np
+
+WINDOW_SECONDS = 20.0
+CONTEXT_SECONDS = 2.0  # Audio on each side of a window's kept part, so edge frames see both neighbours
+SEGMENT_GAP_SECONDS = 0.8  # A pause this long between words starts a new segment
+SEGMENT_MAX_SECONDS = 10.0
+
+
+def plan_windows(frames, sample_rate, window_seconds=WINDOW_SECONDS, context_seconds=CONTEXT_SECONDS, ratio=320):
+    """
+    Split a signal into strided, overlapping windows for a CTC model.
+
+    Each window reads `context` samples on both sides of the part whose logits are kept, so
+    the kept parts tile the signal exactly. Boundaries are multiples of ratio (input samples
+    per logit frame), so kept parts map onto whole logit frames.
+
+    :return: List of (start, end, keep_start, keep_end) sample indices; keep_* are relative to start.
+    """
+    window = max(ratio, int(window_seconds * sample_rate) // ratio * ratio)
+    context = min(int(context_seconds * sample_rate) // ratio * ratio, (window - ratio) // 2)
+    plan = []
+    kept = 0
+    while kept < frames:
+        # The last window is moved back to full length rather than ending in a sliver of audio
+        last_start = -(-(frames - window) // ratio) * ratio
+        start = max(0, min(kept - context, last_start))
+        end = min(frames, start + window)
+        keep_end = frames if end == frames else end - context
+        plan.append((start, end, kept - start, keep_end - start))
+        kept = keep_end
+    return plan
+
+
+def stitch(logits, plan, ratio=320):
+    """
+    Concatenate the kept logit frames of each window.
+
+    :param logits: One (frames, vocabulary) array per window in plan, in order.
+    :return: (frames, vocabulary) array covering the whole signal.
+    """
+    parts = []
+    for window_logits, (_, _, keep_start, keep_end) in zip(logits, plan):
+        first = keep_start // ratio
+        last = min(len(window_logits), -(-keep_end // ratio))
+        parts.append(window_logits[first:last])
+    return np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+
+def segments(words, seconds_per_frame, max_gap=SEGMENT_GAP_SECONDS, max_length=SEGMENT_MAX_SECONDS):
+    """
+    Group CTC word offsets into timed segments.
+
+    :param words: Dicts with "word", "start_offset" and "end_offset" (logit frames), as returned by
+                  a Wav2Vec2 tokenizer decoded with output_word_offsets=True.
+    :return: List of {"start", "end", "text"} dicts in seconds, like Whisper segments.
+    """
+    result = []
+    for word in words:
+        start, end = word["start_offset"] * seconds_per_frame, word["end_offset"] * seconds_per_frame
+        if result and start - result[-1]["end"] < max_gap and end - result[-1]["start"] <= max_length:
+            result[-1]["end"] = end
+            result[-1]["text"] += " " + word["word"]
+        else:
+            result.append({"start": start, "end": end, "text": word["word"]})
+    return result
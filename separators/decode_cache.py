@@ -0,0 +1,199 @@
+import os
+import uuid
+import hashlib
+import threading
+import contextlib
+import numpy as np
+import soundfile as sf
+from separators import chunked, events, resample
+
+DEFAULT_CACHE_MB = 2048
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "separation_app", "decoded")
+
+
+def file_hash(path, block_size=1 << 20):
+    """BLAKE2b digest of a file's content (the same song under two names shares one cache entry)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_H = 0.5 ** 0.5  # -3 dB
+# (left gain, right gain) of each channel in the default WAV/FLAC order for 3 to 8 channels
+_SPEAKERS = {"L": (1.0, 0.0), "R": (0.0, 1.0), "C": (_H, _H), "LFE": (0.0, 0.0),
+             "SL": (_H, 0.0), "SR": (0.0, _H), "BC": (0.5, 0.5)}
+_LAYOUTS = {3: ("L", "R", "C"),
+            4: ("L", "R", "SL", "SR"),
+            5: ("L", "R", "C", "SL", "SR"),
+            6: ("L", "R", "C", "LFE", "SL", "SR"),
+            7: ("L", "R", "C", "LFE", "BC", "SL", "SR"),
+            8: ("L", "R", "C", "LFE", "SL", "SR", "SL", "SR")}
+
+
+def downmix_stereo(audio):
+    """
+    Downmix a (frames, channels) array with more than 2 channels to stereo.
+
+    Center and surrounds go in at -3 dB and LFE is dropped, as ffmpeg -ac 2 does; the matrix is
+    scaled so full-scale input cannot clip. Unknown layouts put even channels left, odd ones right.
+    """
+    layout = _LAYOUTS.get(audio.shape[1])
+    if layout:
+        matrix = np.array([_SPEAKERS[name] for name in layout], dtype=np.float32)
+    else:
+        matrix = np.zeros((audio.shape[1], 2), dtype=np.float32)
+        matrix[0::2, 0] = matrix[1::2, 1] = 1.0
+    matrix /= matrix.sum(axis=0).max()
+    return audio @ matrix
+
+
+def decode(path, sample_rate, channels=2):
+    """Decode a file to a float32 (frames, channels) array at sample_rate (soundfile first, then ffmpeg)."""
+    try:
+        audio, file_sr = sf.read(path, dtype="float32", always_2d=True)
+    except Exception:
+        blocks = list(chunked.stream_audio(path, sample_rate, channels))
+        return np.concatenate(blocks) if blocks else np.zeros((0, channels), dtype=np.float32)
+    if audio.shape[1] > 2 and channels == 2:
+        audio = downmix_stereo(audio)
+    elif audio.shape[1] != channels:
+        # Mono is duplicated, anything else is averaged first
+        audio = np.repeat(audio.mean(axis=1, keepdims=True), channels, axis=1)
+    if file_sr != sample_rate:
+        audio = resample.resample(audio, file_sr, sample_rate)
+    return audio
+
+
+class DecodeCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_mb=DEFAULT_CACHE_MB):
+        """
+        Decoded PCM keyed by (file content hash, sample rate, channels), stored as .npy files.
+
+        Hits are memory-mapped, so a song that was decoded once (by any separator) costs nothing
+        to decode again. Least recently used files are deleted once the directory exceeds max_mb;
+        max_mb=0 disables the cache.
+        """
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._hashes = {}  # (path, size, mtime) -> content hash
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> [lock, number of loads using it]
+
+    def set_max_mb(self, max_mb):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.evict()
+
+    def content_hash(self, path):
+        """Content hash of path, recomputed only when its size or modification time changes."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is None:
+            digest = file_hash(path)
+            with self._lock:
+                self._hashes[key] = digest
+        return digest
+
+    @contextlib.contextmanager
+    def _key_lock(self, key):
+        """Hold the lock of one key; its entry is dropped once no load uses it any more."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def load(self, path, sample_rate, channels=2):
+        """
+        Return the decoded audio of path as a read-only float32 (frames, channels) array.
+
+        :return: A memmap on a cache hit or after storing, or an in-memory array when caching is disabled.
+        """
+        if self.max_bytes <= 0:
+            return decode(path, sample_rate, channels)
+        key = f"{self.content_hash(path)}_{int(sample_rate)}_{channels}"
+        cached = os.path.join(self.directory, f"{key}.npy")
+        with self._key_lock(key):  # Two workers asking for the same song decode it once
+            if os.path.exists(cached):
+                try:
+                    audio = np.load(cached, mmap_mode="r")
+                    os.utime(cached)  # Mark as recently used
+                    events.log("Decode cache", f"Hit for {os.path.basename(path)}")
+                    return audio
+                except (OSError, ValueError):
+                    pass  # Truncated or unreadable entry; decode again
+            audio = decode(path, sample_rate, channels)
+            os.makedirs(self.directory, exist_ok=True)
+            temp = os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(temp, "wb") as f:
+                    np.save(f, audio)
+                os.replace(temp, cached)
+            except OSError as e:
+                events.log("Decode cache", f"Could not store {os.path.basename(path)}: {e}", level="error")
+                if os.path.exists(temp):
+                    os.remove(temp)
+                return audio
+        self.evict(keep=cached)
+        return np.load(cached, mmap_mode="r")
+
+    def entries(self):
+        """List of (path, size in bytes, last use time), least recently used first."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                full = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((full, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits max_bytes; returns the removed paths."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # Still mapped by a running job (Windows); try again next time
+            total -= size
+            removed.append(path)
+        return removed
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_cache = DecodeCache(os.environ.get("DECODE_CACHE_DIR", DEFAULT_DIRECTORY),
+                     float(os.environ.get("DECODE_CACHE_MB", DEFAULT_CACHE_MB)))
+
+
+def get_cache():
+    """The decode cache shared by every separator in this process."""
+    return _cache
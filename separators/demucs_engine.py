@@ -0,0 +1,88 @@
+import time
+import threading
+import torch
+from demucs.pretrained import get_model
+import demucs.apply
+from demucs.apply import apply_model, BagOfModels
+from separators import decode_cache, events
+
+# apply_model reports finished segments through tqdm; they become progress events
+events.report_tqdm(demucs.apply)
+
+
+class DemucsEngine:
+    def __init__(self, device=None):
+        """
+        Keeps Demucs models loaded between songs and runs inference in-process.
+
+        Models are cached per (model name, device), so the weights of a model (or of every
+        member of a bag of models such as mdx_extra) are loaded once instead of once per song.
+        """
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self._models = {}
+        self._lock = threading.Lock()
+        self.load_times = {}  # model name -> seconds spent loading it
+
+    def load(self, name: str):
+        """Return the cached model, loading it on first use."""
+        key = (name, str(self.device))
+        with self._lock:
+            if key not in self._models:
+                events.log("Demucs", f"Loading model '{name}' on {self.device}...")
+                start = time.perf_counter()
+                with events.span(events.MODEL_LOAD, tool="Demucs", model=name):
+                    model = get_model(name)
+                    model.to(self.device)
+                    model.eval()
+                self._models[key] = model
+                self.load_times[name] = time.perf_counter() - start
+                members = len(model.models) if isinstance(model, BagOfModels) else 1
+                events.log("Demucs", f"Model '{name}' ({members} network(s)) loaded in {self.load_times[name]:.1f}s")
+            return self._models[key]
+
+    def unload(self, name: str = None):
+        """Forget one model (or all of them when name is None)."""
+        with self._lock:
+            for key in list(self._models):
+                if name is None or key[0] == name:
+                    del self._models[key]
+
+    def load_track(self, path: str, name: str):
+        """Decode a file (through the shared decode cache) to a (channels, samples) tensor at the model's rate."""
+        model = self.load(name)
+        audio = decode_cache.get_cache().load(path, model.samplerate, model.audio_channels)
+        return torch.from_numpy(audio.T.copy())
+
+    def separate_many(self, name: str, mixes, shifts=1, overlap=0.25, split=True):
+        """
+        Separate several tracks with one loaded model.
+
+        :param name: Demucs model name (e.g. "mdx", "mdx_extra", "htdemucs").
+        :param mixes: Iterable of (channels, samples) tensors at the model's sample rate.
+        :return: Generator of {source name: (channels, samples) tensor} dicts, one per mix.
+        """
+        model = self.load(name)
+        # One pass over the segments per network in the bag and per shift
+        passes = (len(model.models) if isinstance(model, BagOfModels) else 1) * max(1, shifts)
+        for mix in mixes:
+            # Normalize like demucs.separate does, then undo it on the estimates
+            ref = mix.mean(0)
+            mean, std = ref.mean(), ref.std()
+            std = std if std > 0 else 1.0
+            with torch.no_grad(), events.bars(passes):
+                sources = apply_model(model, ((mix - mean) / std)[None], shifts=shifts, split=split,
+                                      overlap=overlap, progress=True, device=self.device)[0]
+            sources = sources * std + mean
+            yield dict(zip(model.sources, sources.cpu()))
+
+    def separate(self, name: str, mix, shifts=1, overlap=0.25, split=True):
+        """Separate a single (channels, samples) tensor; see separate_many."""
+        return next(self.separate_many(name, [mix], shifts=shifts, overlap=overlap, split=split))
+
+    @staticmethod
+    def two_stems(sources: dict, stem: str = "vocals"):
+        """Collapse a source dict into (stem, everything else), like demucs --two-stems."""
+        if stem not in sources:
+            raise ValueError(f"Model has no '{stem}' source (sources: {list(sources)})")
+        rest = sum(wav for source, wav in sources.items() if source != stem)
+        return sources[stem], rest
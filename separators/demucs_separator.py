@@ -1,153 +1,153 @@
 import os
-import shutil
-import sys
-import tempfile
-from demucs.separate import main as demucs_main
-from pydub import AudioSegment  # For fallback WAV resampling if needed
-# Transcription tools
-import separators.whisper_transcription as whisper_trans
-#import separators.wav2vec2_transcription as wav2vec2_trans 
-#import separators.coqui_transcription as coqui_trans 
+import torch
+from separators.demucs_engine import DemucsEngine
+from separators import cancellation, chunked, events, pipeline, result_cache
 
 class DemucsSeparator:
-    def __init__(self):
+    def __init__(self, device=None):
         try:
-            from demucs.separate import main
-            print("Demucs initialized successfully")
+            # Models stay loaded in the engine between songs
+            self.engine = DemucsEngine(device)
+            events.log("Demucs", f"Initialized successfully on {self.engine.device}")
         except ImportError as e:
             raise ImportError(f"Demucs not installed properly: {e}. Run 'pip install demucs'.")
-        self.whisper_trans = whisper_trans.WhisperTranscription()
-        #self.wav2vec2_trans = wav2vec2_trans.Wav2Vec2Transcription() 
-        #self.coqui_trans = coqui_trans.CoquiTranscription()
 
-    def _get_unique_filename(self, base_path):
-        """Generate a unique filename by appending _1, _2, etc., if the file exists."""
-        if not os.path.exists(base_path):
-            return base_path
-        base, ext = os.path.splitext(base_path)
-        counter = 1
-        while True:
-            new_path = f"{base}_{counter}{ext}"
-            if not os.path.exists(new_path):
-                return new_path
-            counter += 1
+    def warm_up(self, model="mdx"):
+        """Load the model ahead of the first song; returns the seconds spent loading."""
+        self.engine.load(model)
+        return self.engine.load_times.get(model, 0.0)
 
-    def separate(self, 
-                input_path: str, 
-                song_name: str, 
-                vocals_dir: str, 
+    def _stem_paths(self, song_name, vocals_dir, instr_dir, fmt):
+        """(stem, base output path) pairs of one song."""
+        return [("vocals", os.path.join(vocals_dir, f"{song_name}_D_vocals.{fmt}")),
+                ("instrumental", os.path.join(instr_dir, f"{song_name}_D_instrumental.{fmt}"))]
+
+    def prepare(self,
+                input_path: str,
+                song_name: str,
+                vocals_dir: str,
                 instr_dir: str,
-                trans_folder: str, 
-                model="mdx", 
-                fmt="wav", 
-                sr=44100, 
-                bitrate="128k", 
-                bit_depth=True, 
-                mp3_preset=2, 
-                shifts=1, 
+                trans_folder: str,
+                model="mdx",
+                fmt="wav",
+                sr=44100,
+                bitrate="128k",
+                bit_depth=True,
+                mp3_preset=2,
+                shifts=1,
                 do_transcribe=False,
-                trans_tool="whisper", 
-                trans_model="tiny"):
-        try:
-            if not os.path.exists(input_path):
-                raise FileNotFoundError(f"Input file not found: {input_path}")
-            print(f"Demucs: Processing input: {input_path}")
-
-            # Validate fmt and mutually exclusive bit depth options
-            supported_fmts = ["wav", "mp3", "flac"]
-            if fmt not in supported_fmts:
-                raise ValueError(f"Unsupported format '{fmt}'. Supported: {supported_fmts}")
-            if bit_depth:
-                int24 = True
-                float32 = False
-            else:
-                int24 = True
-                float32 = False
-
-            # Create temp dir for processing
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Prepare Demucs arguments
-                args = [
-                    "--two-stems=vocals",
-                    "-n", model,
-                    "--out", temp_dir,  # Output to temp dir
-                    "--shifts", str(shifts),
-                ]
-                # Map fmt to Demucs format flags
-                if fmt == "flac":
-                    args.append("--flac")
-                elif fmt == "mp3":
-                    args.append("--mp3")
-                    args.extend(["--mp3-bitrate", str(bitrate)])
-                    args.extend(["--mp3-preset", str(mp3_preset)])
-                elif fmt == "wav":
-                    if int24:
-                        args.append("--int24")
-                    elif float32:
-                        args.append("--float32")
-
-                args.append(input_path)
-
-                print(f"Demucs: Running with args: {args}")
-
-                demucs_main(args)
-                print(f"Demucs: Separation completed for {song_name}")
-
-                # Demucs outputs to a subfolder like "temp_dir/mdx/song_name/"
-                model_dir = os.path.join(temp_dir, model)
-                output_subdir = os.path.join(model_dir, song_name)
-                vocals_src = os.path.join(output_subdir, f"vocals.{fmt}")
-                instr_src = os.path.join(output_subdir, f"no_vocals.{fmt}")
-
-                if not os.path.exists(vocals_src) or not os.path.exists(instr_src):
-                    raise FileNotFoundError(f"Demucs output files not found in {output_subdir}")
-
-                # Ensure final folders exist
-                os.makedirs(vocals_dir, exist_ok=True)
-                os.makedirs(instr_dir, exist_ok=True)
-
-                # Generate unique destination paths
-                base_vocals_dest = os.path.join(vocals_dir, f"{song_name}_D_vocals.{fmt}")
-                base_instr_dest = os.path.join(instr_dir, f"{song_name}_D_instrumental.{fmt}")
-
-                vocals_dest = self._get_unique_filename(base_vocals_dest)
-                instr_dest = self._get_unique_filename(base_instr_dest)
-
-                # If output is WAV or FLAC and resampling is needed, use pydub; otherwise, move directly
-                if (fmt == "wav" or fmt == "flac") and sr != 44100:  # Assuming Demucs outputs at 44.1kHz
-                    audio_vocals = AudioSegment.from_wav(vocals_src)
-                    audio_vocals = audio_vocals.set_frame_rate(sr)
-                    audio_vocals.export(vocals_dest, format=fmt)
-
-                    audio_instr = AudioSegment.from_wav(instr_src)
-                    audio_instr = audio_instr.set_frame_rate(sr)
-                    audio_instr.export(instr_dest, format=fmt)
-                else:
-                    # Move files directly (Demucs handled format/bitrate/bit depth)
-                    shutil.move(vocals_src, vocals_dest)
-                    shutil.move(instr_src, instr_dest)
-
-                print(f"Demucs separation successful for {song_name} in {fmt} format. Files saved as: {vocals_dest}, {instr_dest}")
-                
-                if do_transcribe:
-                    trans_path = os.path.join(trans_folder, f"{song_name}_D_transcription.txt")
-                    if trans_tool == "whisper":
-                        success_trans = self.whisper_trans.transcribe(vocals_dest, trans_path, trans_model)
-                    elif trans_tool == "wav2vec2":
-                        print("Placeholder for wav2vec2 transcription tool")
-                        #success_trans = self.wav2vec2_trans.transcribe(vocals_dest, trans_path, trans_model)
-                    elif trans_tool == "coqui":
-                        print("Placeholder for coqui transcription tool")
-                        #success_trans = self.coqui_trans.transcribe(vocals_dest, trans_path, trans_model)
-                    else:
-                        print(f"Demucs: Unknown transcription tool '{trans_tool}'.")
-                        success_trans = False
-                    if success_trans:
-                        print(f"Demucs: Transcription completed for {song_name} by '{trans_tool}' using '{trans_model}'.")
-                    else:
-                        print(f"Demucs: Transcription failed for {song_name} by '{trans_tool}' using '{trans_model}'.")
-                return True
-
-        except Exception as e:
-            print(f"Demucs separation error: {str(e)}", file=sys.stderr)
-            return False
\ No newline at end of file
+                trans_tool="whisper",
+                trans_model="tiny",
+                long_form=None,
+                outputs=None):
+        """Check the input and settings and describe where the stems go; returns a pipeline.Track."""
+        # Validate fmt
+        supported_fmts = ["wav", "mp3", "flac"]
+        if fmt not in supported_fmts:
+            raise ValueError(f"Unsupported format '{fmt}'. Supported: {supported_fmts}")
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+        # Ensure final folders exist
+        os.makedirs(vocals_dir, exist_ok=True)
+        os.makedirs(instr_dir, exist_ok=True)
+
+        return pipeline.Track(
+            "Demucs", input_path, song_name,
+            stem_paths=self._stem_paths(song_name, vocals_dir, instr_dir, fmt),
+            cache_key=result_cache.get_cache().key(input_path, "Demucs", model, shifts),
+            fmt=fmt, writer_options={"out_sr": sr, "bit_depth": bit_depth, "bitrate": bitrate,
+                                     "mp3_preset": mp3_preset, "clip": "rescale"},
+            model=model, shifts=shifts,
+            trans_path=os.path.join(trans_folder, f"{song_name}_D_transcription.txt"),
+            do_transcribe=do_transcribe, trans_tool=trans_tool, trans_model=trans_model,
+            long_form=chunked.use_long_form(input_path, long_form), outputs=outputs)
+
+    def decode(self, track):
+        events.log("Demucs", f"Processing input: {track.input_path}")
+        track.audio = self.engine.load_track(track.input_path, track.model)
+
+    def infer(self, track):
+        """Separate the decoded song (or a long recording window by window) into vocals and instrumental."""
+        loaded = self.engine.load(track.model)
+        track.sample_rate = loaded.samplerate
+        if track.long_form:
+            def separate_window(window):
+                wav = torch.from_numpy(window.T.copy())
+                vocals, instrumental = self.engine.two_stems(
+                    self.engine.separate(track.model, wav, shifts=track.shifts), "vocals")
+                return {"vocals": vocals.cpu().numpy().T, "instrumental": instrumental.cpu().numpy().T}
+
+            # Memory does not grow with the length of the recording
+            track.stems = chunked.separate_file(track.input_path, separate_window, loaded.samplerate,
+                                                track.make_temp_dir(), channels=loaded.audio_channels)
+        else:
+            vocals, instrumental = self.engine.two_stems(
+                self.engine.separate(track.model, track.audio, shifts=track.shifts), "vocals")
+            track.stems = {"vocals": vocals, "instrumental": instrumental}
+        events.log("Demucs", f"Separation completed for {track.song_name}")
+
+    def separate(self,
+                input_path: str,
+                song_name: str,
+                vocals_dir: str,
+                instr_dir: str,
+                trans_folder: str,
+                model="mdx",
+                fmt="wav",
+                sr=44100,
+                bitrate="128k",
+                bit_depth=True,
+                mp3_preset=2,
+                shifts=1,
+                do_transcribe=False,
+                trans_tool="whisper",
+                trans_model="tiny",
+                long_form=None,
+                outputs=None):
+        return self.separate_batch([(input_path, song_name)], vocals_dir, instr_dir, trans_folder,
+                                   model=model, fmt=fmt, sr=sr, bitrate=bitrate, bit_depth=bit_depth,
+                                   mp3_preset=mp3_preset, shifts=shifts, do_transcribe=do_transcribe,
+                                   trans_tool=trans_tool, trans_model=trans_model, long_form=long_form,
+                                   outputs=None if outputs is None else [outputs])[0]
+
+    def separate_batch(self,
+                tracks,
+                vocals_dir: str,
+                instr_dir: str,
+                trans_folder: str,
+                model="mdx",
+                fmt="wav",
+                sr=44100,
+                bitrate="128k",
+                bit_depth=True,
+                mp3_preset=2,
+                shifts=1,
+                do_transcribe=False,
+                trans_tool="whisper",
+                trans_model="tiny",
+                long_form=None,
+                outputs=None):
+        """
+        Separate several songs one after another with one loaded model.
+
+        :param tracks: List of (input_path, song_name) tuples.
+        :param outputs: Optional list of dicts, one per track, that receive the written file paths.
+        :return: List of booleans, True for every song that was separated successfully.
+        """
+        results = []
+        for index, (input_path, song_name) in enumerate(tracks):
+            try:
+                track = self.prepare(input_path, song_name, vocals_dir, instr_dir, trans_folder, model=model,
+                                     fmt=fmt, sr=sr, bitrate=bitrate, bit_depth=bit_depth, mp3_preset=mp3_preset,
+                                     shifts=shifts, do_transcribe=do_transcribe, trans_tool=trans_tool,
+                                     trans_model=trans_model, long_form=long_form,
+                                     outputs=outputs[index] if outputs else None)
+                pipeline.run_track(self, track)
+                results.append(True)
+            except cancellation.Cancelled:
+                raise
+            except Exception as e:
+                events.log("Demucs", f"Separation error for {song_name}: {e}", level="error")
+                results.append(False)
+        return results
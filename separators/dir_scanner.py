@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+from collections import OrderedDict
+from separators import events
+from separators.job_queue import AUDIO_EXTENSIONS
+
+
+def sort_entries(entries):
+    """Folders first, then songs, each by case-insensitive name."""
+    return sorted(entries, key=lambda entry: (not entry[0], entry[1].lower()))
+
+
+class DirectoryScanner:
+    def __init__(self, extensions=AUDIO_EXTENSIONS, batch_size=500, max_cached=64):
+        """
+        Lists directories in a background thread and caches each listing until the directory's mtime changes.
+
+        Entries are (is_folder, name, path) tuples; only folders and files with one of
+        `extensions` are listed. Results are delivered through `results` as
+        ("batch", token, entries) messages while scanning and one ("done", token, sorted entries)
+        message at the end, to be drained by the UI thread.
+        """
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.batch_size = batch_size
+        self.max_cached = max_cached
+        self.results = queue.Queue()
+        self._listings = OrderedDict()  # path -> (mtime_ns, sorted entries)
+        self._lock = threading.Lock()
+        self._token = 0
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def cached(self, path):
+        """The cached listing of path if the directory is unchanged since it was scanned, else None."""
+        path = os.path.abspath(path)
+        with self._lock:
+            listing = self._listings.get(path)
+        if listing is None or listing[0] != self._mtime(path):
+            return None
+        with self._lock:
+            self._listings.move_to_end(path)
+        return listing[1]
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(os.path.abspath(path), None)
+
+    def _store(self, path, mtime, entries):
+        with self._lock:
+            self._listings[path] = (mtime, entries)
+            self._listings.move_to_end(path)
+            while len(self._listings) > self.max_cached:
+                self._listings.popitem(last=False)
+
+    def scan(self, path):
+        """
+        Start listing path in a background thread; a newer scan makes older ones stop early.
+
+        :return: Token identifying this scan's messages in `results`.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            self._token += 1
+            token = self._token
+        thread = threading.Thread(target=self._scan, args=(path, token), name="dir-scan", daemon=True)
+        thread.start()
+        return token
+
+    def is_current(self, token):
+        with self._lock:
+            return token == self._token
+
+    def _scan(self, path, token):
+        mtime = self._mtime(path)  # Taken first, so changes made during the scan invalidate it
+        entries, batch = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if not self.is_current(token):
+                        return  # The user navigated elsewhere
+                    try:
+                        is_folder = entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_folder or entry.name.lower().endswith(self.extensions):
+                        batch.append((is_folder, entry.name, entry.path))
+                    if len(batch) >= self.batch_size:
+                        entries.extend(batch)
+                        self.results.put(("batch", token, batch))
+                        batch = []
+        except OSError as e:
+            events.log("Scanner", f"Could not list {path}: {e}", level="error")
+        entries.extend(batch)
+        if batch:
+            self.results.put(("batch", token, batch))
+        entries = sort_entries(entries)
+        if mtime is not None:
+            self._store(path, mtime, entries)
+        self.results.put(("done", token, entries))
@@ -0,0 +1,328 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from separators import decode_cache, events, job_queue, registry
+
+SAMPLE_RATE = 44100  # References and estimates are compared at this rate
+TARGETS = ("vocals", "accompaniment")
+# Evaluation target -> key the separators use in their `outputs` dict
+OUTPUT_KEYS = {"vocals": "vocals", "accompaniment": "instrumental"}
+METRICS = ("SDR", "SIR", "SAR", "ISR")
+WINDOW_SECONDS = 1.0  # museval (BSS Eval v4) defaults
+HOP_SECONDS = 1.0
+CHUNK_SECONDS = 60.0  # Audio scored by one pool task when chunked scoring is asked for (approximate)
+
+
+def find_tracks(root):
+    """
+    Tracks of a MUSDB-style folder: one subfolder per track with mixture.wav and vocals.wav.
+
+    The accompaniment reference is accompaniment.wav, or the sum of the other stems (drums, bass,
+    other, ...). Folders with a test/ subset (like MUSDB18-HQ) are searched there.
+    :return: Sorted list of (track name, track folder).
+    """
+    if os.path.isdir(os.path.join(root, "test")):
+        root = os.path.join(root, "test")
+    tracks = []
+    if not os.path.isdir(root):
+        return tracks
+    for name in sorted(os.listdir(root)):
+        folder = os.path.join(root, name)
+        if all(os.path.isfile(os.path.join(folder, f)) for f in ("mixture.wav", "vocals.wav")):
+            tracks.append((name, folder))
+    return tracks
+
+
+def load_references(folder, sample_rate=SAMPLE_RATE):
+    """Reference stems of one track as {target: float32 (frames, 2) array}."""
+    vocals = decode_cache.decode(os.path.join(folder, "vocals.wav"), sample_rate)
+    accompaniment_path = os.path.join(folder, "accompaniment.wav")
+    if os.path.isfile(accompaniment_path):
+        accompaniment = decode_cache.decode(accompaniment_path, sample_rate)
+    else:
+        others = [decode_cache.decode(os.path.join(folder, f), sample_rate) for f in sorted(os.listdir(folder))
+                  if f.lower().endswith(".wav") and f not in ("mixture.wav", "vocals.wav")]
+        if not others:
+            raise FileNotFoundError(f"No accompaniment stems in {folder}")
+        frames = min(len(stem) for stem in others)
+        accompaniment = np.sum([stem[:frames] for stem in others], axis=0, dtype=np.float32)
+    return {"vocals": vocals, "accompaniment": accompaniment}
+
+
+def parse_config(text):
+    """Parse 'tool[:model[:shifts]]' (e.g. 'demucs:htdemucs:2') into a configuration dict."""
+    parts = text.split(":")
+    config = {"tool": registry.canonical_tool(parts[0]), "model": None, "shifts": None}
+    if len(parts) > 1 and parts[1]:
+        config["model"] = parts[1]
+    if len(parts) > 2 and parts[2]:
+        config["shifts"] = int(parts[2])
+    return config
+
+
+def config_name(config):
+    """Folder-safe name of a configuration, e.g. 'Demucs_htdemucs_s2'."""
+    name = config["tool"]
+    if config.get("model"):
+        name += f"_{config['model']}"
+    if config.get("shifts"):
+        name += f"_s{config['shifts']}"
+    return name
+
+
+def chunks(frames, sample_rate=SAMPLE_RATE, chunk_seconds=None):
+    """
+    (start, stop) frame ranges scored as separate pool tasks, each a whole number of hops.
+
+    chunk_seconds=None scores the whole track in one task, which gives the standard museval
+    scores. BSS Eval v4 estimates its distortion filters over the audio it is given, so scores
+    of shorter chunks only approximate them and are marked "approximate" in the results.
+    """
+    if not chunk_seconds:
+        return [(0, frames)]
+    hop = int(HOP_SECONDS * sample_rate)
+    size = max(1, int(chunk_seconds / HOP_SECONDS)) * hop
+    ranges = [(start, min(start + size, frames)) for start in range(0, frames, size)]
+    if len(ranges) > 1 and ranges[-1][1] - ranges[-1][0] < int(WINDOW_SECONDS * sample_rate):
+        ranges[-2:] = [(ranges[-2][0], frames)]  # Too short for one window: merge into the previous chunk
+    return ranges
+
+
+def score_chunk(references_path, estimates_path, start, stop, sample_rate=SAMPLE_RATE):
+    """
+    museval metrics of frames [start, stop) of two stacked (targets, frames, channels) .npy files.
+
+    Runs in a worker process; the arrays are memory-mapped there instead of being pickled over.
+    :return: {metric: (targets, windows) list}.
+    """
+    import museval
+    references = np.asarray(np.load(references_path, mmap_mode="r")[:, start:stop])
+    estimates = np.asarray(np.load(estimates_path, mmap_mode="r")[:, start:stop])
+    sdr, isr, sir, sar = museval.evaluate(references, estimates, win=int(WINDOW_SECONDS * sample_rate),
+                                          hop=int(HOP_SECONDS * sample_rate))
+    return {"SDR": sdr.tolist(), "ISR": isr.tolist(), "SIR": sir.tolist(), "SAR": sar.tolist()}
+
+
+def merge_chunks(scores):
+    """Concatenate per-chunk scores (in order) into {target: {metric: per-window list}}; NaN is stored as null."""
+    windows = {target: {metric: [] for metric in METRICS} for target in TARGETS}
+    for score in scores:
+        for metric in METRICS:
+            for index, target in enumerate(TARGETS):
+                windows[target][metric].extend(float(v) if np.isfinite(v) else None
+                                               for v in np.asarray(score[metric][index], dtype=np.float64))
+    return windows
+
+
+def _save_stacked(path, stems, frames):
+    """Save {target: (frames, channels)} stems as one (targets, frames, channels) float32 .npy."""
+    stacked = np.zeros((len(TARGETS), frames, 2), dtype=np.float32)
+    for index, target in enumerate(TARGETS):
+        audio = np.asarray(stems[target][:frames], dtype=np.float32)
+        stacked[index, :len(audio)] = audio
+    temp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp, "wb") as f:
+        np.save(f, stacked)
+    os.replace(temp, path)
+
+
+class ReferenceCache:
+    def __init__(self, directory):
+        """
+        Decoded reference stems of each track, stacked into one .npy file.
+
+        A track's references are decoded once and shared by every configuration (and by later runs
+        while the track folder is unchanged); pool workers memory-map the file.
+        """
+        self.directory = directory
+
+    def load(self, name, folder):
+        """:return: (path of the stacked references, their frame count)."""
+        digest = hashlib.blake2b(os.path.abspath(folder).encode(), digest_size=6).hexdigest()
+        path = os.path.join(self.directory, f"{name}_{digest}.npy")
+        newest = max(os.path.getmtime(os.path.join(folder, f)) for f in os.listdir(folder))
+        if not os.path.exists(path) or os.path.getmtime(path) < newest:
+            os.makedirs(self.directory, exist_ok=True)
+            references = load_references(folder)
+            _save_stacked(path, references, min(len(audio) for audio in references.values()))
+        return path, np.load(path, mmap_mode="r").shape[1]
+
+
+def summarize(windows):
+    """Median over windows of each metric (museval's track score), ignoring silent (NaN) windows."""
+    summary = {}
+    for target, metrics in windows.items():
+        summary[target] = {}
+        for metric, values in metrics.items():
+            values = np.asarray(values, dtype=np.float64)
+            summary[target][metric] = float(np.nanmedian(values)) if np.isfinite(values).any() else None
+    return summary
+
+
+def aggregate(track_results):
+    """Median over tracks of the per-track medians, per target and metric."""
+    result = {}
+    for target in TARGETS:
+        result[target] = {}
+        for metric in METRICS:
+            values = [track["metrics"][target][metric] for track in track_results
+                      if track.get("metrics") and track["metrics"][target][metric] is not None]
+            result[target][metric] = float(np.median(values)) if values else None
+    return result
+
+
+def separate_track(separator, config, name, mixture, out_dir):
+    """Separate one mixture into out_dir and return ({output key: path}, seconds)."""
+    options = {"model": config.get("model"), "shifts": config.get("shifts"), "fmt": "wav", "sr": SAMPLE_RATE,
+               "bit_depth": 32, "long_form": False, "do_transcribe": False}
+    job = job_queue.SeparationJob(mixture, config["tool"], out_dir, out_dir, out_dir, options, song_name=name)
+    start = time.perf_counter()
+    if not job_queue.run_job(separator, job):
+        raise RuntimeError(f"{config['tool']} failed to separate {name}")
+    return job.outputs, time.perf_counter() - start
+
+
+def _summary(results):
+    """Summary of the finished tracks of every configuration (the content of results.json)."""
+    return {label: {
+        "config": entry["config"],
+        "approximate": any(result.get("approximate") for result in entry["tracks"].values()),
+        "tracks": {name: result.get("metrics") or {"error": result.get("error")}
+                   for name, result in sorted(entry["tracks"].items())},
+        "median": aggregate(list(entry["tracks"].values())),
+        "seconds": round(sum(result.get("seconds", 0.0) for result in entry["tracks"].values()), 3),
+    } for label, entry in results.items()}
+
+
+def _write_json(path, data):
+    temp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp, path)
+
+
+def evaluate(root, configs, out_dir, separators=None, tracks=None, workers=None, chunk_seconds=None,
+             resume=True, on_result=None):
+    """
+    Separate every track of a MUSDB-style folder with every configuration and score it with museval.
+
+    Separation runs in the calling thread while the metrics of finished tracks (of every
+    configuration) are computed in a process pool. Each track's result (per-window metrics,
+    medians and separation time) is saved as out_dir/<config>/<track>.json as soon as it is
+    scored, and out_dir/results.json is rewritten after every track. Repeated runs reuse the
+    result cache, so their times are not inference times.
+    :param configs: Configuration dicts (see parse_config).
+    :param separators: Optional SeparatorRegistry to take the backends from.
+    :param tracks: Optional list of track names to evaluate (default: all).
+    :param workers: Metric processes (default: all CPUs but one).
+    :param chunk_seconds: Score each track in chunks of this length in parallel instead of whole
+                          (see chunks()); faster on few long tracks, but the scores are approximate.
+    :param resume: Keep results already saved by an earlier run instead of evaluating those tracks again.
+    :param on_result: Optional callable(config name, track name, result) called as tracks finish.
+    :return: Summary dict {config name: {"config", "tracks", "median", "seconds"}}.
+    """
+    separators = separators or registry.SeparatorRegistry()
+    selected = [(name, folder) for name, folder in find_tracks(root) if tracks is None or name in tracks]
+    if not selected:
+        raise FileNotFoundError(f"No tracks with mixture.wav and vocals.wav found in {root}")
+    references = ReferenceCache(os.path.join(out_dir, "references"))
+    results = {config_name(config): {"config": config, "tracks": {}} for config in configs}
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    pending = []  # (config name, track name, result, futures, estimates path)
+
+    def finish(label, name, result):
+        config_dir = os.path.join(out_dir, label)
+        _write_json(os.path.join(config_dir, f"{name}.json"), result)
+        results[label]["tracks"][name] = result
+        _write_json(os.path.join(out_dir, "results.json"), _summary(results))
+        if on_result:
+            on_result(label, name, result)
+
+    def drain(block):
+        # Record the tracks whose chunks are all scored; with block=True wait for the next one
+        while pending:
+            done = [entry for entry in pending if all(future.done() for future in entry[3])]
+            if not done:
+                if not block:
+                    return
+                wait([future for entry in pending for future in entry[3]], return_when=FIRST_COMPLETED)
+                continue
+            for entry in done:
+                pending.remove(entry)
+                label, name, result, futures, estimates_path = entry
+                try:
+                    windows = merge_chunks(future.result() for future in futures)
+                    result.update(metrics=summarize(windows), windows=windows)
+                except Exception as e:
+                    events.log("Evaluation", f"Scoring {label} on {name} failed: {e}", level="error")
+                    result["error"] = str(e)
+                os.remove(estimates_path)
+                finish(label, name, result)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for config in configs:
+            label = config_name(config)
+            config_dir = os.path.join(out_dir, label)
+            os.makedirs(config_dir, exist_ok=True)
+            with separators.use(config["tool"]) as separator:
+                for name, folder in selected:
+                    result_path = os.path.join(config_dir, f"{name}.json")
+                    if resume and os.path.exists(result_path):
+                        with open(result_path, encoding="utf-8") as f:
+                            previous = json.load(f)
+                        # Chunked and whole-track scores are not interchangeable
+                        if previous.get("metrics") and previous.get("approximate", False) == bool(chunk_seconds):
+                            events.log("Evaluation", f"{label} on {name} already scored")
+                            results[label]["tracks"][name] = previous
+                            continue
+                    events.log("Evaluation", f"{label} on {name}")
+                    result = {"track": name}
+                    if chunk_seconds:
+                        result["approximate"] = True
+                    try:
+                        outputs, seconds = separate_track(separator, config, name, os.path.join(folder, "mixture.wav"),
+                                                          os.path.join(config_dir, "stems"))
+                        result["seconds"] = round(seconds, 3)
+                        references_path, frames = references.load(name, folder)
+                        estimates = {target: decode_cache.decode(outputs[OUTPUT_KEYS[target]], SAMPLE_RATE)
+                                     for target in TARGETS}
+                        estimates_path = os.path.join(config_dir, f"{name}.estimates.npy")
+                        _save_stacked(estimates_path, estimates, frames)
+                        del estimates
+                        futures = [pool.submit(score_chunk, references_path, estimates_path, start, stop)
+                                   for start, stop in chunks(frames, chunk_seconds=chunk_seconds)]
+                        pending.append((label, name, result, futures, estimates_path))
+                    except Exception as e:
+                        events.log("Evaluation", f"{label} failed on {name}: {e}", level="error")
+                        result["error"] = str(e)
+                        finish(label, name, result)
+                    drain(block=False)
+        drain(block=True)
+    summary = _summary(results)
+    _write_json(os.path.join(out_dir, "results.json"), summary)
+    return summary
+
+
+def _format_scores(scores):
+    return ", ".join(f"{target} " + " ".join(
+        f"{metric}={scores[target][metric]:.2f}" if scores[target][metric] is not None else f"{metric}=n/a"
+        for metric in ("SDR", "SIR", "SAR")) for target in TARGETS)
+
+
+def _approximate(result):
+    return ", chunked, approximate" if result.get("approximate") else ""
+
+
+def format_track(result):
+    """One line with the median scores and separation time of a scored track result."""
+    return f"{_format_scores(result['metrics'])} ({result.get('seconds', 0.0):.1f}s{_approximate(result)})"
+
+
+def format_summary(summary):
+    """Plain-text table of the median scores and separation time of each configuration."""
+    return "\n".join(f"{label}: {_format_scores(result['median'])} ({result['seconds']:.1f}s{_approximate(result)})"
+                     for label, result in summary.items())
@@ -0,0 +1,347 @@
+import json
+import time
+import types
+import threading
+import contextlib
+from collections import deque
+from separators import cancellation
+
+# Span names shared by the separators, the pipeline and the transcribers
+DECODE = "decode"
+MODEL_LOAD = "model_load"
+INFERENCE = "inference"
+RESAMPLE = "resample"
+ENCODE = "encode"
+MOVE = "move"
+TRANSCRIBE = "transcribe"
+
+
+class _NoSpan:
+    """What span() returns while nobody listens: entering and leaving it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("stream", "name", "fields", "start")
+
+    def __init__(self, stream, name, fields):
+        self.stream = stream
+        self.name = name
+        self.fields = fields
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.stream.emit("span_start", name=self.name, **self.fields)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fields = dict(self.fields, name=self.name, seconds=round(time.perf_counter() - self.start, 6))
+        if exc_type is not None:
+            fields["error"] = str(exc) or exc_type.__name__
+        self.stream.emit("span", **fields)
+        return False
+
+    def set(self, **fields):
+        """Add fields (e.g. the number of frames processed) to the span's closing event."""
+        self.fields.update(fields)
+
+
+class EventStream:
+    def __init__(self, echo=True):
+        """
+        Structured events of the whole process: log messages and timed spans.
+
+        Sinks are callables taking one event dict ({"time", "event", "thread", ...}); log messages
+        are also printed as "Source: message" while echo is on. With no sinks, span() returns a
+        shared no-op object and no event dict is ever built.
+        """
+        self.echo = echo
+        self._sinks = ()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return bool(self._sinks)
+
+    def subscribe(self, sink):
+        with self._lock:
+            self._sinks = self._sinks + (sink,)
+        return sink
+
+    def unsubscribe(self, sink):
+        with self._lock:
+            self._sinks = tuple(s for s in self._sinks if s is not sink)
+
+    def emit(self, event, **fields):
+        sinks = self._sinks
+        if not sinks:
+            return
+        record = {"time": round(time.time(), 6), "event": event, "thread": threading.current_thread().name}
+        record.update(getattr(self._local, "fields", ()))
+        record.update(fields)
+        for sink in sinks:
+            try:
+                sink(record)
+            except Exception as e:
+                print(f"Events: Sink {sink!r} failed: {e}")
+
+    def log(self, source, message, level="info", **fields):
+        """Replacement for print(f"{source}: {message}") that also reaches the sinks."""
+        if self.echo:
+            print(f"{source}: {message}")
+        if self._sinks:
+            self.emit("log", source=source, level=level, message=message, **fields)
+
+    def span(self, name, **fields):
+        """Context manager timing a block; emits "span_start" and then "span" with its seconds."""
+        if not self._sinks:
+            return _NO_SPAN
+        return _Span(self, name, fields)
+
+    def progress(self, done, total, **fields):
+        """
+        Report done of total units (windows, segments, frames) of the current step as a "progress" event.
+
+        Inside part() the fraction is mapped onto that part of the enclosing step.
+        """
+        if not self._sinks or not total:
+            return
+        base, size = getattr(self._local, "range", (0.0, 1.0))
+        self.emit("progress", fraction=round(base + size * min(done / total, 1.0), 6), done=done, total=total,
+                  **fields)
+
+    @contextlib.contextmanager
+    def part(self, index, count):
+        """Progress reported inside the block covers part index (0-based) of count equal parts."""
+        base, size = getattr(self._local, "range", (0.0, 1.0))
+        self._local.range = (base + size * index / count, size / count)
+        try:
+            yield
+        finally:
+            self._local.range = (base, size)
+
+    @contextlib.contextmanager
+    def bars(self, count):
+        """The next count ProgressBars created by this thread are consecutive parts of the current step."""
+        previous = getattr(self._local, "bars", None)
+        self._local.bars = [0, count]
+        try:
+            yield
+        finally:
+            self._local.bars = previous
+
+    def _next_bar(self):
+        bars = getattr(self._local, "bars", None)
+        if not bars or bars[0] >= bars[1]:
+            return None
+        bars[0] += 1
+        return bars[0] - 1, bars[1]
+
+    @contextlib.contextmanager
+    def context(self, **fields):
+        """Add fields (e.g. job=3) to every event this thread emits inside the block."""
+        previous = getattr(self._local, "fields", {})
+        self._local.fields = {**previous, **fields}
+        try:
+            yield
+        finally:
+            self._local.fields = previous
+
+
+class ProgressBar:
+    def __init__(self, iterable=None, total=None, unit=None, **kwargs):
+        """
+        Stand-in for tqdm.tqdm that reports progress events instead of drawing a console bar.
+
+        Libraries that only expose progress through tqdm (Demucs segments, Whisper windows) are
+        pointed at it with report_tqdm(); other tqdm options are accepted and ignored. Each update
+        is also a cancellation checkpoint, so a canceled job stops after the current segment.
+        """
+        self.iterable = iterable
+        if total is None and hasattr(iterable, "__len__"):
+            total = len(iterable)
+        self.total = total
+        self.unit = unit
+        self.n = 0
+        self._part = _stream._next_bar()
+
+    def __iter__(self):
+        for item in self.iterable:
+            yield item
+            self.update(1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def update(self, n=1):
+        cancellation.check()
+        self.n += n
+        if self._part is None:
+            _stream.progress(self.n, self.total, unit=self.unit)
+        else:
+            with _stream.part(*self._part):
+                _stream.progress(self.n, self.total, unit=self.unit)
+
+    def close(self):
+        pass
+
+
+def report_tqdm(module):
+    """Make a module that did `import tqdm` create ProgressBars instead of console bars."""
+    module.tqdm = types.SimpleNamespace(tqdm=ProgressBar)
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        """Sink appending each event to a JSON lines file."""
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Recorder:
+    def __init__(self, maxlen=1000):
+        """Sink keeping the latest events for a consumer on another thread (e.g. a Tk window)."""
+        self._events = deque(maxlen=maxlen)
+
+    def __call__(self, event):
+        self._events.append(event)
+
+    def drain(self):
+        """Remove and return the events recorded so far, oldest first."""
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+
+class SpanTotals:
+    def __init__(self, key="job"):
+        """
+        Sink summing span seconds by name, overall and per value of one context field.
+
+        Spans nest (a model loaded on first use is timed inside inference), so totals of different
+        names can overlap.
+        """
+        self.key = key
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event["event"] != "span":
+            return
+        with self._lock:
+            for group in {None, event.get(self.key)}:
+                totals = self._totals.setdefault(group, {})
+                totals[event["name"]] = totals.get(event["name"], 0.0) + event["seconds"]
+
+    def totals(self, group=None):
+        """{span name: seconds} of one group (e.g. a job id), or of everything."""
+        with self._lock:
+            return {name: round(seconds, 3) for name, seconds in self._totals.get(group, {}).items()}
+
+
+class ProgressTracker:
+    def __init__(self, key="job"):
+        """
+        Sink keeping the latest progress of each job (or other context field) and an ETA for it.
+
+        The ETA extrapolates the rate measured since the step's first progress event, so it adapts
+        to the machine and model instead of assuming a speed.
+        """
+        self.key = key
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        group = event.get(self.key)
+        if event["event"] == "job":
+            with self._lock:
+                self._state.pop(group, None)
+        elif event["event"] == "progress" and group is not None:
+            step = event.get("stage")
+            with self._lock:
+                state = self._state.get(group)
+                if state is None or state["stage"] != step or event["fraction"] < state["fraction"]:
+                    # A new step (or a restarted one): measure its rate from here
+                    state = {"stage": step, "start": event["time"], "start_fraction": event["fraction"]}
+                    self._state[group] = state
+                state.update(fraction=event["fraction"], time=event["time"])
+
+    def status(self, group):
+        """(stage, fraction, seconds left or None), or None if nothing was reported for group."""
+        with self._lock:
+            state = self._state.get(group)
+            if state is None:
+                return None
+            done = state["fraction"] - state["start_fraction"]
+            elapsed = state["time"] - state["start"]
+            eta = (1.0 - state["fraction"]) * elapsed / done if done > 0 and elapsed > 0 else None
+            return state["stage"], state["fraction"], eta
+
+
+_stream = EventStream()
+
+
+def get_stream():
+    return _stream
+
+
+def log(source, message, level="info", **fields):
+    _stream.log(source, message, level, **fields)
+
+
+def span(name, **fields):
+    return _stream.span(name, **fields)
+
+
+def context(**fields):
+    return _stream.context(**fields)
+
+
+def progress(done, total, **fields):
+    _stream.progress(done, total, **fields)
+
+
+def part(index, count):
+    return _stream.part(index, count)
+
+
+def bars(count):
+    return _stream.bars(count)
+
+
+def format_eta(seconds):
+    """'1:05' style remaining time, or '' when it is not known yet."""
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
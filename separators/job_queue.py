@@ -0,0 +1,337 @@
+import os
+import itertools
+import threading
+import time
+from collections import deque
+from separators import cancellation, events
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELED = "canceled"
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.m4a')
+
+# Keyword arguments understood by each separator's separate() method
+TOOL_OPTIONS = {
+    "Spleeter": ("fmt", "sr", "bitrate", "bit_depth", "do_transcribe", "trans_tool", "trans_model", "long_form"),
+    "Demucs": ("model", "fmt", "sr", "bitrate", "bit_depth", "mp3_preset", "shifts",
+               "do_transcribe", "trans_tool", "trans_model", "long_form"),
+    "OpenUnmix": ("model", "fmt", "sr", "bitrate", "bit_depth", "do_transcribe", "trans_tool", "trans_model",
+                  "long_form"),
+}
+
+
+def collect_songs(folder, recursive=True):
+    """Return sorted paths of all audio files in folder (and its subfolders if recursive)."""
+    songs = []
+    if not os.path.isdir(folder):
+        return songs
+    if recursive:
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for f in sorted(files):
+                if f.lower().endswith(AUDIO_EXTENSIONS):
+                    songs.append(os.path.join(root, f))
+    else:
+        for f in sorted(os.listdir(folder)):
+            full_path = os.path.join(folder, f)
+            if os.path.isfile(full_path) and f.lower().endswith(AUDIO_EXTENSIONS):
+                songs.append(full_path)
+    return songs
+
+
+class SeparationJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, input_path, tool, vocals_folder, instr_folder, trans_folder, options=None, song_name=None):
+        self.id = next(SeparationJob._ids)
+        self.input_path = input_path
+        self.song_name = song_name or os.path.splitext(os.path.basename(input_path))[0]
+        self.tool = tool
+        self.vocals_folder = vocals_folder
+        self.instr_folder = instr_folder
+        self.trans_folder = trans_folder
+        self.options = dict(options or {})  # Settings captured at enqueue time
+        self.token = cancellation.CancelToken(self.options.get("timeout"))  # Checked inside separation loops
+        self.outputs = {}  # Filled by the separator: "vocals"/"instrumental"/"transcription" -> path
+        self.state = PENDING
+        self.stage = None  # Pipeline stage of a running job (see pipeline.STAGES)
+        self.error = None
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def duration(self):
+        """Wall time in seconds spent running the job (so far), or None if not started."""
+        if self.started_at is None:
+            return None
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+    def describe(self):
+        """One-line summary used by the queue views."""
+        model = self.options.get("model")
+        tool = f"{self.tool}/{model}" if model and self.tool != "Spleeter" else self.tool
+        state = f"{self.state}: {self.stage}" if self.state == RUNNING and self.stage else self.state
+        text = f"[{state}] {self.song_name} ({tool}, {self.options.get('fmt', 'wav')})"
+        if self.duration is not None:
+            text += f" {self.duration:.1f}s"
+        if self.error:
+            text += f" - {self.error}"
+        return text
+
+
+def job_kwargs(job):
+    """Settings stored in the job that its tool's separate() understands."""
+    return {key: job.options[key] for key in TOOL_OPTIONS.get(job.tool, ())
+            if job.options.get(key) is not None}
+
+
+def run_job(separator, job):
+    """Call separator.separate() with the settings stored in the job; the files it writes land in job.outputs."""
+    return separator.separate(job.input_path, job.song_name, job.vocals_folder,
+                              job.instr_folder, job.trans_folder, outputs=job.outputs, **job_kwargs(job))
+
+
+class _Start:
+    def __init__(self, queue, job):
+        """
+        Callable that moves a job from PENDING to RUNNING once its processing begins.
+
+        Calling it also lets the next worker take the next pending job, so jobs enter the runner
+        one at a time and in submit order. Returns False if the job was canceled while waiting.
+        """
+        self.queue = queue
+        self.job = job
+        self.admitted = False
+
+    def __call__(self):
+        with self.queue._lock:
+            self._admit()
+            if self.job.state == PENDING:
+                self.job.state = RUNNING
+                self.job.started_at = time.time()
+                self.job.token.start()  # Time spent waiting for a worker or a stage does not count
+            return self.job.state == RUNNING
+
+    def release(self):
+        """Let the next job in, if the runner returned without calling start."""
+        with self.queue._lock:
+            self._admit()
+
+    def _admit(self):
+        # Called with the queue lock held
+        if not self.admitted:
+            self.admitted = True
+            self.queue._admission.release()
+
+
+class JobQueue:
+    def __init__(self, runner, max_workers=1, on_job_done=None, defer_start=False):
+        """
+        FIFO queue of SeparationJob objects drained by a bounded pool of worker threads.
+
+        :param runner: Callable taking a job and returning True on success.
+        :param max_workers: Maximum number of jobs processed concurrently.
+        :param on_job_done: Optional callable(job) invoked from the worker thread after each job.
+        :param defer_start: Call runner(job, start) instead, for runners that buffer jobs before
+                            processing them (see StagedPipeline.run). The job stays PENDING until
+                            the runner calls start(), and the next job is only handed to a worker
+                            after that, so jobs are started in submit order.
+        """
+        self.runner = runner
+        self.on_job_done = on_job_done
+        self.defer_start = defer_start
+        self.max_workers = max(1, int(max_workers))
+        self._pending = deque()
+        self._jobs = []
+        self._workers = []
+        self._closed = False  # Set by shutdown(): workers exit once nothing is pending
+        self._lock = threading.Lock()
+        self._admission = threading.Lock()  # Held from taking a pending job until it starts
+        self._idle = threading.Condition(self._lock)
+        self._has_work = threading.Condition(self._lock)  # Notified on new jobs, resizing and shutdown
+        self._active = 0  # Jobs submitted but not finished yet
+        self.finished_count = 0  # Jobs that ran to completion (success or failure), never reset
+
+    def submit(self, job):
+        return self.submit_many([job])[0]
+
+    def submit_many(self, jobs):
+        jobs = list(jobs)
+        with self._lock:
+            self._jobs.extend(jobs)
+            self._active += len(jobs)
+            self._pending.extend(jobs)
+            self._spawn_workers()
+            self._has_work.notify_all()
+        return jobs
+
+    def set_max_workers(self, max_workers):
+        """Grow or shrink the worker pool; shrinking takes effect as workers finish their job."""
+        with self._lock:
+            self.max_workers = max(1, int(max_workers))
+            self._spawn_workers()
+            self._has_work.notify_all()  # Idle workers above the new size exit
+
+    def _spawn_workers(self):
+        # Called with self._lock held
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < min(self.max_workers, max(self._active, 1)):
+            worker = threading.Thread(target=self._worker_loop, name=f"separation-worker-{len(self._workers) + 1}")
+            worker.daemon = True
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_job(self):
+        """Wait for the next pending job; returns None when this worker should exit instead."""
+        current = threading.current_thread()
+        with self._lock:
+            while True:
+                if len(self._workers) > self.max_workers or (self._closed and not self._pending):
+                    if current in self._workers:
+                        self._workers.remove(current)
+                    return None
+                if self._pending:
+                    return self._pending.popleft()
+                self._has_work.wait()
+
+    def _worker_loop(self):
+        while True:
+            # Checked before waiting and after every job, so the pool shrinks as soon as workers are free
+            self._admission.acquire()
+            job = self._next_job()
+            if job is None:
+                self._admission.release()
+                return
+            with self._lock:
+                if job.state == CANCELED:
+                    self._admission.release()
+                    self._finish(job)
+                    continue
+            start = _Start(self, job)
+            try:
+                with events.context(job=job.id, song=job.song_name), cancellation.use(job.token):
+                    if self.defer_start:
+                        success = self.runner(job, start)
+                    else:
+                        success = start() and self.runner(job)
+                    # Separators that catch every error return False where a checkpoint raised
+                    job.token.check()
+                error = None if success else "separation failed"
+            except cancellation.Cancelled as e:
+                events.log("Queue", f"Job '{job.song_name}' stopped: {e}", level="warning", job=job.id)
+                success, error = False, str(e)
+                if not e.timed_out:
+                    with self._lock:
+                        job.state = CANCELED
+            except Exception as e:
+                events.log("Queue", f"Job '{job.song_name}' raised: {e}", level="error", job=job.id)
+                success, error = False, str(e)
+            start.release()
+            with self._lock:
+                if job.state == CANCELED and job.started_at is None:
+                    # Canceled before it started: nothing ran, so it is not counted as finished
+                    self._finish(job)
+                    continue
+                job.finished_at = time.time()
+                if job.state != CANCELED:
+                    job.state = DONE if success else FAILED
+                job.error = error
+                self.finished_count += 1
+                self._finish(job)
+            events.get_stream().emit("job", job=job.id, song=job.song_name, state=job.state, error=error,
+                                     seconds=round(job.duration, 3) if job.duration is not None else None)
+            if self.on_job_done:
+                try:
+                    self.on_job_done(job)
+                except Exception as e:
+                    events.log("Queue", f"on_job_done callback error: {e}", level="error")
+
+    def _finish(self, job):
+        # Called with self._lock held
+        self._active -= 1
+        if self._active == 0:
+            self._idle.notify_all()
+
+    def cancel(self, job):
+        """
+        Cancel a job. A pending job never starts; a running one stops at its next checkpoint.
+
+        :return: True if the job was pending or running.
+        """
+        with self._lock:
+            if job.state == PENDING:
+                job.state = CANCELED
+                return True
+            if job.state == RUNNING:
+                job.token.cancel()
+                return True
+            return False
+
+    def cancel_pending(self):
+        """Cancel every job that has not started yet and return how many were canceled."""
+        with self._lock:
+            pending = [job for job in self._jobs if job.state == PENDING]
+            for job in pending:
+                job.state = CANCELED
+        return len(pending)
+
+    def cancel_running(self):
+        """Ask every running job to stop at its next checkpoint and return how many were running."""
+        with self._lock:
+            running = [job for job in self._jobs if job.state == RUNNING]
+            for job in running:
+                job.token.cancel()
+        return len(running)
+
+    def clear_finished(self):
+        """Forget finished, failed and canceled jobs (keeps throughput statistics of the rest)."""
+        with self._lock:
+            self._jobs = [job for job in self._jobs if job.state in (PENDING, RUNNING)]
+
+    def wait(self, timeout=None):
+        """Block until every submitted job has finished. Returns False on timeout."""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._active == 0, timeout)
+
+    def shutdown(self, cancel_pending=True):
+        if cancel_pending:
+            self.cancel_pending()
+        with self._lock:
+            self._closed = True
+            self._has_work.notify_all()
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def counts(self):
+        """Number of jobs per state."""
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0, CANCELED: 0}
+        with self._lock:
+            for job in self._jobs:
+                counts[job.state] += 1
+        return counts
+
+    @property
+    def is_idle(self):
+        with self._lock:
+            return self._active == 0
+
+    def throughput(self):
+        """Finished songs per hour, measured from the first job start to now (or the last finish when idle)."""
+        with self._lock:
+            finished = [job for job in self._jobs if job.state in (DONE, FAILED) and job.finished_at]
+            started = [job.started_at for job in self._jobs if job.started_at]
+            if not finished or not started:
+                return 0.0
+            end = max(job.finished_at for job in finished) if self._active == 0 else time.time()
+        elapsed = end - min(started)
+        if elapsed <= 0:
+            return 0.0
+        return len(finished) * 3600.0 / elapsed
@@ -0,0 +1,124 @@
+import os
+import gc
+import sys
+import time
+import threading
+from collections import OrderedDict
+from separators import events
+
+DEFAULT_BUDGET_MB = 4096
+
+
+def estimate_size(model):
+    """Rough resident size of a loaded model in bytes (torch parameters and buffers, or tuple members)."""
+    if isinstance(model, (tuple, list)):
+        return sum(estimate_size(m) for m in model)
+    size = 0
+    if hasattr(model, "parameters") and hasattr(model, "buffers"):
+        try:
+            for tensor in list(model.parameters()) + list(model.buffers()):
+                size += tensor.numel() * tensor.element_size()
+        except Exception:
+            size = 0
+    return size
+
+
+class ModelRegistry:
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        """
+        Process-wide cache of transcription models keyed by (engine, model name).
+
+        Models are evicted least-recently-used first once their estimated size exceeds the budget.
+        The most recently requested model is always kept, even if it alone exceeds the budget.
+        """
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._models = OrderedDict()  # (engine, name) -> (model, size in bytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def set_budget(self, budget_mb):
+        with self._lock:
+            self.budget_bytes = int(budget_mb * 1024 * 1024)
+            evicted = self._evict_over_budget()
+        self._release(evicted)
+
+    def get(self, engine, model_name, loader, size_bytes=None):
+        """
+        Return the cached model or load it with loader().
+
+        :param engine: Transcription engine name (e.g. "whisper", "wav2vec2", "coqui").
+        :param model_name: Model name or path, unique within the engine.
+        :param loader: Callable that loads and returns the model.
+        :param size_bytes: Size to account for the model; estimated from its tensors if None.
+        """
+        key = (engine, model_name)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:  # Concurrent requests for the same model wait for a single load
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+            events.log("ModelRegistry", f"Loading {engine} model '{model_name}'...")
+            start = time.perf_counter()
+            with events.span(events.MODEL_LOAD, tool=engine, model=model_name):
+                model = loader()
+            size = size_bytes if size_bytes is not None else estimate_size(model)
+            events.log("ModelRegistry", f"{engine} model '{model_name}' loaded in {time.perf_counter() - start:.1f}s "
+                                        f"({size / 2**20:.0f} MB)")
+            with self._lock:
+                self._models[key] = (model, size)
+                evicted = self._evict_over_budget()
+        self._release(evicted)
+        return model
+
+    def _evict_over_budget(self):
+        # Called with self._lock held
+        evicted = []
+        while len(self._models) > 1 and self.total_bytes() > self.budget_bytes:
+            key, _ = self._models.popitem(last=False)
+            evicted.append(key)
+        return evicted
+
+    def _release(self, evicted):
+        if not evicted:
+            return
+        for engine, model_name in evicted:
+            events.log("ModelRegistry", f"Evicted {engine} model '{model_name}' (RAM budget {self.budget_bytes / 2**20:.0f} MB)")
+        gc.collect()
+        if "torch" in sys.modules:
+            torch = sys.modules["torch"]
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def evict(self, engine, model_name):
+        with self._lock:
+            removed = self._models.pop((engine, model_name), None) is not None
+        if removed:
+            self._release([(engine, model_name)])
+        return removed
+
+    def clear(self):
+        with self._lock:
+            evicted = list(self._models)
+            self._models.clear()
+        self._release(evicted)
+
+    def total_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def loaded(self):
+        """List of (engine, model name, size in MB), least recently used first."""
+        with self._lock:
+            return [(engine, name, size / 2**20) for (engine, name), (_, size) in self._models.items()]
+
+
+_registry = ModelRegistry(float(os.environ.get("TRANSCRIPTION_RAM_BUDGET_MB", DEFAULT_BUDGET_MB)))
+
+
+def get_registry():
+    """The registry shared by every transcription engine in this process."""
+    return _registry
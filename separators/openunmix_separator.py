@@ -1,42 +1,133 @@
 import os
-import tempfile
-import shutil
+import time
+import threading
 import torch
-import librosa
-import soundfile as sf
 import numpy as np
-from pydub import AudioSegment  # For format conversion
-from openunmix import predict  # High-level API
-# Transcription tools
-import separators.whisper_transcription as whisper_trans
-#import separators.wav2vec2_transcription as wav2vec2_trans 
-#import separators.coqui_transcription as coqui_trans 
+from openunmix import utils as umx_utils
+from openunmix.filtering import wiener
+from separators import cancellation, chunked, decode_cache, events, pipeline, result_cache
 
 class OpenUnmixSeparator:
     def __init__(self):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         try:
-            print(f"OpenUnmix: Initializing on {self.device}")
-            print("OpenUnmix: Import successful. Models will load on first separation.")
-            print(f"OpenUnmix: Ready on {self.device}")
+            events.log("OpenUnmix", f"Initializing on {self.device}")
+            events.log("OpenUnmix", "Import successful. Models will load on first separation.")
+            events.log("OpenUnmix", f"Ready on {self.device}")
         except Exception as e:
-            print(f"OpenUnmix init error: {e}")
-            print("OpenUnmix: Check: pip install openunmix-pytorch")
-        self.whisper_trans = whisper_trans.WhisperTranscription()
-        #self.wav2vec2_trans = wav2vec2_trans.Wav2Vec2Transcription() 
-        #self.coqui_trans = coqui_trans.CoquiTranscription()
-
-    def _get_unique_filename(self, base_path):
-        """Generate a unique filename by appending _1, _2, etc., if the file exists."""
-        if not os.path.exists(base_path):
-            return base_path
-        base, ext = os.path.splitext(base_path)
-        counter = 1
-        while True:
-            new_path = f"{base}_{counter}{ext}"
-            if not os.path.exists(new_path):
-                return new_path
-            counter += 1
+            events.log("OpenUnmix", f"Init error: {e}", level="error")
+            events.log("OpenUnmix", "Check: pip install openunmix-pytorch")
+        self._models = {}  # (model name, targets, device) -> loaded separator
+        self._lock = threading.Lock()
+        self.last_timings = {}  # Seconds spent on "load" and "inference" by the last separation
+
+    def load_model(self, model="umxl", targets=("vocals",)):
+        """Return the cached OpenUnmix separator for (model, targets, device) and the seconds spent loading it."""
+        key = (model, tuple(targets), str(self.device))
+        with self._lock:
+            if key in self._models:
+                return self._models[key], 0.0
+            events.log("OpenUnmix", f"Loading model '{model}' for targets {list(targets)}...")
+            start = time.perf_counter()
+            with events.span(events.MODEL_LOAD, tool="OpenUnmix", model=model):
+                separator = umx_utils.load_separator(
+                    model_str_or_path=model,
+                    targets=list(targets),
+                    residual=True,  # Creates residual for instrumental
+                    device=self.device,
+                    pretrained=True,
+                )
+                separator.freeze()
+                separator.to(self.device)
+            self._models[key] = separator
+            load_time = time.perf_counter() - start
+            events.log("OpenUnmix", f"Model '{model}' loaded in {load_time:.1f}s")
+            return separator, load_time
+
+    def warm_up(self, model="umxl", targets=("vocals",)):
+        """Load the model and run one second of silence through it so the first song pays no setup cost."""
+        separator, load_time = self.load_model(model, targets)
+        start = time.perf_counter()
+        with torch.no_grad():
+            separator(torch.zeros(1, 2, int(separator.sample_rate), device=self.device))
+        events.log("OpenUnmix", f"Warm-up done (load {load_time:.1f}s, first pass {time.perf_counter() - start:.1f}s)")
+        return load_time
+
+    def unload_models(self):
+        with self._lock:
+            self._models.clear()
+
+    def prepare(self,
+                input_path: str,
+                song_name: str,
+                vocals_folder: str,
+                instr_folder: str,
+                trans_folder: str,
+                model="umxl",
+                fmt="wav",
+                sr=44100,
+                bitrate=192,
+                do_transcribe=False,
+                trans_tool="whisper",
+                trans_model="tiny",
+                bit_depth=24,
+                long_form=None,
+                outputs=None):
+        """Check the input and describe where its stems go; returns a pipeline.Track."""
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+        # Ensure final folders exist
+        os.makedirs(vocals_folder, exist_ok=True)
+        os.makedirs(instr_folder, exist_ok=True)
+
+        base_vocals_dest = os.path.join(vocals_folder, f"{song_name}_0_vocals.{fmt}")
+        base_instr_dest = os.path.join(instr_folder, f"{song_name}_O_instrumental.{fmt}")
+        return pipeline.Track(
+            "OpenUnmix", input_path, song_name,
+            stem_paths=[("vocals", base_vocals_dest), ("instrumental", base_instr_dest)],
+            cache_key=result_cache.get_cache().key(input_path, "OpenUnmix", model),
+            fmt=fmt, writer_options={"out_sr": sr, "bit_depth": bit_depth, "bitrate": bitrate}, model=model,
+            trans_path=os.path.join(trans_folder, f"{song_name}_D_transcription.txt"),
+            do_transcribe=do_transcribe, trans_tool=trans_tool, trans_model=trans_model,
+            long_form=chunked.use_long_form(input_path, long_form), outputs=outputs)
+
+    def decode(self, track):
+        """Load stereo audio (mono is duplicated) through the shared decode cache, channels first."""
+        track.audio = decode_cache.get_cache().load(track.input_path, 44100).T
+
+    def infer(self, track):
+        """Separate the decoded audio (or a long-form input window by window) into vocals and instrumental."""
+        # Reuse the loaded model (only vocals + residual for instrumental)
+        separator, load_time = self.load_model(track.model, ("vocals",))
+        track.sample_rate = int(separator.sample_rate)
+        if track.long_form:
+            track.stems = self.separate_long_form(track.input_path, separator, track.make_temp_dir())
+            return
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            mix = umx_utils.preprocess(torch.from_numpy(np.ascontiguousarray(track.audio)), 44100, separator.sample_rate)
+            estimates = separator.to_dict(self._forward(separator, mix.to(self.device)))
+        inference_time = time.perf_counter() - start
+        self.last_timings = {"load": load_time, "inference": inference_time}
+        events.log("OpenUnmix", f"Separation complete (model load {load_time:.1f}s, inference {inference_time:.1f}s)")
+
+        # Extract vocals
+        if 'vocals' not in estimates:
+            raise ValueError("No 'vocals' in estimates")
+        vocals_estimate = self._prepare_audio_for_save(estimates['vocals'].detach().cpu().numpy())
+
+        # Extract instrumental: Use residual if available, else sum non-vocals
+        if 'residual' in estimates:
+            instr_raw = estimates['residual'].detach().cpu().numpy()
+        else:
+            non_vocals = [estimates[target].detach().cpu().numpy() for target in estimates if target != 'vocals']
+            if not non_vocals:
+                raise ValueError("No instrumental stems found")
+            instr_raw = np.sum(non_vocals, axis=0)
+        instr_estimate = self._prepare_audio_for_save(instr_raw)
+        track.stems = {"vocals": vocals_estimate, "instrumental": instr_estimate}
 
     def separate(self, 
                 input_path: str, 
@@ -50,126 +141,81 @@ class OpenUnmixSeparator:
                 bitrate=192, 
                 do_transcribe=False, 
                 trans_tool="whisper", 
-                trans_model="tiny"):
+                trans_model="tiny",
+                bit_depth=24,
+                long_form=None,
+                outputs=None):
         try:
-            # Check if input exists
-            if not os.path.exists(input_path):
-                print(f"OpenUnmix: Input file not found: {input_path}")
-                return False
-
-            # Load audio
-            audio, original_sr = librosa.load(input_path, sr=44100, mono=False)
-            print(f"OpenUnmix: Raw audio shape: {audio.shape}, sr: {original_sr}")
-
-            # Handle mono: Duplicate to stereo
-            if audio.ndim == 1:
-                audio = np.stack([audio, audio], axis=-1)
-            print(f"OpenUnmix: Fixed audio shape: {audio.shape}")
-
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Perform separation using predict.separate (simplified as per example)
-                estimates = predict.separate(
-                    audio=torch.as_tensor(audio).float(),
-                    rate=original_sr,
-                    model_str_or_path=model,
-                    targets=['vocals'],  # Only vocals
-                    residual=True,  # Creates residual for instrumental
-                    device=self.device
-                )
-                print(f"OpenUnmix: Separation complete. Estimates keys: {list(estimates.keys())}")
-
-                # Extract vocals
-                if 'vocals' not in estimates:
-                    raise ValueError("No 'vocals' in estimates")
-                vocals_raw = estimates['vocals'].detach().cpu().numpy()
-                vocals_estimate = self._prepare_audio_for_save(vocals_raw, sr)
-                
-                # Extract instrumental: Use residual if available, else sum non-vocals
-                if 'residual' in estimates:
-                    instr_raw = estimates['residual'].detach().cpu().numpy()
-                else:
-                    non_vocals = [estimates[target].detach().cpu().numpy() for target in estimates if target != 'vocals']
-                    if not non_vocals:
-                        raise ValueError("No instrumental stems found")
-                    instr_raw = np.sum(non_vocals, axis=0)
-                instr_estimate = self._prepare_audio_for_save(instr_raw, sr)
-                
-                # Save temporary WAV files
-                vocals_temp_path = os.path.join(temp_dir, 'vocals_temp.wav')
-                instr_temp_path = os.path.join(temp_dir, 'instrumental_temp.wav')
-                sf.write(vocals_temp_path, vocals_estimate, original_sr)
-                sf.write(instr_temp_path, instr_estimate, original_sr)
-                
-                # Ensure final folders exist
-                os.makedirs(vocals_folder, exist_ok=True)
-                os.makedirs(instr_folder, exist_ok=True)
-
-                # Generate unique destination paths
-                base_vocals_dest = os.path.join(vocals_folder, f"{song_name}_0_vocals.{fmt}")
-                base_instr_dest = os.path.join(instr_folder, f"{song_name}_O_instrumental.{fmt}")
-
-                vocals_dest = self._get_unique_filename(base_vocals_dest)
-                instr_dest = self._get_unique_filename(base_instr_dest)
-                
-                # Load and export files
-                audio_vocals = AudioSegment.from_wav(vocals_temp_path)
-                audio_instr = AudioSegment.from_wav(instr_temp_path)
-                if fmt == "mp3":
-                    audio_vocals.export(vocals_dest, format="mp3", bitrate=f"{bitrate}k")
-                    audio_instr.export(instr_dest, format="mp3", bitrate=f"{bitrate}k")
-                elif fmt == "flac":
-                    audio_vocals.export(vocals_dest, format="flac")
-                    audio_instr.export(instr_dest, format="flac")
-                else:
-                    audio_vocals.export(vocals_dest, format="wav")
-                    audio_instr.export(instr_dest, format="wav")
-                
-                print(f"OpenUnmix separation successful for {song_name} in {fmt} format. Files saved as: {vocals_dest}, {instr_dest}")
-
-                if do_transcribe:
-                    trans_path = os.path.join(trans_folder, f"{song_name}_D_transcription.txt")
-                    if trans_tool == "whisper":
-                        success_trans = self.whisper_trans.transcribe(vocals_dest, trans_path, trans_model)
-                    elif trans_tool == "wav2vec2":
-                        print("Placeholder for wav2vec2 transcription tool")
-                        #success_trans = self.wav2vec2_trans.transcribe(vocals_dest, trans_path, trans_model)
-                    elif trans_tool == "coqui":
-                        print("Placeholder for coqui transcription tool")
-                        #success_trans = self.coqui_trans.transcribe(vocals_dest, trans_path, trans_model)
-                    else:
-                        print(f"OpenUnmix: Unknown transcription tool '{trans_tool}'.")
-                        success_trans = False
-                    if success_trans:
-                        print(f"OpenUnmix: Transcription completed for {song_name} by '{trans_tool}' using '{trans_model}'.")
-                    else:
-                        print(f"OpenUnmix: Transcription failed for {song_name} by '{trans_tool}' using '{trans_model}'.")
-                return True
+            track = self.prepare(input_path, song_name, vocals_folder, instr_folder, trans_folder, model=model,
+                                 fmt=fmt, sr=sr, bitrate=bitrate, do_transcribe=do_transcribe, trans_tool=trans_tool,
+                                 trans_model=trans_model, bit_depth=bit_depth, long_form=long_form, outputs=outputs)
+            # Outputs are copies of stems encoded once in the result cache
+            pipeline.run_track(self, track)
+            return True
 
+        except FileNotFoundError as e:
+            events.log("OpenUnmix", str(e), level="error")
+            return False
+        except cancellation.Cancelled:
+            raise
         except Exception as e:
-            print(f"OpenUnmix error: {e}")
-            import traceback
-            traceback.print_exc()
+            events.log("OpenUnmix", f"Error: {e}", level="error")
             return False
 
-    def _prepare_audio_for_save(self, estimate, sr):
-        """Helper: Squeeze extra dims, ensure correct shape, and resample if needed."""
+    def separate_long_form(self, input_path, separator, temp_dir):
+        """Separate a long recording in overlapping windows with flat memory use; returns memmapped stems."""
+        def separate_window(window):
+            with torch.no_grad():
+                mix = torch.from_numpy(window.T.copy())[None].to(self.device)
+                estimates = separator.to_dict(self._forward(separator, mix))
+            stems = {name: estimate[0].cpu().numpy().T for name, estimate in estimates.items()}
+            return {"vocals": stems["vocals"], "instrumental": stems["residual"]}
+
+        return chunked.separate_file(input_path, separate_window, int(separator.sample_rate), temp_dir)
+
+    @staticmethod
+    def _forward(separator, mix):
+        """
+        Same as separator(mix) (openunmix's Separator.forward), reporting progress in frames.
+
+        Each target model pass counts as all frames and each Wiener filter window as its frames;
+        both loops check for cancellation before every step.
+        """
+        mix_stft = separator.stft(mix)
+        spectrogram = separator.complexnorm(mix_stft)
+        nb_frames = spectrogram.shape[-1]
+        models = list(separator.target_models.values())
+        total = nb_frames * (len(models) + mix.shape[0])
+        spectrograms = torch.zeros(spectrogram.shape + (len(models),), dtype=mix.dtype, device=spectrogram.device)
+        for j, target_model in enumerate(models):
+            cancellation.check()
+            spectrograms[..., j] = target_model(spectrogram.detach().clone())
+            events.progress(nb_frames * (j + 1), total, unit="frames")
+
+        # (samples, frames, bins, channels, sources) for the Wiener filter
+        spectrograms = spectrograms.permute(0, 3, 2, 1, 4)
+        mix_stft = mix_stft.permute(0, 3, 2, 1, 4)
+        nb_sources = len(models) + (1 if separator.residual else 0)
+        targets_stft = torch.zeros(mix_stft.shape + (nb_sources,), dtype=mix.dtype, device=mix_stft.device)
+        window = separator.wiener_win_len or nb_frames
+        done = nb_frames * len(models)
+        for sample in range(mix.shape[0]):
+            for pos in range(0, nb_frames, window):
+                cancellation.check()
+                frames = torch.arange(pos, min(nb_frames, pos + window))
+                targets_stft[sample, frames] = wiener(spectrograms[sample, frames], mix_stft[sample, frames],
+                                                      separator.niter, softmask=separator.softmask,
+                                                      residual=separator.residual)
+                done += len(frames)
+                events.progress(done, total, unit="frames")
+        targets_stft = targets_stft.permute(0, 5, 3, 2, 1, 4).contiguous()
+        return separator.istft(targets_stft, length=mix.shape[2])
+
+    def _prepare_audio_for_save(self, estimate):
+        """Helper: Squeeze extra dims and return (frames, channels) or 1-D mono audio."""
         estimate = np.squeeze(estimate)
-        print(f"Shape after squeeze: {estimate.shape}")
-        
         if estimate.ndim == 2 and estimate.shape[0] < estimate.shape[1]:
             estimate = estimate.T
-            print(f"Shape after transpose: {estimate.shape}")
-        
         if estimate.ndim == 2 and estimate.shape[1] == 1:
             estimate = estimate[:, 0]
-            print(f"Mono flattened to 1D: {estimate.shape}")
-        
-        if sr != 44100:
-            audio_segment = AudioSegment(estimate.tobytes(), frame_rate=44100, sample_width=2, channels=estimate.ndim)
-            audio_segment = audio_segment.set_frame_rate(sr)
-            estimate = np.array(audio_segment.get_array_of_samples()).astype(np.float32)
-            if audio_segment.channels == 1:
-                estimate = estimate.reshape(-1)
-            print(f"Resampled to sr: {sr}, new shape: {estimate.shape}")
-        
-        return estimate
\ No newline at end of file
+        return estimate
@@ -0,0 +1,285 @@
+import queue
+import shutil
+import tempfile
+import threading
+from separators import cancellation, chunked, events, job_queue, result_cache
+# Transcription tools (shared by all separators)
+from separators.transcription import speech_audio, transcribe_vocals
+
+# Stages in the order a song passes through them
+DECODE = "decode"
+SEPARATE = "separate"
+ENCODE = "encode"
+TRANSCRIBE = "transcribe"
+STAGES = (DECODE, SEPARATE, ENCODE, TRANSCRIBE)
+
+QUEUE_SIZE = 2  # Songs that may wait in front of each stage
+
+
+class Track:
+    def __init__(self, label, input_path, song_name, stem_paths, cache_key, fmt, writer_options,
+                 model=None, shifts=None, trans_path=None, do_transcribe=False, trans_tool="whisper",
+                 trans_model="tiny", long_form=False, outputs=None):
+        """
+        One song on its way through a separator's stages.
+
+        The separator's prepare() builds it; decode() sets `audio`, infer() sets `stems` and
+        `sample_rate`, and the shared encode stage writes them to `stem_paths` ((stem, base path)
+        pairs, vocals first) through the result cache and sets `dests`. When transcribing, the float
+        vocals are kept as `speech` so the transcriber never decodes the written (maybe MP3) file;
+        long-form vocals are not, as they would not fit in memory.
+        """
+        self.label = label  # Separator name used in messages (e.g. "Demucs")
+        self.input_path = input_path
+        self.song_name = song_name
+        self.stem_paths = stem_paths
+        self.cache_key = cache_key
+        self.fmt = fmt
+        self.writer_options = writer_options
+        self.model = model
+        self.shifts = shifts
+        self.trans_path = trans_path
+        self.do_transcribe = do_transcribe
+        self.trans_tool = trans_tool
+        self.trans_model = trans_model
+        self.long_form = long_form
+        self.outputs = outputs
+        self.audio = None
+        self.stems = None
+        self.sample_rate = None
+        self.dests = None
+        self.speech = None  # 16 kHz mono vocals handed to the transcriber
+        self.from_cache = False
+        self.temp_dir = None  # Memmapped long-form stems live here until they are encoded
+
+    def make_temp_dir(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="separation_")
+        return self.temp_dir
+
+    def release(self):
+        """Drop the decoded audio and stems (and their temp files) once they are no longer needed."""
+        self.audio = None
+        self.stems = None
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
+
+
+def _saved(track, dests):
+    track.dests = dests
+    vocals_dest, instr_dest = dests
+    if track.outputs is not None:
+        track.outputs.update(vocals=vocals_dest, instrumental=instr_dest)
+    events.log(track.label, f"Separation successful for {track.song_name} in {track.fmt} format. "
+                            f"Files saved as: {vocals_dest}, {instr_dest}")
+
+
+def decode_stage(separator, track):
+    """Materialize an identical earlier result, or decode the input (long-form inputs are streamed later)."""
+    cache = result_cache.get_cache()
+    dests = cache.materialize(track.cache_key, track.stem_paths, track.fmt, **track.writer_options)
+    if dests is not None:
+        events.log(track.label, f"Reusing cached separation of {track.song_name}")
+        track.from_cache = True
+        _saved(track, dests)
+        # Long-form vocals are read from the written file by the transcriber instead of being loaded whole
+        in_memory = track.do_transcribe and not track.long_form
+        cached = cache.load_stem(track.cache_key, track.stem_paths[0][0]) if in_memory else None
+        if cached is not None:
+            track.speech = speech_audio(*cached)
+    elif not track.long_form:
+        with events.span(events.DECODE):
+            separator.decode(track)
+
+
+def separate_stage(separator, track):
+    if track.from_cache:
+        return
+    if track.long_form:
+        events.log(track.label, f"Long-form input, separating in {chunked.WINDOW_SECONDS:.0f}s windows")
+    with events.span(events.INFERENCE, model=track.model, long_form=track.long_form):
+        separator.infer(track)
+    track.audio = None
+
+
+def encode_stage(separator, track):
+    if track.from_cache:
+        return
+    try:
+        with events.span(events.ENCODE, fmt=track.fmt):
+            dests = result_cache.get_cache().save(track.cache_key, track.stems, track.sample_rate,
+                                                  track.stem_paths, track.fmt, **track.writer_options)
+        _saved(track, dests)
+        if track.do_transcribe and not track.long_form:
+            # Long-form stems are memmapped; the transcriber streams the written vocals file instead
+            track.speech = speech_audio(track.stems[track.stem_paths[0][0]], track.sample_rate)
+    finally:
+        track.release()
+
+
+def transcribe_stage(separator, track):
+    if not track.do_transcribe or not track.dests:
+        return
+    # The written file is only read back when the float vocals are not at hand
+    vocals = track.speech if track.speech is not None else track.dests[0]
+    track.speech = None
+    with events.span(events.TRANSCRIBE, tool=track.trans_tool, model=track.trans_model):
+        success = transcribe_vocals(track.label, track.song_name, track.trans_tool, vocals, track.trans_path,
+                                    track.trans_model)
+    if success and track.outputs is not None:
+        track.outputs["transcription"] = track.trans_path
+
+
+STAGE_FUNCTIONS = {DECODE: decode_stage, SEPARATE: separate_stage, ENCODE: encode_stage, TRANSCRIBE: transcribe_stage}
+
+
+def run_track(separator, track):
+    """Run every stage of one track in the calling thread."""
+    try:
+        for stage in STAGES:
+            STAGE_FUNCTIONS[stage](separator, track)
+    finally:
+        track.release()
+
+
+def has_stages(separator):
+    return all(hasattr(separator, name) for name in ("prepare", "decode", "infer"))
+
+
+class _Item:
+    def __init__(self, separator, job, start=None):
+        self.separator = separator
+        self.job = job
+        self.start = start
+        self.track = None
+        self.success = False
+        self.error = None
+        self.done = threading.Event()
+
+
+class StagedPipeline:
+    def __init__(self, separate_workers=1, queue_size=QUEUE_SIZE):
+        """
+        Runs jobs through the decode, separate, encode and transcribe stages, each on its own threads.
+
+        Stages are connected by bounded queues, so while song N is encoded and transcribed song N+1
+        is already being separated and song N+2 decoded. At most queue_size songs wait in front of
+        a stage, which bounds the decoded audio and stems held in memory. Separators without stage
+        methods run their whole separate() in the separate stage.
+
+        :param separate_workers: Songs separated (model inference) at the same time.
+        """
+        self.queue_size = max(1, int(queue_size))
+        self._queues = {stage: queue.Queue(maxsize=self.queue_size) for stage in STAGES}
+        self._workers = {stage: 1 for stage in STAGES}
+        self._workers[SEPARATE] = max(1, int(separate_workers))
+        self._threads = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        """Jobs the pipeline can hold at once (in a stage or waiting in front of one)."""
+        with self._lock:
+            return sum(self._workers.values()) + self.queue_size * len(STAGES)
+
+    def set_separate_workers(self, workers):
+        """Change the number of separate-stage threads; extra threads exit after their current song."""
+        with self._lock:
+            self._workers[SEPARATE] = max(1, int(workers))
+            excess = len([t for t in self._threads[SEPARATE] if t.is_alive()]) - self._workers[SEPARATE]
+        for _ in range(excess):
+            try:
+                # Wakes a thread waiting for a song so it can exit; busy threads check when they finish
+                self._queues[SEPARATE].put_nowait(None)
+            except queue.Full:
+                break  # Songs are waiting, so no thread is blocked in get()
+
+    def _spawn_threads(self):
+        with self._lock:
+            for stage in STAGES:
+                threads = [t for t in self._threads[stage] if t.is_alive()]
+                while len(threads) < self._workers[stage]:
+                    thread = threading.Thread(target=self._stage_loop, args=(stage,),
+                                              name=f"pipeline-{stage}-{len(threads) + 1}", daemon=True)
+                    threads.append(thread)
+                    thread.start()
+                self._threads[stage] = threads
+
+    def run(self, separator, job, start=None):
+        """
+        Push one job through every stage and wait until it leaves the last one.
+
+        Called from the JobQueue workers (with defer_start=True), so the job queue keeps tracking
+        states and throughput.
+        :param start: Called when the decode stage takes the job; the job is dropped if it returns False.
+        :return: True if the job succeeded; exceptions raised by a stage are re-raised.
+        """
+        item = _Item(separator, job, start)
+        self._spawn_threads()
+        self._queues[DECODE].put(item)
+        item.done.wait()
+        job.stage = None
+        if item.error is not None:
+            raise item.error
+        return item.success
+
+    def _retire(self, stage):
+        # A thread above the stage's worker count exits
+        with self._lock:
+            current = threading.current_thread()
+            if len(self._threads[stage]) > self._workers[stage] and current in self._threads[stage]:
+                self._threads[stage].remove(current)
+                return True
+            return False
+
+    def _stage_loop(self, stage):
+        index = STAGES.index(stage)
+        next_stage = STAGES[index + 1] if index + 1 < len(STAGES) else None
+        while not self._retire(stage):
+            item = self._queues[stage].get()
+            if item is None:
+                continue  # Wake-up from set_separate_workers(): check _retire again
+            if self._retire(stage):
+                # The pool shrank while this thread waited: leave the song to the threads that stay
+                self._queues[stage].put(item)
+                return
+            if stage == DECODE and item.start is not None and not item.start():
+                item.done.set()  # Canceled while it waited
+                continue
+            item.job.stage = stage
+            token = item.job.token
+            token.resume()
+            try:
+                # A canceled job waiting in front of a stage is dropped without running it
+                token.check()
+                with events.context(job=item.job.id, song=item.job.song_name, stage=stage), cancellation.use(token):
+                    self._process(stage, item)
+                token.check()
+            except Exception as e:
+                if isinstance(e, cancellation.Cancelled):
+                    events.log("Pipeline", f"'{item.job.song_name}' {e} in {stage}", level="warning", job=item.job.id)
+                else:
+                    events.log("Pipeline", f"{stage} failed for '{item.job.song_name}': {e}", level="error",
+                               job=item.job.id)
+                if item.track is not None:
+                    item.track.release()
+                item.error = e
+                item.done.set()
+                continue
+            if next_stage is None:
+                item.done.set()
+            else:
+                token.pause()  # Waiting for the next stage does not count toward the job's timeout
+                self._queues[next_stage].put(item)  # Blocks while the next stage is backed up
+
+    def _process(self, stage, item):
+        separator, job = item.separator, item.job
+        if not has_stages(separator):
+            if stage == SEPARATE:
+                item.success = bool(job_queue.run_job(separator, job))
+            return
+        if stage == DECODE:
+            item.track = separator.prepare(job.input_path, job.song_name, job.vocals_folder, job.instr_folder,
+                                           job.trans_folder, outputs=job.outputs, **job_queue.job_kwargs(job))
+        STAGE_FUNCTIONS[stage](separator, item.track)
+        item.success = True
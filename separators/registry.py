@@ -0,0 +1,118 @@
+import gc
+import sys
+import time
+import threading
+import importlib
+import contextlib
+from separators import events
+
+# Canonical tool name -> (module, class); modules are imported the first time a tool is used
+SEPARATORS = {
+    "Spleeter": ("separators.spleeter_separator", "SpleeterSeparator"),
+    "Demucs": ("separators.demucs_separator", "DemucsSeparator"),
+    "OpenUnmix": ("separators.openunmix_separator", "OpenUnmixSeparator"),
+}
+
+
+def canonical_tool(tool):
+    """Map a tool name in any letter case (e.g. 'demucs') to its canonical name ('Demucs')."""
+    for name in SEPARATORS:
+        if name.lower() == str(tool).lower():
+            return name
+    raise ValueError(f"Unknown AI tool: {tool}")
+
+
+class SeparatorRegistry:
+    def __init__(self):
+        """Builds separator backends on first use and can drop the ones that sit idle."""
+        self._separators = {}
+        self._last_used = {}
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in SEPARATORS}
+
+    def get(self, tool):
+        """Return the separator for tool, importing and constructing it on first call."""
+        tool = canonical_tool(tool)
+        with self._load_locks[tool]:  # Only one thread builds a given backend
+            with self._lock:
+                separator = self._separators.get(tool)
+            if separator is None:
+                module_name, class_name = SEPARATORS[tool]
+                events.log("Registry", f"Loading {tool} backend...")
+                start = time.perf_counter()
+                with events.span(events.MODEL_LOAD, tool=tool):
+                    module = importlib.import_module(module_name)
+                    separator = getattr(module, class_name)()
+                events.log("Registry", f"{tool} ready in {time.perf_counter() - start:.1f}s")
+                with self._lock:
+                    self._separators[tool] = separator
+        with self._lock:
+            self._last_used[tool] = time.monotonic()
+        return separator
+
+    @contextlib.contextmanager
+    def use(self, tool):
+        """Context manager that keeps the backend from being unloaded while a job runs on it."""
+        tool = canonical_tool(tool)
+        separator = self.get(tool)
+        with self._lock:
+            self._in_use[tool] = self._in_use.get(tool, 0) + 1
+        try:
+            yield separator
+        finally:
+            with self._lock:
+                self._in_use[tool] -= 1
+                self._last_used[tool] = time.monotonic()
+
+    def preload_async(self, tool, callback=None):
+        """Build a backend in a background thread; callback(tool, error) is called when done."""
+        def load():
+            error = None
+            try:
+                self.get(tool)
+            except Exception as e:
+                events.log("Registry", f"Failed to load {tool}: {e}", level="error")
+                error = e
+            if callback:
+                callback(tool, error)
+
+        thread = threading.Thread(target=load, name=f"load-{tool}")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def is_loaded(self, tool):
+        with self._lock:
+            return canonical_tool(tool) in self._separators
+
+    def loaded_tools(self):
+        with self._lock:
+            return list(self._separators)
+
+    def unload(self, tool):
+        """Drop a backend so its models can be garbage collected. Returns False if it is busy."""
+        tool = canonical_tool(tool)
+        with self._lock:
+            if self._in_use.get(tool, 0) > 0 or tool not in self._separators:
+                return False
+            separator = self._separators.pop(tool)
+            self._last_used.pop(tool, None)
+        if hasattr(separator, "close"):
+            separator.close()  # e.g. stop helper processes
+        del separator
+        gc.collect()
+        if "torch" in sys.modules:
+            torch = sys.modules["torch"]
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        events.log("Registry", f"Unloaded {tool} backend.")
+        return True
+
+    def unload_idle(self, max_idle_seconds):
+        """Unload every backend unused for longer than max_idle_seconds and return their names."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [tool for tool, last in self._last_used.items()
+                    if now - last > max_idle_seconds and self._in_use.get(tool, 0) == 0]
+        return [tool for tool in idle if self.unload(tool)]
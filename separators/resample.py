@@ -0,0 +1,79 @@
+import functools
+from math import gcd
+import numpy as np
+from scipy import signal
+from separators import events
+
+BLOCK_FRAMES = 1 << 18
+
+
+@functools.lru_cache(maxsize=32)
+def kernel(src_sr, dst_sr):
+    """
+    Polyphase filter for one (src_sr, dst_sr) pair, designed once and cached.
+
+    Uses the same Kaiser-windowed FIR as scipy.signal.resample_poly, so results match it.
+    :return: (up, down, padded filter, output offset)
+    """
+    divisor = gcd(int(src_sr), int(dst_sr))
+    up, down = int(dst_sr) // divisor, int(src_sr) // divisor
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * up
+    pre_pad = down - half_len % down
+    h = np.concatenate([np.zeros(pre_pad), h]).astype(np.float32)
+    h.setflags(write=False)
+    return up, down, h, (half_len + pre_pad) // down
+
+
+def output_frames(frames, src_sr, dst_sr):
+    up, down, _, _ = kernel(src_sr, dst_sr)
+    return -(-frames * up // down)
+
+
+def resample_blocks(audio, src_sr, dst_sr, block_frames=BLOCK_FRAMES):
+    """
+    Resample a (frames, channels) or 1-D float array block by block, yielding float32 output blocks.
+
+    Input blocks start on multiples of `down`, so each one maps onto a whole number of output
+    frames, and every block reads enough neighbouring input to make the concatenated output
+    identical to resampling the whole array at once. A memmap input is never loaded whole.
+    """
+    if src_sr == dst_sr:
+        for start in range(0, len(audio), block_frames):
+            yield np.asarray(audio[start:start + block_frames], dtype=np.float32)
+        return
+    up, down, h, offset = kernel(src_sr, dst_sr)
+    frames = len(audio)
+    total = output_frames(frames, src_sr, dst_sr)
+    step = max(1, block_frames // down) * down
+    # Input frames on each side that reach into a block's outputs, rounded up to a multiple of down
+    context = -(-(len(h) // up + 1) // down) * down
+    for start in range(0, frames, step):
+        first = start // down * up
+        last = min((start + step) // down * up, total)
+        lo = max(0, start - context)
+        hi = min(frames, start + step + context)
+        chunk = np.asarray(audio[lo:hi], dtype=np.float32)
+        out = signal.upfirdn(h, chunk, up, down, axis=0)
+        begin = first - lo // down * up + offset
+        block = out[begin:begin + last - first]
+        if len(block) < last - first:  # Past the end of the full convolution everything is zero
+            pad = [(0, last - first - len(block))] + [(0, 0)] * (block.ndim - 1)
+            block = np.pad(block, pad)
+        yield block.astype(np.float32, copy=False)
+
+
+def resample(audio, src_sr, dst_sr, axis=0):
+    """
+    Resample a float array along axis (frames axis; 0 for (frames, channels) layouts).
+
+    :return: float32 array with ceil(frames * dst_sr / src_sr) frames along axis.
+    """
+    audio = np.moveaxis(np.asarray(audio), axis, 0)
+    if src_sr == dst_sr:
+        return np.moveaxis(audio.astype(np.float32, copy=False), 0, axis)
+    with events.span(events.RESAMPLE, src_sr=src_sr, dst_sr=dst_sr, frames=len(audio)):
+        blocks = list(resample_blocks(audio, src_sr, dst_sr))
+    out = np.concatenate(blocks) if blocks else np.zeros((0,) + audio.shape[1:], dtype=np.float32)
+    return np.moveaxis(out, 0, axis)
@@ -0,0 +1,269 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import threading
+import contextlib
+import numpy as np
+from separators import audio_writer, decode_cache, events
+
+try:
+    import fcntl  # Reflinks; not available on Windows
+except ImportError:
+    fcntl = None
+
+DEFAULT_CACHE_MB = 4096
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "separation_app", "results")
+
+
+def unique_filename(base_path):
+    """Generate a unique filename by appending _1, _2, etc., if the file exists."""
+    if not os.path.exists(base_path):
+        return base_path
+    base, ext = os.path.splitext(base_path)
+    counter = 1
+    while True:
+        new_path = f"{base}_{counter}{ext}"
+        if not os.path.exists(new_path):
+            return new_path
+        counter += 1
+
+
+FICLONE = 0x40049409  # Linux ioctl: share the source's blocks copy-on-write (btrfs, XFS)
+
+
+def _unchanged_copy(source, path):
+    """True if path is a copy of source nobody edited since: same size and modification time."""
+    try:
+        a, b = os.stat(source), os.stat(path)
+    except OSError:
+        return False
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+
+def _copy(source, base_path):
+    """
+    Place a copy of source at base_path: a reflink where the file system supports it, else a
+    plain copy. Never a hardlink, so editing an output in place cannot change the cached encode.
+
+    An existing base_path that is an unchanged copy of source is reused instead of adding a _1
+    duplicate.
+    """
+    if _unchanged_copy(source, base_path):
+        return base_path
+    dest = unique_filename(base_path)
+    try:
+        if fcntl is None:
+            raise OSError("reflinks not supported")
+        with open(source, "rb") as src, open(dest, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        shutil.copyfile(source, dest)
+    stat = os.stat(source)
+    os.utime(dest, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # Lets a repeat recognize the copy
+    return dest
+
+
+class ResultCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_mb=DEFAULT_CACHE_MB):
+        """
+        Separated stems keyed by (input content hash, tool, model, shifts).
+
+        Float stems are stored once per key; every requested output format is encoded from them
+        once (also cached) and copied to the output folders (reflinked where the file system
+        supports it), so repeating a job takes no inference. Least recently used entries are deleted once the
+        directory exceeds max_mb; max_mb=0 disables the cache.
+        """
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> [lock, number of users]
+
+    def set_max_mb(self, max_mb):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.evict()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, input_path, tool, model=None, shifts=None):
+        """Cache key of one separation; inputs with identical content share it whatever their names."""
+        content = decode_cache.get_cache().content_hash(input_path)
+        params = json.dumps([tool, model, shifts])
+        return f"{content}_{hashlib.blake2b(params.encode(), digest_size=8).hexdigest()}"
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    @contextlib.contextmanager
+    def _key_lock(self, key):
+        """Hold the lock of one key; its entry is dropped once nobody uses it any more."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def has(self, key):
+        return self.enabled and os.path.exists(os.path.join(self._entry(key), "stems.json"))
+
+    def store(self, key, stems, sample_rate):
+        """
+        Save float stems ({name: (frames, channels) array}) under key.
+
+        Stems larger than half the budget (e.g. hours-long recordings) are not cached.
+        :return: True if the stems were stored.
+        """
+        if not self.enabled:
+            return False
+        size = sum(audio_writer.as_frames(audio).nbytes for audio in stems.values())
+        if size > self.max_bytes // 2:
+            return False
+        entry = self._entry(key)
+        with self._key_lock(key):
+            if self.has(key):
+                return True
+            temp = f"{entry}.{uuid.uuid4().hex}.tmp"
+            os.makedirs(temp)
+            try:
+                for name, audio in stems.items():
+                    np.save(os.path.join(temp, f"{name}.npy"), audio_writer.as_frames(audio))
+                with open(os.path.join(temp, "stems.json"), "w") as f:
+                    json.dump({"sample_rate": int(sample_rate), "stems": list(stems)}, f)
+                shutil.rmtree(entry, ignore_errors=True)
+                os.replace(temp, entry)
+            except OSError as e:
+                events.log("Result cache", f"Could not store {key}: {e}", level="error")
+                shutil.rmtree(temp, ignore_errors=True)
+                return False
+        self.evict(keep=entry)
+        return True
+
+    def load_stem(self, key, name):
+        """A cached float stem as a read-only memmap and its sample rate, or None."""
+        if not self.has(key):
+            return None
+        entry = self._entry(key)
+        with self._key_lock(key):
+            try:
+                with open(os.path.join(entry, "stems.json")) as f:
+                    sample_rate = json.load(f)["sample_rate"]
+                return np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r"), sample_rate
+            except (OSError, ValueError, KeyError):
+                return None
+
+    def materialize(self, key, outputs, fmt, **writer_kwargs):
+        """
+        Place cached stems at the requested output paths.
+
+        :param outputs: List of (stem name, base output path) pairs.
+        :param writer_kwargs: Format options passed to audio_writer (out_sr, bit_depth, bitrate, ...).
+        :return: List of output paths, or None if key is not cached.
+        """
+        if not self.has(key):
+            return None
+        entry = self._entry(key)
+        options = json.dumps([fmt, sorted((k, str(v)) for k, v in writer_kwargs.items())])
+        encoded_dir = os.path.join(entry, hashlib.blake2b(options.encode(), digest_size=8).hexdigest())
+        with self._key_lock(key):
+            if not self.has(key):  # Evicted meanwhile
+                return None
+            with open(os.path.join(entry, "stems.json")) as f:
+                sample_rate = json.load(f)["sample_rate"]
+            encoded = [os.path.join(encoded_dir, f"{name}.{fmt}") for name, _ in outputs]
+            missing = [(path, name) for path, (name, _) in zip(encoded, outputs) if not os.path.exists(path)]
+            if missing:
+                # First request in this format: encode from the float stems, then keep the files
+                os.makedirs(encoded_dir, exist_ok=True)
+                temps = [f"{path}.{uuid.uuid4().hex}.{fmt}" for path, _ in missing]
+                stems = [np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r") for _, name in missing]
+                audio_writer.write_stems(list(zip(temps, stems)), sample_rate, fmt, **writer_kwargs)
+                del stems
+                for temp, (path, _) in zip(temps, missing):
+                    os.replace(temp, path)
+            for path in (self._entry(key), encoded_dir):
+                os.utime(path)  # Mark as recently used
+            dests = []
+            with events.span(events.MOVE, files=len(outputs)):
+                for path, (_, base_path) in zip(encoded, outputs):
+                    os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+                    dests.append(_copy(path, base_path))
+        return dests
+
+    def save(self, key, stems, sample_rate, outputs, fmt, **writer_kwargs):
+        """
+        Store freshly separated stems and write the outputs from the cache, or straight to the
+        output folders when the stems cannot be cached.
+
+        :param stems: {stem name: float array} at sample_rate.
+        :param outputs: List of (stem name, base output path) pairs.
+        :return: List of output paths.
+        """
+        if self.store(key, stems, sample_rate):
+            dests = self.materialize(key, outputs, fmt, **writer_kwargs)
+            if dests is not None:
+                return dests
+        dests = [unique_filename(base_path) for _, base_path in outputs]
+        audio_writer.write_stems([(dest, stems[name]) for dest, (name, _) in zip(dests, outputs)],
+                                 sample_rate, fmt, **writer_kwargs)
+        return dests
+
+    def entries(self):
+        """List of (entry path, size in bytes, last use time), least recently used first."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if name.endswith(".tmp") or not os.path.isdir(entry):
+                continue
+            size = 0
+            for root, _, files in os.walk(entry):
+                for file in files:
+                    try:
+                        size += os.path.getsize(os.path.join(root, file))
+                    except OSError:
+                        pass
+            entries.append((entry, size, os.path.getmtime(entry)))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits max_bytes; returns the removed paths."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for entry, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            with self._key_lock(os.path.basename(entry)):
+                shutil.rmtree(entry, ignore_errors=True)
+            if not os.path.exists(entry):
+                total -= size
+                removed.append(entry)
+        return removed
+
+    def clear(self):
+        for entry, _, _ in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+_cache = ResultCache(os.environ.get("RESULT_CACHE_DIR", DEFAULT_DIRECTORY),
+                     float(os.environ.get("RESULT_CACHE_MB", DEFAULT_CACHE_MB)))
+
+
+def get_cache():
+    """The result cache shared by every separator in this process."""
+    return _cache
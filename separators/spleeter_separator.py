@@ -1,136 +1,136 @@
 import os
-import subprocess
-import shlex
-import tempfile
-import shutil
+import time
+import threading
+import numpy as np
 from spleeter.separator import Separator
-from spleeter.audio import Codec
-# Transcription tools
-import separators.whisper_transcription as whisper_trans 
-#import separators.wav2vec2_transcription as wav2vec2_trans 
-#import separators.coqui_transcription as coqui_trans 
+from separators.spleeter_worker import SpleeterWorker
+from separators import cancellation, chunked, decode_cache, events, pipeline, result_cache
 
 class SpleeterSeparator:
     def __init__(self):
         self.model = 'spleeter:2stems'
+        self.sample_rate = 44100  # Rate the Spleeter models work at
+        self.separator = None
+        self.worker = None  # Persistent fallback process, started on first need
+        self._lock = threading.Lock()  # The TF session is shared by all queue workers
         try:
-            self.separator = Separator(self.model)
-            print("Spleeter initialized successfully (direct API)")
+            # multiprocess=False: stems are returned in memory, no writer pool is needed
+            self.separator = Separator(self.model, multiprocess=False)
+            events.log("Spleeter", "Initialized successfully (direct API)")
         except Exception as e:
-            print(f"Spleeter init warning: {e} (will use CLI)")
-        self.whisper_trans = whisper_trans.WhisperTranscription()
-        #self.wav2vec2_trans = wav2vec2_trans.Wav2Vec2Transcription() 
-        #self.coqui_trans = coqui_trans.CoquiTranscription()
+            events.log("Spleeter", f"Init warning: {e} (will use worker process)", level="warning")
 
-    def _get_unique_filename(self, base_path):
-        """Generate a unique filename by appending _1, _2, etc., if the file exists."""
-        if not os.path.exists(base_path):
-            return base_path
-        base, ext = os.path.splitext(base_path)
-        counter = 1
-        while True:
-            new_path = f"{base}_{counter}{ext}"
-            if not os.path.exists(new_path):
-                return new_path
-            counter += 1
+    def warm_up(self, model=None):
+        """
+        Load the model ahead of the first song; returns the seconds spent loading.
 
-    def separate(self, 
-                input_path: str, 
-                song_name: str, 
-                vocals_folder: str, 
-                instr_folder: str,
-                trans_folder: str, 
-                fmt="wav", 
-                sr=44100, 
-                bitrate="128k", 
-                do_transcribe=False,  
-                trans_tool="whisper", 
-                trans_model="tiny"):
-        try:
-            # Check if input exists
-            if not os.path.exists(input_path):
-                print(f"Spleeter: Input file not found: {input_path}")
-                return False
+        Spleeter builds its TensorFlow graph and reads the weights on the first separation, so a
+        second of silence is separated here (starting the worker process if the direct API fails).
+        """
+        start = time.perf_counter()
+        with events.span(events.MODEL_LOAD, tool="Spleeter", model=self.model):
+            self.separate_waveform(np.zeros((self.sample_rate, 2), dtype=np.float32))
+        load_time = time.perf_counter() - start
+        events.log("Spleeter", f"Model '{self.model}' loaded in {load_time:.1f}s")
+        return load_time
 
-            if fmt == "flac":
-                codec = Codec.FLAC
-            elif fmt == "mp3":
-                codec = Codec.MP3
-            else:
-                codec = Codec.WAV
-            print(f"Debug: Codec value: {codec}, type: {type(codec)}")  # Debug: Confirm it's a ENUM
-    
-            # Create temp dir for processing
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Try direct API first with all parameters
-                try:
-                    self.separator.separate_to_file(audio_descriptor=input_path, destination=temp_dir, audio_adapter=None, codec=codec)
-                    print("Spleeter: Direct API separation successful")
-                except Exception as api_err:
-                    print(f"Spleeter: Direct API failed ({api_err}), falling back to CLI")
-                    # CLI fallback with parameters
-                    cmd = [
-                        'spleeter', 'separate',
-                        '-p', self.model,
-                        '-o', temp_dir,
-                        '--codec', fmt.lower(),
-                        '--bitrate', bitrate,
-                    ]
-                    
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                    if result.returncode != 0:
-                        print(f"Spleeter CLI error: {result.stderr}")
-                        return False
+    def separate_waveform(self, waveform):
+        """Separate a (samples, channels) float32 waveform in memory; returns {'vocals': ..., 'accompaniment': ...}."""
+        if self.separator is not None:
+            try:
+                with self._lock:
+                    return self.separator.separate(waveform)
+            except Exception as api_err:
+                events.log("Spleeter", f"Direct API failed ({api_err}), falling back to worker process", level="error")
+        with self._lock:
+            if self.worker is None:
+                self.worker = SpleeterWorker(self.model)
+        return self.worker.separate(waveform)
 
-                # Find and move output files from temp_dir to final folders
-                # Assuming filename_format creates files like "song_name/vocals.wav" in temp_dir
-                vocals_src = os.path.join(temp_dir, f"{song_name}/vocals.{fmt}")
-                instr_src = os.path.join(temp_dir, f"{song_name}/accompaniment.{fmt}")
+    def close(self):
+        """Stop the worker process, if one was started."""
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
 
-                if not os.path.exists(vocals_src) or not os.path.exists(instr_src):
-                    print(f"Spleeter: Output files not found in {temp_dir}. Check filename_format.")
-                    return False
+    def prepare(self,
+                input_path: str,
+                song_name: str,
+                vocals_folder: str,
+                instr_folder: str,
+                trans_folder: str,
+                fmt="wav",
+                sr=44100,
+                bitrate="128k",
+                do_transcribe=False,
+                trans_tool="whisper",
+                trans_model="tiny",
+                bit_depth=24,
+                long_form=None,
+                outputs=None):
+        """Check the input and describe where its stems go; returns a pipeline.Track."""
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
 
-                # Ensure final folders exist
-                os.makedirs(vocals_folder, exist_ok=True)
-                os.makedirs(instr_folder, exist_ok=True)
+        # Ensure final folders exist
+        os.makedirs(vocals_folder, exist_ok=True)
+        os.makedirs(instr_folder, exist_ok=True)
 
-                # Generate unique destination paths
-                base_vocals_dest = os.path.join(vocals_folder, f"{song_name}_S_vocals.{fmt}")
-                base_instr_dest = os.path.join(instr_folder, f"{song_name}_S_instrumental.{fmt}")
+        base_vocals_dest = os.path.join(vocals_folder, f"{song_name}_S_vocals.{fmt}")
+        base_instr_dest = os.path.join(instr_folder, f"{song_name}_S_instrumental.{fmt}")
+        return pipeline.Track(
+            "Spleeter", input_path, song_name,
+            stem_paths=[("vocals", base_vocals_dest), ("accompaniment", base_instr_dest)],
+            cache_key=result_cache.get_cache().key(input_path, "Spleeter", self.model),
+            fmt=fmt, writer_options={"out_sr": sr, "bit_depth": bit_depth, "bitrate": bitrate},
+            trans_path=os.path.join(trans_folder, f"{song_name}_S_transcription.txt"),
+            do_transcribe=do_transcribe, trans_tool=trans_tool, trans_model=trans_model,
+            long_form=chunked.use_long_form(input_path, long_form), outputs=outputs)
 
-                vocals_dest = self._get_unique_filename(base_vocals_dest)
-                instr_dest = self._get_unique_filename(base_instr_dest)
+    def decode(self, track):
+        """Decode (or reuse a cached decode of) the input at the model rate."""
+        track.audio = decode_cache.get_cache().load(track.input_path, self.sample_rate)
 
-                # Move files to unique final locations
-                shutil.move(vocals_src, vocals_dest)
-                shutil.move(instr_src, instr_dest)
+    def infer(self, track):
+        """Separate the decoded audio in memory (no temp files), or a long-form input window by window."""
+        if track.long_form:
+            # Stream the input in overlapping windows; memory stays flat for any length
+            track.stems = chunked.separate_file(track.input_path, self.separate_waveform, self.sample_rate,
+                                                track.make_temp_dir())
+        else:
+            # 30 s windows instead of one call, so progress can be reported along the way
+            track.stems = chunked.separate_array(np.asarray(track.audio), self.separate_waveform, self.sample_rate)
+        track.sample_rate = self.sample_rate
+        events.log("Spleeter", "Separation successful")
 
-                print(f"Spleeter separation successful for {song_name} in {fmt} format. Files saved as: {vocals_dest}, {instr_dest}")
-                
-            if do_transcribe:
-                trans_path = os.path.join(trans_folder, f"{song_name}_S_transcription.txt")
-                if trans_tool == "whisper":
-                    success_trans = self.whisper_trans.transcribe(vocals_dest, trans_path, trans_model)
-                elif trans_tool == "wav2vec2":
-                    print("Placeholder for wav2vec2 transcription tool")
-                    #success_trans = self.wav2vec2_trans.transcribe(vocals_dest, trans_path, trans_model)
-                elif trans_tool == "coqui":
-                    print("Placeholder for coqui transcription tool")
-                    #success_trans = self.coqui_trans.transcribe(vocals_dest, trans_path, trans_model)
-                else:
-                    print(f"Spleeter: Unknown transcription tool '{trans_tool}'.")
-                    success_trans = False
-                if success_trans:
-                    print(f"Spleeter: Transcription completed for {song_name} by '{trans_tool}' using '{trans_model}'.")
-                else:
-                    print(f"Spleeter: Transcription failed for {song_name} by '{trans_tool}' using '{trans_model}'.")
-                
-                return True
+    def separate(self,
+                input_path: str,
+                song_name: str,
+                vocals_folder: str,
+                instr_folder: str,
+                trans_folder: str,
+                fmt="wav",
+                sr=44100,
+                bitrate="128k",
+                do_transcribe=False,
+                trans_tool="whisper",
+                trans_model="tiny",
+                bit_depth=24,
+                long_form=None,
+                outputs=None):
+        try:
+            track = self.prepare(input_path, song_name, vocals_folder, instr_folder, trans_folder, fmt=fmt, sr=sr,
+                                 bitrate=bitrate, do_transcribe=do_transcribe, trans_tool=trans_tool,
+                                 trans_model=trans_model, bit_depth=bit_depth, long_form=long_form, outputs=outputs)
+            # Outputs are copies of stems encoded once in the result cache
+            pipeline.run_track(self, track)
+            return True
 
-        except subprocess.CalledProcessError as e:
-            print(f"Spleeter subprocess failed: {e.stderr}")
+        except FileNotFoundError as e:
+            events.log("Spleeter", str(e), level="error")
             return False
+        except cancellation.Cancelled:
+            raise
         except Exception as e:
-            print(f"Spleeter general error: {e}")
-            return False
\ No newline at end of file
+            events.log("Spleeter", f"General error: {e}", level="error")
+            return False
@@ -0,0 +1,77 @@
+import threading
+import multiprocessing
+import numpy as np
+from separators import events
+
+
+def _serve(model, requests, results):
+    """Child process loop: build the Spleeter session once, then separate waveforms until told to stop."""
+    try:
+        from spleeter.separator import Separator
+        separator = Separator(model, multiprocess=False)
+        # The graph and weights are only loaded by the first separation; do it before reporting ready
+        separator.separate(np.zeros((44100, 2), dtype=np.float32))
+        results.put(("ready", None))
+    except Exception as e:
+        results.put(("error", f"Spleeter worker init failed: {e}"))
+        return
+    while True:
+        waveform = requests.get()
+        if waveform is None:
+            break
+        try:
+            results.put(("ok", separator.separate(waveform)))
+        except Exception as e:
+            results.put(("error", str(e)))
+
+
+class SpleeterWorker:
+    def __init__(self, model='spleeter:2stems', start_timeout=300):
+        """
+        Long-lived child process holding its own Spleeter session.
+
+        Used when the in-process TensorFlow session cannot be used, so that TensorFlow is
+        started once per app run instead of once per song like the old `spleeter` CLI fallback.
+        """
+        self.model = model
+        self.start_timeout = start_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._requests = None
+        self._results = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # Called with self._lock held
+        if self._process is not None and self._process.is_alive():
+            return
+        self._requests = self._context.Queue()
+        self._results = self._context.Queue()
+        self._process = self._context.Process(target=_serve, args=(self.model, self._requests, self._results),
+                                              name="spleeter-worker", daemon=True)
+        self._process.start()
+        status, message = self._results.get(timeout=self.start_timeout)
+        if status != "ready":
+            self._process.join(1)
+            self._process = None
+            raise RuntimeError(message)
+        events.log("Spleeter", "Worker process ready")
+
+    def separate(self, waveform, timeout=None):
+        """Separate a (samples, channels) float32 waveform; returns a dict of stem name -> waveform."""
+        with self._lock:  # One request at a time keeps requests and results paired
+            self._start()
+            self._requests.put(waveform)
+            status, payload = self._results.get(timeout=timeout)
+        if status != "ok":
+            raise RuntimeError(f"Spleeter worker error: {payload}")
+        return payload
+
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                self._requests.put(None)
+                self._process.join(5)
+                if self._process.is_alive():
+                    self._process.terminate()
+            self._process = None
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from separators import audio_writer
+
+
+def sine(frames=44100, channels=2):
+    t = np.arange(frames, dtype=np.float32) / 44100
+    return np.stack([0.5 * np.sin(2 * np.pi * 440 * t)] * channels, axis=1)
+
+
+@pytest.mark.parametrize("fmt,bit_depth,subtype", [
+    ("wav", 16, "PCM_16"), ("wav", 24, "PCM_24"), ("wav", 32, "FLOAT"), ("wav", False, "FLOAT"),
+    ("flac", 16, "PCM_16"), ("flac", 24, "PCM_24"),
+])
+def test_wav_and_flac_bit_depths(tmp_path, fmt, bit_depth, subtype):
+    audio = sine()
+    path = str(tmp_path / f"out.{fmt}")
+    audio_writer.write_audio(path, audio, 44100, fmt, bit_depth=bit_depth, block_frames=1000)
+    info = sf.info(path)
+    assert (info.subtype, info.samplerate, info.channels, info.frames) == (subtype, 44100, 2, len(audio))
+    data, _ = sf.read(path, dtype="float32")
+    np.testing.assert_allclose(data, audio, atol=1e-4)
+
+
+def test_layouts_and_clipping(tmp_path):
+    loud = sine(1000) * 4  # Peak 2.0
+    path = str(tmp_path / "clamp.wav")
+    audio_writer.write_audio(path, loud.T, 44100, "wav")  # Channels-first input
+    assert sf.read(path)[0].shape == (1000, 2)
+    assert np.abs(sf.read(path)[0]).max() <= 1.0
+
+    path = str(tmp_path / "rescale.wav")
+    audio_writer.write_audio(path, loud, 44100, "wav", bit_depth=32, clip="rescale", block_frames=100)
+    np.testing.assert_allclose(sf.read(path)[0], loud / (1.01 * 2.0), atol=1e-6)
+
+    path = str(tmp_path / "mono.wav")
+    audio_writer.write_audio(path, loud[:, 0], 44100, "wav")
+    assert sf.info(path).channels == 1
+
+
+def test_write_stems_concurrently(tmp_path):
+    stems = [(str(tmp_path / f"{name}.flac"), sine() * gain) for name, gain in (("vocals", 1), ("instr", 0.5))]
+    assert audio_writer.write_stems(stems, 44100, "flac") == [path for path, _ in stems]
+    for path, audio in stems:
+        np.testing.assert_allclose(sf.read(path, dtype="float32")[0], audio, atol=1e-4)
+    with pytest.raises(ValueError):
+        audio_writer.write_stems(stems, 44100, "ogg")
+
+
+def test_output_rate(tmp_path):
+    path = str(tmp_path / "48k.wav")
+    audio_writer.write_audio(path, sine(), 44100, "wav", out_sr=48000, bit_depth=32, block_frames=4096)
+    info = sf.info(path)
+    assert (info.samplerate, info.frames) == (48000, 48000)
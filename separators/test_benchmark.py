@@ -0,0 +1,67 @@
+import numpy as np
+
+from separators import benchmark, decode_cache, evaluation, pipeline, result_cache
+
+
+def test_synthetic_song():
+    song = benchmark.synthetic_song(2.0)
+    assert song.shape == (88200, 2) and song.dtype == np.float32
+    assert 0.1 < np.abs(song).max() <= 0.9
+    np.testing.assert_array_equal(song, benchmark.synthetic_song(2.0))
+    assert not np.array_equal(song[:, 0], song[:, 1])  # Real stereo
+
+
+class FakeSeparator:
+    def __init__(self):
+        self.warmed = []
+
+    def warm_up(self, model="default"):
+        self.warmed.append(model)
+
+    def prepare(self, input_path, song_name, vocals_folder, instr_folder, trans_folder, outputs=None, **options):
+        return pipeline.Track("Fake", input_path, song_name, stem_paths=[], cache_key=None, fmt=options.get("fmt"),
+                              writer_options={})
+
+    def decode(self, track):
+        track.audio = decode_cache.decode(track.input_path, 44100)
+
+    def infer(self, track):
+        track.stems = {"vocals": track.audio * 0.5, "instrumental": track.audio * 0.5}
+        track.sample_rate = 44100
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.separator = FakeSeparator()
+
+    def get(self, tool):
+        return self.separator
+
+
+def test_measure_and_compare(tmp_path, monkeypatch):
+    monkeypatch.setattr(decode_cache, "_cache", decode_cache.DecodeCache(str(tmp_path / "decoded")))
+    monkeypatch.setattr(result_cache, "_cache", result_cache.ResultCache(str(tmp_path / "results")))
+    songs = benchmark.write_songs(str(tmp_path / "songs"), [1.0, 2.0])
+    registry = FakeRegistry()
+    result = benchmark.measure(evaluation.parse_config("demucs:mdx"), songs, ["wav", "flac"], str(tmp_path / "out"),
+                               separators=registry)
+    assert registry.separator.warmed == ["mdx"]
+    assert set(result["runs"]) == {"1", "2"}
+    run = result["runs"]["2"]
+    assert run["rtf"] > 0 and run["cpu_seconds"] >= 0
+    assert set(run["encode_seconds"]) == {"wav", "flac"} and None not in run["encode_seconds"].values()
+    assert result["peak_rss_mb"] is None or result["peak_rss_mb"] > 0
+
+    baseline = {"results": {"Demucs_mdx": {"load_seconds": 1.0, "peak_rss_mb": 500.0,
+                                           "runs": {"2": {"infer_seconds": 10.0, "rtf": 0.5,
+                                                          "encode_seconds": {"mp3": 1.0}}}},
+                            "Spleeter": {"load_seconds": 1.0}}}
+    current = {"results": {"Demucs_mdx": {"load_seconds": 1.1, "peak_rss_mb": 510.0,  # Within tolerance
+                                          "runs": {"2": {"infer_seconds": 15.0, "rtf": 0.75,
+                                                         "encode_seconds": {"mp3": 1.02}}}},  # Under MIN_DELTA
+                           "Spleeter": {"error": "boom"}}}
+    regressions = benchmark.compare(current, baseline)
+    assert [(r["config"], r["measurement"]) for r in regressions] == [
+        ("Demucs_mdx", "2s.infer_seconds"), ("Demucs_mdx", "2s.rtf"), ("Spleeter", "error")]
+    assert regressions[0]["change"] == 0.5
+    assert "2s.rtf: 0.5 -> 0.75 (+50%)" in benchmark.format_regressions(regressions)
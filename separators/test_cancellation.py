@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from separators import cancellation, chunked, events, job_queue, pipeline, result_cache, transcription
+from separators.testing import StagedSeparator, run_jobs, vocals
+from separators.whisper_transcription import WhisperTranscription
+
+
+def test_token_checkpoints_and_timeout():
+    token = cancellation.CancelToken()
+    token.start()
+    token.check()
+    cancellation.check()  # No job in this thread: nothing to cancel
+    token.cancel("stop")
+    with cancellation.use(token), pytest.raises(cancellation.Cancelled, match="stop"):
+        events.ProgressBar(total=10).update()
+
+    closed = []
+
+    def blocks():
+        try:
+            while True:
+                yield np.zeros((100, 2), dtype=np.float32)
+        finally:
+            closed.append(True)  # stream_audio kills ffmpeg here
+
+    token = cancellation.CancelToken(timeout=0.05)
+    token.start()
+    token.pause()  # Waiting in front of a stage does not count
+    time.sleep(0.1)
+    token.check()
+    token.resume()
+    with cancellation.use(token), pytest.raises(cancellation.Cancelled) as raised:
+        chunked.separate_stream(blocks(), lambda window: {"vocals": window}, lambda name, block: None, 200, 50)
+    assert raised.value.timed_out and token.cancelled and closed == [True]
+    assert cancellation.current() is None
+
+
+class SlowSeparator(StagedSeparator):
+    """Inference runs in short steps with a checkpoint between them, like a window or shift loop."""
+
+    def __init__(self, steps=500):
+        super().__init__()
+        self.steps = steps
+        self.started = threading.Event()
+        self.temp_dirs = []
+
+    def infer(self, track):
+        self.temp_dirs.append(track.make_temp_dir())
+        self.started.set()
+        for _ in range(self.steps):
+            cancellation.check()
+            time.sleep(0.01)
+        super().infer(track)
+
+
+def test_canceled_running_job_stops_and_cleans_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "_cache", result_cache.ResultCache(str(tmp_path / "cache"), max_mb=0))
+    separator = SlowSeparator()
+    stages = pipeline.StagedPipeline(separate_workers=1)
+    q = job_queue.JobQueue(lambda job, start: stages.run(separator, job, start),
+                           max_workers=stages.capacity, defer_start=True)
+    folders = [str(tmp_path / name) for name in ("vocals", "instr", "text")]
+    job = q.submit(job_queue.SeparationJob(str(tmp_path / "long.wav"), "Demucs", *folders, {"fmt": "wav"}))
+    assert separator.started.wait(5)
+
+    start = time.perf_counter()
+    assert q.cancel_running() == 1
+    assert q.wait(timeout=5)
+    assert time.perf_counter() - start < 1.0
+    assert job.state == job_queue.CANCELED and job.error == "canceled" and job.outputs == {}
+    assert not os.path.exists(separator.temp_dirs[0])
+    assert not q.cancel(job)
+
+
+def test_timeout_starts_when_decoding_starts(tmp_path, monkeypatch):
+    # 8 songs of about 0.1 s each take longer than the timeout in total, but none does on its own
+    jobs = run_jobs(tmp_path, SlowSeparator(steps=10), [f"s{i}" for i in range(8)], monkeypatch, timeout=0.6)
+    assert [job.state for job in jobs] == [job_queue.DONE] * 8, [job.error for job in jobs]
+
+
+def test_timed_out_job_fails(tmp_path, monkeypatch):
+    separator = SlowSeparator()
+    start = time.perf_counter()
+    job, = run_jobs(tmp_path, separator, ["slow"], monkeypatch, timeout=0.2)
+    assert time.perf_counter() - start < 1.5
+    assert job.state == job_queue.FAILED and job.error == "timed out after 0.2s"
+    assert not os.path.exists(separator.temp_dirs[0])
+
+
+def test_transcribers_pass_cancellation_on(tmp_path, monkeypatch):
+    class CanceledModel:
+        def transcribe(self, audio, verbose=False):
+            raise cancellation.Cancelled()  # As raised by a checkpoint between Whisper windows
+
+    monkeypatch.setattr(WhisperTranscription, "load_model", lambda self, name: CanceledModel())
+    monkeypatch.setitem(transcription._transcribers, "whisper", WhisperTranscription())
+    with pytest.raises(cancellation.Cancelled):
+        transcription.transcribe_vocals("Fake", "song", "whisper", vocals(), str(tmp_path / "song.txt"), "tiny")
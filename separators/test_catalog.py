@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+import soundfile as sf
+
+from separators import catalog, job_queue
+
+
+def test_jobs_are_added_and_queried_with_filters_and_paging(tmp_path):
+    cat = catalog.OutputCatalog(":memory:")
+    vocals_dir = tmp_path / "vocals"
+    vocals_dir.mkdir()
+    for i in range(25):
+        job = job_queue.SeparationJob(f"in/song{i:02d}.mp3", "Demucs" if i % 2 else "Spleeter",
+                                      str(vocals_dir), "instr", "text", {"model": "mdx"})
+        path = str(vocals_dir / f"song{i:02d}_vocals.wav")
+        sf.write(path, np.zeros((4410, 2)), 44100)
+        job.outputs["vocals"] = path
+        job.outputs["instrumental"] = str(tmp_path / "missing.wav")  # Not on disk: skipped
+        cat.add_job(job)
+
+    assert cat.count("vocals") == 25 and cat.count("instrumentals") == 0
+    page = cat.query("vocals", folder=str(vocals_dir), offset=10, limit=10)
+    assert [row["name"] for row in page] == [f"song{i:02d}_vocals.wav" for i in range(10, 20)]
+    assert page[0]["duration"] == 0.1 and page[0]["fmt"] == "wav" and page[0]["source"] == "in/song10.mp3"
+    assert cat.count("vocals", tool="Demucs") == 12
+    assert [row["name"] for row in cat.query("vocals", text="song1")] == [f"song1{i}_vocals.wav" for i in range(10)]
+    assert cat.count("vocals", text="%") == 0  # LIKE wildcards are matched literally
+
+
+def test_sync_folder(tmp_path):
+    cat = catalog.OutputCatalog(str(tmp_path / "catalog.sqlite"))
+    for name in ["a.txt", "b.lrc", "c.wav"]:
+        (tmp_path / name).write_text("x")
+    assert cat.sync_folder(str(tmp_path), "transcriptions") == (2, 0)
+    assert cat.sync_folder(str(tmp_path), "transcriptions") == (0, 0)
+    os.remove(tmp_path / "a.txt")
+    assert cat.sync_folder(str(tmp_path), "transcriptions") == (0, 1)
+    assert [row["name"] for row in cat.query("transcriptions", folder=str(tmp_path))] == ["b.lrc"]
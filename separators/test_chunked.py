@@ -0,0 +1,62 @@
+import numpy as np
+
+from separators import chunked, events
+
+
+def blocks_of(audio, size):
+    for start in range(0, len(audio), size):
+        yield audio[start:start + size]
+
+
+def run(audio, window, overlap, block, fn):
+    out = {}
+    written = chunked.separate_stream(blocks_of(audio, block), fn, lambda name, b: out.setdefault(name, []).append(b),
+                                      window, overlap)
+    return written, {name: np.concatenate(parts) for name, parts in out.items()}
+
+
+def test_identity_separation_is_reconstructed_exactly():
+    audio = np.random.default_rng(0).standard_normal((10_007, 2)).astype(np.float32)
+    for window, overlap, block in [(1000, 200, 333), (1000, 0, 1000), (4096, 2048, 10_000), (20_000, 100, 64)]:
+        written, stems = run(audio, window, overlap, block, lambda w: {"vocals": w, "rest": w * 0.5})
+        assert written == len(audio)
+        np.testing.assert_allclose(stems["vocals"], audio, atol=1e-6)
+        np.testing.assert_allclose(stems["rest"], audio * 0.5, atol=1e-6)
+
+
+def test_windows_are_crossfaded():
+    audio = np.zeros((300, 1), dtype=np.float32)
+    calls = []
+
+    def fn(window):
+        calls.append(len(window))
+        return {"s": np.full_like(window, len(calls))}  # Window k outputs the constant k
+
+    _, stems = run(audio, 100, 20, 300, fn)
+    s = stems["s"][:, 0]
+    assert calls == [100, 100, 100, 60]
+    assert s[0] == 1 and s[79] == 1 and s[100] == 2
+    assert np.all(np.diff(s[80:100]) > 0)  # Fades from window 1 into window 2
+    assert len(s) == 300
+
+
+def test_memmap_sink(tmp_path):
+    sink = chunked.MemmapStems(str(tmp_path), channels=2)
+    sink("vocals", np.ones((5, 2), dtype=np.float32))
+    sink("vocals", np.zeros((3, 2), dtype=np.float32))
+    arrays = sink.arrays()
+    assert arrays["vocals"].shape == (8, 2)
+    assert arrays["vocals"][:5].sum() == 10
+
+
+def test_separate_array_reports_windows(monkeypatch):
+    stream = events.EventStream(echo=False)
+    monkeypatch.setattr(events, "_stream", stream)
+    recorder = stream.subscribe(events.Recorder())
+
+    audio = np.random.default_rng(1).standard_normal((2500, 2)).astype(np.float32)
+    assert chunked.window_count(len(audio), 1000, 100) == 3
+    stems = chunked.separate_array(audio, lambda w: {"vocals": w}, sample_rate=100, window_seconds=10, overlap_seconds=1)
+    np.testing.assert_allclose(stems["vocals"], audio, atol=1e-6)
+    progress = [round(e["fraction"], 3) for e in recorder.drain() if e["event"] == "progress"]
+    assert progress == [0.333, 0.667, 1.0]
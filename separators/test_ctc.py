@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from separators import ctc
+
+
+def test_windows_tile_the_signal():
+    for frames in (1000, 320000, 320001, 600000, 16000 * 65 + 17):
+        plan = ctc.plan_windows(frames, 16000)
+        kept = 0
+        for start, end, keep_start, keep_end in plan:
+            assert start + keep_start == kept and end - start <= 320000
+            assert keep_start % 320 == 0 and start % 320 == 0
+            kept = start + keep_end
+        assert kept == frames
+
+
+def test_stitched_logits_match_a_single_pass():
+    # A "model" whose logit frame i is just i (in absolute frames) stitches back into 0..n-1
+    frames = 16000 * 50
+    plan = ctc.plan_windows(frames, 16000)
+    logits = [np.arange(start // 320, start // 320 + (end - start) // 320, dtype=np.float32)[:, None]
+              for start, end, _, _ in plan]
+    stitched = ctc.stitch(logits, plan)
+    np.testing.assert_array_equal(stitched[:, 0], np.arange(frames // 320))
+
+
+def test_segments_split_on_pauses():
+    words = [{"word": "HELLO", "start_offset": 10, "end_offset": 30},
+             {"word": "THERE", "start_offset": 35, "end_offset": 60},
+             {"word": "AGAIN", "start_offset": 200, "end_offset": 230}]
+    segments = ctc.segments(words, 0.02)
+    assert [seg["text"] for seg in segments] == ["HELLO THERE", "AGAIN"]
+    assert [(seg["start"], seg["end"]) for seg in segments] == [pytest.approx((0.2, 1.2)), pytest.approx((4.0, 4.6))]
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import soundfile as sf
+
+from separators import decode_cache
+
+
+def write_tone(path, seconds=1.0, sr=44100, channels=2, freq=440):
+    t = np.arange(int(seconds * sr)) / sr
+    audio = np.stack([0.5 * np.sin(2 * np.pi * freq * t)] * channels, axis=1)
+    sf.write(path, audio, sr, subtype="FLOAT")
+    return audio.astype(np.float32)
+
+
+def test_second_load_is_a_memmapped_hit(tmp_path, monkeypatch):
+    song = str(tmp_path / "song.wav")
+    audio = write_tone(song)
+    cache = decode_cache.DecodeCache(str(tmp_path / "cache"), max_mb=100)
+    calls = []
+    decode = decode_cache.decode
+    monkeypatch.setattr(decode_cache, "decode", lambda *args: calls.append(args) or decode(*args))
+
+    first = cache.load(song, 44100)
+    copy = str(tmp_path / "same content.wav")
+    with open(song, "rb") as src, open(copy, "wb") as dst:
+        dst.write(src.read())
+    second = cache.load(copy, 44100)
+    assert len(calls) == 1
+    assert isinstance(second, np.memmap)
+    np.testing.assert_allclose(second, audio, atol=1e-6)
+    np.testing.assert_array_equal(first, second)
+
+    cache.load(song, 22050)  # Another rate is another entry
+    assert len(calls) == 2 and len(cache.entries()) == 2
+
+
+def test_mono_and_resampling(tmp_path):
+    song = str(tmp_path / "mono.wav")
+    write_tone(song, channels=1)
+    audio = decode_cache.decode(song, 48000, channels=2)
+    assert audio.shape == (48000, 2) and audio.dtype == np.float32
+    np.testing.assert_array_equal(audio[:, 0], audio[:, 1])
+
+
+def test_surround_is_downmixed_left_and_right(tmp_path):
+    song = str(tmp_path / "5.1.wav")
+    t = np.arange(4410) / 44100
+    left, lfe = 0.5 * np.sin(2 * np.pi * 440 * t), 0.5 * np.sin(2 * np.pi * 50 * t)
+    silence = np.zeros_like(t)
+    sf.write(song, np.stack([left, silence, silence, lfe, silence, silence], axis=1), 44100, subtype="FLOAT")
+    audio = decode_cache.decode(song, 44100)
+    assert audio.shape == (4410, 2)
+    np.testing.assert_allclose(audio[:, 0], left / (1 + 2 * 0.5 ** 0.5), atol=1e-6)
+    np.testing.assert_array_equal(audio[:, 1], 0)  # Left stays left, LFE is dropped
+
+    cache = decode_cache.DecodeCache(str(tmp_path / "cache"), max_mb=100)
+    cache.load(song, 44100)
+    assert cache._key_locks == {}
+
+
+def test_lru_eviction(tmp_path):
+    cache = decode_cache.DecodeCache(str(tmp_path / "cache"), max_mb=0.5)  # Room for one 0.35 MB song
+    songs = []
+    for i in range(3):
+        songs.append(str(tmp_path / f"{i}.wav"))
+        write_tone(songs[-1], seconds=1.0, channels=2, freq=200 + 100 * i)
+    for song in songs:
+        cache.load(song, 44100)
+    entries = cache.entries()
+    assert len(entries) == 1
+    assert cache.total_bytes() <= cache.max_bytes
+    assert entries[0][0].startswith(os.path.join(cache.directory, cache.content_hash(songs[-1])))
+
+    cache.set_max_mb(0)
+    assert cache.entries() == []
+    assert not isinstance(cache.load(songs[0], 44100), np.memmap)  # Disabled cache decodes directly
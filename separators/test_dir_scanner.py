@@ -0,0 +1,44 @@
+import os
+import time
+
+from separators import dir_scanner
+
+
+def drain(scanner, token, timeout=5):
+    batches, deadline = [], time.time() + timeout
+    while time.time() < deadline:
+        kind, got, entries = scanner.results.get(timeout=timeout)
+        if got != token:
+            continue
+        if kind == "done":
+            return batches, entries
+        batches.append(entries)
+    raise TimeoutError
+
+
+def test_scan_streams_batches_and_caches_until_mtime_changes(tmp_path):
+    for i in range(7):
+        (tmp_path / f"Song {i}.mp3").write_bytes(b"")
+    (tmp_path / "notes.txt").write_bytes(b"")
+    (tmp_path / "b album").mkdir()
+    (tmp_path / "A album").mkdir()
+
+    scanner = dir_scanner.DirectoryScanner(batch_size=3)
+    assert scanner.cached(str(tmp_path)) is None
+    batches, entries = drain(scanner, scanner.scan(str(tmp_path)))
+    assert sum(len(batch) for batch in batches) == 9 and max(len(batch) for batch in batches) == 3
+    assert [name for _, name, _ in entries[:3]] == ["A album", "b album", "Song 0.mp3"]
+    assert entries[0] == (True, "A album", os.path.join(str(tmp_path), "A album"))
+    assert scanner.cached(str(tmp_path)) == entries
+
+    (tmp_path / "Song 7.flac").write_bytes(b"")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1_000_000))  # Coarse-mtime file systems
+    assert scanner.cached(str(tmp_path)) is None
+
+
+def test_newer_scan_supersedes_older(tmp_path):
+    scanner = dir_scanner.DirectoryScanner()
+    old = scanner.scan(str(tmp_path))
+    new = scanner.scan(str(tmp_path))
+    assert not scanner.is_current(old) and scanner.is_current(new)
+    assert drain(scanner, new)[1] == []
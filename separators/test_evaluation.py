@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from separators import evaluation
+
+
+def make_dataset(root):
+    rng = np.random.default_rng(0)
+    for name in ("Track B", "Track A"):
+        folder = root / "test" / name
+        folder.mkdir(parents=True)
+        stems = {stem: (rng.standard_normal((4410, 2)) * 0.1).astype(np.float32) for stem in ("vocals", "drums", "bass")}
+        for stem, audio in stems.items():
+            sf.write(str(folder / f"{stem}.wav"), audio, 44100, subtype="FLOAT")
+        sf.write(str(folder / "mixture.wav"), sum(stems.values()), 44100, subtype="FLOAT")
+    (root / "test" / "not a track").mkdir()
+    return stems
+
+
+def test_dataset_layout(tmp_path):
+    stems = make_dataset(tmp_path)
+    tracks = evaluation.find_tracks(str(tmp_path))
+    assert [name for name, _ in tracks] == ["Track A", "Track B"]
+    references = evaluation.load_references(tracks[0][1])  # Track A was written last
+    np.testing.assert_allclose(references["vocals"], stems["vocals"], atol=1e-6)
+    np.testing.assert_allclose(references["accompaniment"], stems["drums"] + stems["bass"], atol=1e-6)
+
+
+def test_configs_and_scores():
+    config = evaluation.parse_config("demucs:htdemucs:2")
+    assert config == {"tool": "Demucs", "model": "htdemucs", "shifts": 2}
+    assert evaluation.config_name(config) == "Demucs_htdemucs_s2"
+    assert evaluation.config_name(evaluation.parse_config("Spleeter")) == "Spleeter"
+    with pytest.raises(ValueError):
+        evaluation.parse_config("magic:model")
+
+    windows = {target: {metric: [1.0, None, 3.0, 10.0] for metric in evaluation.METRICS}
+               for target in evaluation.TARGETS}
+    summary = evaluation.summarize(windows)
+    assert summary["vocals"]["SDR"] == 3.0  # Median of the non-silent windows
+    tracks = [{"metrics": summary}, {"metrics": evaluation.summarize(
+        {target: {metric: [5.0] for metric in evaluation.METRICS} for target in evaluation.TARGETS})}, {"error": "x"}]
+    assert evaluation.aggregate(tracks)["accompaniment"]["SAR"] == 4.0
+
+
+def test_chunks_and_merge():
+    sr = evaluation.SAMPLE_RATE
+    assert evaluation.chunks(150 * sr) == [(0, 150 * sr)]  # Whole tracks unless chunking is asked for
+    assert evaluation.chunks(150 * sr, chunk_seconds=60) == [(0, 60 * sr), (60 * sr, 120 * sr), (120 * sr, 150 * sr)]
+    # No half-window chunk
+    assert evaluation.chunks(int(120.5 * sr), chunk_seconds=60) == [(0, 60 * sr), (60 * sr, int(120.5 * sr))]
+
+    chunk = {metric: [[1.0, float("nan")], [2.0, 3.0]] for metric in evaluation.METRICS}
+    windows = evaluation.merge_chunks([chunk, chunk])
+    assert windows["vocals"]["SDR"] == [1.0, None, 1.0, None]
+    assert windows["accompaniment"]["SIR"] == [2.0, 3.0, 2.0, 3.0]
+    result = {"metrics": evaluation.summarize(windows), "seconds": 2.0}
+    assert "approximate" not in evaluation.format_track(result)
+    assert evaluation.format_track(dict(result, approximate=True)).endswith("(2.0s, chunked, approximate)")
+
+
+def test_reference_cache(tmp_path):
+    stems = make_dataset(tmp_path)
+    (_, folder), _ = evaluation.find_tracks(str(tmp_path))
+    cache = evaluation.ReferenceCache(str(tmp_path / "references"))
+    path, frames = cache.load("Track A", folder)
+    assert frames == 4410
+    stacked = np.load(path)
+    np.testing.assert_allclose(stacked[0], stems["vocals"], atol=1e-6)
+    np.testing.assert_allclose(stacked[1], stems["drums"] + stems["bass"], atol=1e-6)
+
+    written = os.path.getmtime(path)
+    assert cache.load("Track A", folder) == (path, frames)
+    assert os.path.getmtime(path) == written  # Decoded once, reused by the next configuration
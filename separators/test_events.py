@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from separators import events, job_queue
+from separators.testing import StagedSeparator, run_jobs
+
+
+def test_disabled_stream_builds_nothing(capsys):
+    stream = events.EventStream()
+    with stream.span(events.DECODE, frames=10) as span:
+        span.set(frames=20)
+    assert stream.span(events.ENCODE) is stream.span(events.DECODE)  # The shared no-op span
+    stream.log("Demucs", "Model loaded")
+    assert capsys.readouterr().out == "Demucs: Model loaded\n"
+
+
+def test_spans_context_and_sinks(tmp_path):
+    stream = events.EventStream(echo=False)
+    recorder = stream.subscribe(events.Recorder())
+    totals = stream.subscribe(events.SpanTotals())
+    writer = stream.subscribe(events.JsonlWriter(str(tmp_path / "events.jsonl")))
+
+    with stream.context(job=1, song="a"):
+        with stream.span(events.DECODE) as span:
+            span.set(frames=44100)
+        with stream.span(events.INFERENCE):
+            stream.log("Demucs", "Separating")
+    with pytest.raises(RuntimeError):
+        with stream.context(job=2), stream.span(events.DECODE):
+            raise RuntimeError("bad file")
+    stream.unsubscribe(writer)
+    writer.close()
+    stream.log("Demucs", "Not recorded by the writer")
+
+    recorded = recorder.drain()
+    assert [(e["event"], e.get("name")) for e in recorded[:5]] == [
+        ("span_start", "decode"), ("span", "decode"), ("span_start", "inference"), ("log", None),
+        ("span", "inference")]
+    assert recorded[1]["frames"] == 44100 and recorded[1]["job"] == 1 and recorded[1]["song"] == "a"
+    assert recorded[3]["message"] == "Separating" and recorded[3]["job"] == 1
+    assert recorded[6]["error"] == "bad file" and recorded[6]["job"] == 2
+    assert "job" not in recorded[-1] and recorder.drain() == []
+
+    assert set(totals.totals()) == {"decode", "inference"}
+    assert set(totals.totals(1)) == {"decode", "inference"} and set(totals.totals(2)) == {"decode"}
+    lines = [json.loads(line) for line in (tmp_path / "events.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 7 and lines[-1]["event"] == "span"
+
+
+def test_pipeline_stages_are_timed_per_job(tmp_path, monkeypatch):
+    totals = events.get_stream().subscribe(events.SpanTotals())
+    recorder = events.get_stream().subscribe(events.Recorder())
+    try:
+        jobs = run_jobs(tmp_path, StagedSeparator(), ["a", "b"], monkeypatch)
+    finally:
+        events.get_stream().unsubscribe(totals)
+        events.get_stream().unsubscribe(recorder)
+    for job in jobs:
+        assert {events.DECODE, events.INFERENCE, events.ENCODE} <= set(totals.totals(job.id))
+        assert totals.totals(job.id)[events.INFERENCE] >= 0.05  # StagedSeparator.infer sleeps 50 ms
+    finished = [e for e in recorder.drain() if e["event"] == "job"]
+    assert sorted(e["job"] for e in finished) == [job.id for job in jobs]
+    assert all(e["state"] == job_queue.DONE for e in finished)
+
+
+def test_progress_parts_bars_and_eta(monkeypatch):
+    stream = events.EventStream(echo=False)
+    monkeypatch.setattr(events, "_stream", stream)
+    recorder = stream.subscribe(events.Recorder())
+    tracker = stream.subscribe(events.ProgressTracker())
+
+    with stream.context(job=1, stage="separate"):
+        with events.part(1, 4):  # Second of four windows
+            events.progress(1, 2)
+        with events.bars(2):  # e.g. two Demucs shifts, one tqdm bar each
+            list(events.ProgressBar(range(4)))
+            with events.ProgressBar(total=10) as bar:
+                bar.update(5)
+    fractions = [e["fraction"] for e in recorder.drain() if e["event"] == "progress"]
+    assert fractions == [0.375, 0.125, 0.25, 0.375, 0.5, 0.75]
+
+    stream.emit("progress", job=2, stage="separate", fraction=0.1, time=100.0)
+    stream.emit("progress", job=2, stage="separate", fraction=0.3, time=110.0)
+    stage, fraction, eta = tracker.status(2)
+    assert (stage, fraction) == ("separate", 0.3) and eta == pytest.approx(35.0)  # 0.2 per 10 s, 0.7 left
+    stream.emit("progress", job=2, stage="transcribe", fraction=0.5, time=111.0)
+    assert tracker.status(2) == ("transcribe", 0.5, None)  # New step, no rate yet
+    stream.emit("job", job=2, state=job_queue.DONE)
+    assert tracker.status(2) is None
+    assert events.format_eta(65) == "1:05" and events.format_eta(3725) == "1:02:05" and events.format_eta(None) == ""
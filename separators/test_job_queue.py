@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+from separators import job_queue
+
+
+def make_job(path="input/song.mp3", tool="Demucs", **options):
+    return job_queue.SeparationJob(path, tool, "out/vocals", "out/instr", "out/text", options)
+
+
+def test_queue_runs_all_jobs_with_bounded_concurrency():
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def runner(job):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return True
+
+    q = job_queue.JobQueue(runner, max_workers=2)
+    jobs = q.submit_many(make_job(f"song{i}.mp3") for i in range(8))
+    assert q.wait(timeout=5)
+    assert all(job.state == job_queue.DONE for job in jobs)
+    assert peak[0] == 2
+    assert q.finished_count == 8
+    assert q.throughput() > 0
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_pool_shrinks_and_grows_with_jobs_queued():
+    lock = threading.Lock()
+    running = [0]
+    gate = threading.Semaphore(0)  # One release finishes one running job
+
+    def runner(job):
+        with lock:
+            running[0] += 1
+        gate.acquire(timeout=5)
+        with lock:
+            running[0] -= 1
+        return True
+
+    q = job_queue.JobQueue(runner, max_workers=3)
+    jobs = q.submit_many(make_job(f"song{i}.mp3") for i in range(10))
+    wait_for(lambda: running[0] == 3)
+
+    # Shrinking applies as soon as the running jobs finish, not once the backlog has drained
+    q.set_max_workers(1)
+    for _ in range(3):
+        gate.release()
+    wait_for(lambda: q.counts()[job_queue.DONE] == 3 and running[0] == 1)
+    time.sleep(0.05)
+    assert running[0] == 1
+
+    q.set_max_workers(3)
+    wait_for(lambda: running[0] == 3)
+    for _ in range(7):
+        gate.release()
+    assert q.wait(timeout=5)
+    assert all(job.state == job_queue.DONE for job in jobs)
+
+
+def test_failed_and_canceled_jobs():
+    release = threading.Event()
+
+    def runner(job):
+        release.wait(5)
+        if job.song_name == "bad":
+            raise RuntimeError("boom")
+        return True
+
+    q = job_queue.JobQueue(runner, max_workers=1)
+    bad, later = q.submit_many([make_job("bad.wav"), make_job("later.wav")])
+    assert q.cancel(later)
+    release.set()
+    assert q.wait(timeout=5)
+    assert bad.state == job_queue.FAILED and bad.error == "boom"
+    assert later.state == job_queue.CANCELED
+    assert q.counts()[job_queue.FAILED] == 1
+
+
+def test_deferred_start_keeps_jobs_pending_in_submit_order():
+    gate = threading.Semaphore(0)  # Stands in for a pipeline stage taking the next job
+    finish = threading.Event()
+    started = []
+
+    def runner(job, start):
+        assert gate.acquire(timeout=5)
+        if not start():
+            return False
+        started.append(job.song_name)
+        finish.wait(5)
+        return True
+
+    q = job_queue.JobQueue(runner, max_workers=4, defer_start=True)
+    jobs = q.submit_many(make_job(f"s{i}.wav") for i in range(5))
+    gate.release()
+    gate.release()
+    for _ in range(500):
+        if len(started) == 2:
+            break
+        time.sleep(0.01)
+    assert [job.state for job in jobs] == [job_queue.RUNNING] * 2 + [job_queue.PENDING] * 3
+    assert jobs[2].started_at is None and jobs[2].duration is None
+
+    assert q.cancel(jobs[3])
+    gate.release()  # s2
+    gate.release()  # s4; the canceled s3 never reaches the runner
+    finish.set()
+    assert q.wait(timeout=5)
+    assert started == ["s0", "s1", "s2", "s4"]
+    assert jobs[3].state == job_queue.CANCELED and q.finished_count == 4
+
+
+def test_run_job_passes_only_tool_options():
+    calls = []
+
+    class FakeSeparator:
+        def separate(self, *args, **kwargs):
+            calls.append((args, kwargs))
+            return True
+
+    job = make_job("a/b/My Song.flac", tool="Spleeter", model="mdx", fmt="mp3", sr=None, shifts=2)
+    assert job_queue.run_job(FakeSeparator(), job)
+    args, kwargs = calls[0]
+    assert args == ("a/b/My Song.flac", "My Song", "out/vocals", "out/instr", "out/text")
+    assert kwargs == {"fmt": "mp3", "outputs": {}}
+    assert kwargs["outputs"] is job.outputs
+
+
+def test_collect_songs(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ["b.mp3", "a.WAV", "notes.txt", os.path.join("sub", "c.flac")]:
+        (tmp_path / name).write_bytes(b"")
+    assert [os.path.basename(p) for p in job_queue.collect_songs(str(tmp_path))] == ["a.WAV", "b.mp3", "c.flac"]
+    assert len(job_queue.collect_songs(str(tmp_path), recursive=False)) == 2
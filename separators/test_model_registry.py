@@ -0,0 +1,55 @@
+import threading
+
+from separators.model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+def test_models_are_shared_and_loaded_once():
+    registry = ModelRegistry(budget_mb=100)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return object()
+
+    first = registry.get("whisper", "tiny", loader, size_bytes=MB)
+    assert registry.get("whisper", "tiny", loader, size_bytes=MB) is first
+    assert len(loads) == 1
+
+
+def test_lru_eviction_over_budget():
+    registry = ModelRegistry(budget_mb=10)
+    registry.get("whisper", "a", object, size_bytes=4 * MB)
+    registry.get("wav2vec2", "b", object, size_bytes=4 * MB)
+    registry.get("whisper", "a", object)  # Touch "a" so "b" becomes least recently used
+    registry.get("coqui", "c", object, size_bytes=4 * MB)
+    assert [(engine, name) for engine, name, _ in registry.loaded()] == [("whisper", "a"), ("coqui", "c")]
+
+    registry.set_budget(1)  # The most recent model is kept even if it alone is over budget
+    assert [(engine, name) for engine, name, _ in registry.loaded()] == [("coqui", "c")]
+
+
+def test_concurrent_requests_share_one_load():
+    registry = ModelRegistry()
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return "model"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("whisper", "large", loader, 0)))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    started.wait(5)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert results == ["model"] * 3
+    assert len(loads) == 1
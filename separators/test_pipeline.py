@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+import soundfile as sf
+
+from separators import job_queue, pipeline, result_cache, transcription
+from separators.testing import StagedSeparator, run_jobs
+
+
+def test_stages_overlap_and_write_outputs(tmp_path, monkeypatch):
+    # Each song is separated only once the next one has started decoding, which fails without overlap
+    separator = StagedSeparator(overlap={"a": "b", "b": "c"})
+    jobs = run_jobs(tmp_path, separator, ["a", "b", "c"], monkeypatch)
+    assert all(job.state == job_queue.DONE and job.stage is None for job in jobs), [job.error for job in jobs]
+    for job in jobs:
+        assert set(job.outputs) == {"vocals", "instrumental"}
+        np.testing.assert_allclose(sf.read(job.outputs["instrumental"], dtype="float32")[0], -0.1, atol=1e-4)
+    assert [song for stage, song, *_ in separator.log if stage == "decode"] == ["a", "b", "c"]
+    assert sum(1 for stage, *_ in separator.log if stage == "infer") == 3
+
+
+def test_fewer_separate_workers_applies_to_idle_threads(tmp_path, monkeypatch):
+    class CountingSeparator(StagedSeparator):
+        running = peak = 0
+
+        def infer(self, track):
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            try:
+                time.sleep(0.05)
+                super().infer(track)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+    monkeypatch.setattr(result_cache, "_cache", result_cache.ResultCache(str(tmp_path / "cache"), max_mb=0))
+    separator = CountingSeparator()
+    stages = pipeline.StagedPipeline(separate_workers=2)
+    q = job_queue.JobQueue(lambda job, start: stages.run(separator, job, start),
+                           max_workers=stages.capacity, defer_start=True)
+    folders = [str(tmp_path / name) for name in ("vocals", "instr", "text")]
+    q.submit(job_queue.SeparationJob(str(tmp_path / "first.wav"), "Demucs", *folders, {"fmt": "wav"}))
+    assert q.wait(timeout=5)  # Both separate threads now wait for songs
+
+    stages.set_separate_workers(1)
+    separator.peak = 0
+    jobs = q.submit_many(job_queue.SeparationJob(str(tmp_path / f"{name}.wav"), "Demucs", *folders, {"fmt": "wav"})
+                         for name in ("a", "b", "c", "d"))
+    q.set_max_workers(stages.capacity)
+    assert q.wait(timeout=10)
+    assert all(job.state == job_queue.DONE for job in jobs)
+    assert separator.peak == 1
+
+
+def test_failed_stage_and_plain_separators(tmp_path, monkeypatch):
+    jobs = run_jobs(tmp_path, StagedSeparator(fail=("b",)), ["a", "b", "c"], monkeypatch)
+    assert [job.state for job in jobs] == [job_queue.DONE, job_queue.FAILED, job_queue.DONE]
+    assert jobs[1].error == "model exploded" and jobs[1].outputs == {}
+
+    class PlainSeparator:
+        def separate(self, input_path, song_name, *folders, outputs=None, **options):
+            outputs["vocals"] = song_name
+            return song_name != "bad"
+
+    jobs = run_jobs(tmp_path, PlainSeparator(), ["ok", "bad"], monkeypatch)
+    assert [job.state for job in jobs] == [job_queue.DONE, job_queue.FAILED]
+    assert jobs[0].outputs == {"vocals": "ok"}
+
+
+def test_vocals_reach_the_transcriber_in_memory(tmp_path, monkeypatch):
+    calls = []
+
+    class FakeWhisper:
+        def transcribe(self, audio, output_path, model_name, sample_rate=None):
+            calls.append((audio, sample_rate))
+            return True
+
+    monkeypatch.setitem(transcription._transcribers, "whisper", FakeWhisper())
+    jobs = run_jobs(tmp_path, StagedSeparator(), ["a"], monkeypatch, do_transcribe=True)
+    assert jobs[0].outputs["transcription"] == str(tmp_path / "text" / "a.txt")
+    audio, sample_rate = calls[0]
+    assert sample_rate == transcription.SPEECH_RATE
+    assert audio.shape == (1600,) and audio.dtype == np.float32  # 0.1 s of mono at 16 kHz
+    np.testing.assert_allclose(audio[100:-100], 0.1, atol=1e-3)
+
+
+def test_long_form_vocals_are_transcribed_from_the_file(tmp_path, monkeypatch):
+    calls = []
+
+    class FakeWhisper:
+        def transcribe(self, audio, output_path, model_name, sample_rate=None):
+            calls.append((audio, sample_rate))
+            return True
+
+    monkeypatch.setitem(transcription._transcribers, "whisper", FakeWhisper())
+    jobs = run_jobs(tmp_path, StagedSeparator(), ["a"], monkeypatch, do_transcribe=True, long_form=True)
+    assert calls == [(jobs[0].outputs["vocals"], None)]
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from separators import resample
+
+
+@pytest.mark.parametrize("src,dst", [(44100, 48000), (44100, 22050), (48000, 44100), (44100, 16000)])
+def test_blocks_match_resample_poly(src, dst):
+    audio = np.random.default_rng(0).standard_normal((20_011, 2)).astype(np.float32)
+    up, down, _, _ = resample.kernel(src, dst)
+    expected = signal.resample_poly(audio.astype(np.float64), up, down, axis=0)
+    for block_frames in (1000, 4096, 1 << 18):
+        out = np.concatenate(list(resample.resample_blocks(audio, src, dst, block_frames)))
+        assert out.dtype == np.float32 and out.shape == expected.shape
+        np.testing.assert_allclose(out, expected, atol=1e-5)
+
+
+def test_layouts_and_kernel_cache():
+    tone = np.sin(2 * np.pi * 1000 * np.arange(44100) / 44100).astype(np.float32)
+    mono = resample.resample(tone, 44100, 48000)
+    assert mono.shape == (48000,)
+    channels_first = resample.resample(np.stack([tone, -tone]), 44100, 48000, axis=1)
+    np.testing.assert_allclose(channels_first[0], mono, atol=1e-6)
+    np.testing.assert_allclose(channels_first[1], -mono, atol=1e-6)
+    assert resample.kernel(44100, 48000) is resample.kernel(44100, 48000)
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import soundfile as sf
+
+from separators import result_cache
+
+
+def make_song(tmp_path):
+    song = str(tmp_path / "song.wav")
+    sf.write(song, np.zeros((4410, 2)), 44100)
+    return song
+
+
+def stems():
+    t = np.arange(44100, dtype=np.float32) / 44100
+    tone = 0.25 * np.sin(2 * np.pi * 440 * t)
+    return {"vocals": np.stack([tone, tone], axis=1), "instrumental": np.stack([-tone, tone], axis=1)}
+
+
+def test_repeat_job_is_copied_without_duplicates(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"), max_mb=100)
+    key = cache.key(make_song(tmp_path), "Demucs", "mdx", 1)
+    assert cache.key(make_song(tmp_path), "Demucs", "mdx", 2) != key
+    outputs = [("vocals", str(tmp_path / "out" / "song_vocals.wav")),
+               ("instrumental", str(tmp_path / "out" / "song_instrumental.wav"))]
+    assert cache.materialize(key, outputs, "wav") is None
+
+    first = cache.save(key, stems(), 44100, outputs, "wav", bit_depth=24)
+    assert first == [path for _, path in outputs]
+    again = cache.materialize(key, outputs, "wav", bit_depth=24)
+    assert again == first  # Unchanged copy again: no _1 duplicate
+    assert len(os.listdir(tmp_path / "out")) == 2
+    encoded = [os.path.join(root, f) for root, _, files in os.walk(cache.directory) for f in files if f.endswith(".wav")]
+    assert len(encoded) == 2 and all(os.stat(path).st_nlink == 1 for path in first)
+
+    with open(first[0], "r+b") as f:  # Editing a delivered output in place leaves the cache alone
+        f.seek(-4, os.SEEK_END)
+        f.write(b"\xff" * 4)
+    edited = cache.materialize(key, outputs, "wav", bit_depth=24)
+    assert edited == [str(tmp_path / "out" / "song_vocals_1.wav"), first[1]]
+    np.testing.assert_allclose(sf.read(edited[0], dtype="float32")[0], stems()["vocals"], atol=1e-4)
+
+    other = cache.materialize(key, outputs, "wav", bit_depth=16)  # Other format options: re-encoded from the stems
+    assert cache._key_locks == {}
+    assert other[0].endswith("song_vocals_2.wav") and sf.info(other[0]).subtype == "PCM_16"
+    np.testing.assert_allclose(sf.read(first[1], dtype="float32")[0], stems()["instrumental"], atol=1e-4)
+
+
+def test_disabled_or_oversized_stems_are_written_directly(tmp_path):
+    song = make_song(tmp_path)
+    outputs = [("vocals", str(tmp_path / "v.flac"))]
+    disabled = result_cache.ResultCache(str(tmp_path / "off"), max_mb=0)
+    key = disabled.key(song, "Spleeter")
+    assert disabled.save(key, stems(), 44100, outputs, "flac") == [str(tmp_path / "v.flac")]
+    assert not disabled.has(key) and disabled.entries() == []
+
+    small = result_cache.ResultCache(str(tmp_path / "small"), max_mb=0.5)  # Stems are 0.7 MB
+    assert small.save(key, stems(), 44100, outputs, "flac") == [str(tmp_path / "v_1.flac")]
+    assert small.entries() == []
+
+
+def test_lru_eviction(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"), max_mb=2.5)  # Room for about two entries
+    song = make_song(tmp_path)
+    keys = [cache.key(song, "OpenUnmix", model) for model in ("umxl", "umxhq", "umx")]
+    for key in keys:
+        cache.save(key, stems(), 44100, [("vocals", str(tmp_path / f"{key}.wav"))], "wav", bit_depth=32)
+    assert not cache.has(keys[0]) and cache.has(keys[2])
+    assert cache.total_bytes() <= cache.max_bytes
@@ -0,0 +1,42 @@
+import numpy as np
+
+from separators import vad
+from separators.testing import SR, vocals
+from separators.whisper_transcription import WhisperTranscription
+
+
+def test_voiced_spans_pack_and_map_back():
+    spans = vad.voiced_spans(vocals(), SR)
+    np.testing.assert_allclose(spans / SR, [[1.8, 3.2], [5.8, 8.2]], atol=0.05)
+    assert len(vad.voiced_spans(np.zeros(5 * SR, dtype=np.float32), SR)) == 0
+    assert len(vad.voiced_spans(vocals()[:3 * SR // 2], SR)) == 0  # Noise only
+
+    packed, offsets = vad.pack(vocals(), spans, SR)
+    assert len(packed) == int((spans[:, 1] - spans[:, 0]).sum() + 0.3 * SR)
+    first = spans[0, 1] - spans[0, 0]
+    times = [0.0, 1.0, first / SR + 0.1, first / SR + 0.3 + 0.5]  # Start, inside, in the gap, second span
+    np.testing.assert_allclose(vad.to_original(times, offsets), [1.8, 2.8, 3.2, 6.3], atol=0.05)
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, verbose=False):
+        self.calls.append(len(audio))
+        return {"text": " la la", "segments": [{"start": 0.5, "end": 2.0, "text": " la la"}]}
+
+
+def test_whisper_skips_silence_and_maps_timestamps(tmp_path, monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(WhisperTranscription, "load_model", lambda self, name: model)
+    engine = WhisperTranscription()
+
+    out = tmp_path / "silent.txt"
+    assert engine.transcribe(np.zeros(10 * SR, dtype=np.float32), str(out), "tiny", sample_rate=SR)
+    assert model.calls == [] and out.read_text(encoding="utf-8") == "Transcription (Model: tiny):\n\n\n"
+
+    out = tmp_path / "song.txt"
+    assert engine.transcribe(vocals(), str(out), "tiny", sample_rate=SR)
+    assert model.calls[0] < 5 * SR  # Only the voiced spans, not the 9 s song
+    assert "2.28s - 6.08s:  la la" in out.read_text(encoding="utf-8")  # 0.5 s into span 1, 0.28 s into span 2
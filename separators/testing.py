@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from separators import job_queue, pipeline, result_cache
+
+SR = 16000
+
+
+def vocals():
+    """2 s of leakage-level noise, 1 s of tone, 3 s of noise, 2 s of tone, 1 s of noise."""
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(9 * SR) * 1e-4).astype(np.float32)  # About -80 dBFS
+    t = np.arange(9 * SR) / SR
+    tone = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    for start, end in ((2, 3), (6, 8)):
+        audio[start * SR:end * SR] += tone[start * SR:end * SR]
+    return audio
+
+
+class StagedSeparator:
+    """Stands in for a separator: decode and infer take a while and are logged."""
+
+    def __init__(self, fail=(), overlap=None):
+        self.fail = fail
+        self.overlap = dict(overlap or {})  # Infer of song waits until decode of song -> this song started
+        self.decoding = {}
+        self.log = []
+        self.lock = threading.Lock()
+
+    def _decoding(self, song_name):
+        with self.lock:
+            return self.decoding.setdefault(song_name, threading.Event())
+
+    def _record(self, stage, track, start):
+        with self.lock:
+            self.log.append((stage, track.song_name, start, time.perf_counter()))
+
+    def prepare(self, input_path, song_name, vocals_folder, instr_folder, trans_folder, outputs=None, **options):
+        os.makedirs(vocals_folder, exist_ok=True)
+        os.makedirs(instr_folder, exist_ok=True)
+        return pipeline.Track("Fake", input_path, song_name,
+                              stem_paths=[("vocals", os.path.join(vocals_folder, f"{song_name}_vocals.wav")),
+                                          ("instrumental", os.path.join(instr_folder, f"{song_name}_instr.wav"))],
+                              cache_key=song_name, fmt=options.get("fmt", "wav"), writer_options={},
+                              trans_path=os.path.join(trans_folder, f"{song_name}.txt"),
+                              do_transcribe=options.get("do_transcribe", False), trans_tool="whisper",
+                              long_form=options.get("long_form", False), outputs=outputs)
+
+    def decode(self, track):
+        start = time.perf_counter()
+        self._decoding(track.song_name).set()
+        time.sleep(0.05)
+        track.audio = np.full((4410, 2), 0.1, dtype=np.float32)
+        self._record("decode", track, start)
+
+    def infer(self, track):
+        start = time.perf_counter()
+        if track.song_name in self.overlap and not self._decoding(self.overlap[track.song_name]).wait(5):
+            raise RuntimeError(f"{self.overlap[track.song_name]} was not decoded during inference")
+        time.sleep(0.05)
+        if track.song_name in self.fail:
+            raise RuntimeError("model exploded")
+        audio = track.audio if track.audio is not None else np.full((4410, 2), 0.1, dtype=np.float32)  # Long-form
+        track.stems = {"vocals": audio, "instrumental": -audio}
+        track.sample_rate = 44100
+        self._record("infer", track, start)
+
+
+def run_jobs(tmp_path, separator, names, monkeypatch, **options):
+    monkeypatch.setattr(result_cache, "_cache", result_cache.ResultCache(str(tmp_path / "cache"), max_mb=0))
+    stages = pipeline.StagedPipeline(separate_workers=1)
+    q = job_queue.JobQueue(lambda job, start: stages.run(separator, job, start),
+                           max_workers=stages.capacity, defer_start=True)
+    folders = [str(tmp_path / name) for name in ("vocals", "instr", "text")]
+    jobs = q.submit_many(job_queue.SeparationJob(str(tmp_path / f"{name}.wav"), "Demucs", *folders,
+                                                 {"fmt": "wav", **options}) for name in names)
+    assert q.wait(timeout=10)
+    return jobs
@@ -0,0 +1,69 @@
+import os
+import threading
+import importlib
+import numpy as np
+from separators import audio_writer, cancellation, events, resample
+
+# Transcription tool -> (module, class); engine modules are imported on first use
+ENGINES = {
+    "whisper": ("separators.whisper_transcription", "WhisperTranscription"),
+    "wav2vec2": ("separators.wav2vec2_transcription", "Wav2Vec2Transcription"),
+    "coqui": ("separators.coqui_transcription", "CoquiTranscription"),
+}
+
+SPEECH_RATE = 16000  # Every transcription engine works on 16 kHz mono
+
+_transcribers = {}
+_lock = threading.Lock()
+
+
+def get_transcriber(tool: str):
+    """Return the process-wide transcriber for tool. All of them share models via the model registry."""
+    if tool not in ENGINES:
+        raise ValueError(f"Unknown transcription tool '{tool}'.")
+    with _lock:
+        if tool not in _transcribers:
+            module_name, class_name = ENGINES[tool]
+            _transcribers[tool] = getattr(importlib.import_module(module_name), class_name)()
+        return _transcribers[tool]
+
+
+def speech_audio(audio, sample_rate, block_frames=resample.BLOCK_FRAMES):
+    """
+    Downmix a separated stem (any layout, numpy or torch) to mono and resample it to SPEECH_RATE.
+
+    Memmapped stems are downmixed block by block, so they are never loaded whole.
+    :return: 1-D float32 array at SPEECH_RATE.
+    """
+    audio = audio_writer.as_frames(audio)
+    mono = np.empty(len(audio), dtype=np.float32)
+    for start in range(0, len(audio), block_frames):
+        mono[start:start + block_frames] = audio[start:start + block_frames].mean(axis=1)
+    return resample.resample(mono, sample_rate, SPEECH_RATE)
+
+
+def transcribe_vocals(label: str, song_name: str, trans_tool: str, vocals, trans_path: str, trans_model: str):
+    """
+    Transcribe separated vocals and report the outcome.
+
+    :param label: Name of the calling separator used in messages (e.g. "Demucs").
+    :param vocals: Path of a vocals file, or a 1-D float32 array at SPEECH_RATE (see speech_audio).
+    :return: True if the transcription was written, False otherwise.
+    """
+    try:
+        os.makedirs(os.path.dirname(trans_path) or ".", exist_ok=True)
+        transcriber = get_transcriber(trans_tool)
+        if isinstance(vocals, str):
+            success = transcriber.transcribe(vocals, trans_path, trans_model)
+        else:
+            success = transcriber.transcribe(vocals, trans_path, trans_model, sample_rate=SPEECH_RATE)
+    except cancellation.Cancelled:
+        raise
+    except Exception as e:
+        events.log(label, f"Transcription error: {e}", level="error")
+        success = False
+    if success:
+        events.log(label, f"Transcription completed for {song_name} by '{trans_tool}' using '{trans_model}'.")
+    else:
+        events.log(label, f"Transcription failed for {song_name} by '{trans_tool}' using '{trans_model}'.", level="error")
+    return success
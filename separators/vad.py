@@ -0,0 +1,76 @@
+import numpy as np
+
+FRAME_SECONDS = 0.03
+FLOOR_DB = -45.0  # Frames quieter than this (dBFS) are never voice; separation leakage sits below it
+RANGE_DB = 30.0  # ... nor are frames this far below the loudest frame
+MIN_GAP_SECONDS = 0.5  # Shorter pauses do not split a span
+MIN_SPEECH_SECONDS = 0.2  # Shorter bursts (clicks, breaths) are dropped
+PAD_SECONDS = 0.2  # Kept around each span so word onsets and tails are not cut
+PACK_GAP_SECONDS = 0.3  # Silence left between spans when they are packed together
+
+
+def frame_energy_db(audio, sample_rate, frame_seconds=FRAME_SECONDS):
+    """RMS level in dBFS of consecutive non-overlapping frames of a 1-D signal."""
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0)
+    frames = np.asarray(audio[:count * frame], dtype=np.float32).reshape(count, frame)
+    power = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / frame
+    return 10 * np.log10(power + 1e-12)
+
+
+def voiced_spans(audio, sample_rate, frame_seconds=FRAME_SECONDS, floor_db=FLOOR_DB, range_db=RANGE_DB,
+                 min_gap=MIN_GAP_SECONDS, min_speech=MIN_SPEECH_SECONDS, pad=PAD_SECONDS):
+    """
+    Find the parts of a separated vocal stem that contain voice, by frame energy.
+
+    :param audio: 1-D float array (e.g. 16 kHz mono vocals).
+    :return: (spans, 2) int array of [start, end) sample indices, empty when the stem is silent.
+    """
+    db = frame_energy_db(audio, sample_rate, frame_seconds)
+    if len(db) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    voiced = db > max(floor_db, db.max() - range_db)
+    edges = np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    # Close short pauses, then drop short bursts (both in frames)
+    frame = max(1, int(sample_rate * frame_seconds))
+    keep = starts[1:] - ends[:-1] >= min_gap / frame_seconds
+    starts = np.concatenate([starts[:1], starts[1:][keep]])
+    ends = np.concatenate([ends[:-1][keep], ends[-1:]])
+    long_enough = ends - starts >= min_speech / frame_seconds
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    padding = int(pad * sample_rate)
+    starts = np.maximum(starts * frame - padding, 0)
+    ends = np.minimum(ends * frame + padding, len(audio))
+    return np.stack([starts, ends], axis=1).astype(np.int64)
+
+
+def pack(audio, spans, sample_rate, gap_seconds=PACK_GAP_SECONDS):
+    """
+    Concatenate the voiced spans, separated by short silences, into one signal.
+
+    :return: (packed audio, offsets) where offsets is an (spans, 3) array of
+             (packed start, original start, length) in seconds, for to_original().
+    """
+    gap = np.zeros(int(gap_seconds * sample_rate), dtype=np.float32)
+    pieces, offsets, position = [], [], 0
+    for start, end in spans:
+        pieces.extend([np.asarray(audio[start:end], dtype=np.float32), gap])
+        offsets.append((position / sample_rate, start / sample_rate, (end - start) / sample_rate))
+        position += end - start + len(gap)
+    packed = np.concatenate(pieces[:-1]) if pieces else np.zeros(0, dtype=np.float32)
+    return packed, np.array(offsets, dtype=np.float64).reshape(-1, 3)
+
+
+def to_original(times, offsets):
+    """Map times (seconds) in packed audio back to the original timeline; times in a gap map to the span end."""
+    times = np.asarray(times, dtype=np.float64)
+    index = np.clip(np.searchsorted(offsets[:, 0], times, side="right") - 1, 0, None)
+    packed_start, original_start, length = offsets[index].T
+    return original_start + np.clip(times - packed_start, 0, length)
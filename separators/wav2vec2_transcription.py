@@ -1,57 +1,99 @@
 import os
 import torch
 import librosa
+import numpy as np
 from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+from separators.model_registry import get_registry
+from separators import cancellation, ctc, events, transcription
+
+BATCH_SIZE = 4  # Windows per forward pass
 
 class Wav2Vec2Transcription:
     def __init__(self, model_name="facebook/wav2vec2-base-960h"):
-        self.model_name = model_name
-        self.processor
-        self.model
-        self.load_model()
+        self.model_name = model_name  # Used when transcribe() is not given a model name
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.registry = get_registry()
 
-    def load_model(self):
-        """Load the Wav2Vec2 model and processor."""
+    def load_model(self, model_name: str = None):
+        """Load the Wav2Vec2 processor and model through the shared model registry."""
+        model_name = model_name or self.model_name
+        def loader():
+            processor = Wav2Vec2Processor.from_pretrained(model_name)
+            model = Wav2Vec2ForCTC.from_pretrained(model_name)
+            model.to(self.device)
+            model.eval()
+            return processor, model
         try:
-            self.processor = Wav2Vec2Processor.from_pretrained(self.model_name)
-            self.model = Wav2Vec2ForCTC.from_pretrained(self.model_name)
-            print(f"Wav2Vec2: Model '{self.model_name}' loaded.")
+            return self.registry.get("wav2vec2", model_name, loader)
         except Exception as e:
             raise RuntimeError(f"Failed to load Wav2Vec2 model: {e}. Ensure transformers and torch are installed.")
 
-    def transcribe(self, audio_path: str, output_path: str, model_name: str, verbose: bool = False):
+    def logits(self, audio, processor, model, batch_size=BATCH_SIZE):
+        """
+        CTC logits of a 16 kHz signal of any length.
+
+        The signal is cut into strided overlapping windows (see ctc.plan_windows) that run through
+        the model in batches, so attention cost and memory stay bounded by the window length.
+        :return: (frames, vocabulary) float32 array and the number of input samples per logit frame.
         """
-        Transcribe the audio file using Wav2Vec2 and save to output_path.
+        ratio = getattr(model.config, "inputs_to_logits_ratio", 320)
+        plan = ctc.plan_windows(len(audio), transcription.SPEECH_RATE, ratio=ratio)
+        window_logits = []
+        for first in range(0, len(plan), batch_size):
+            cancellation.check()
+            batch = [audio[start:end] for start, end, _, _ in plan[first:first + batch_size]]
+            inputs = processor(batch, sampling_rate=transcription.SPEECH_RATE, return_tensors="pt", padding=True)
+            with torch.inference_mode():
+                logits = model(inputs.input_values.to(model.device)).logits.float().cpu().numpy()
+            window_logits.extend(logits)
+        return ctc.stitch(window_logits, plan, ratio=ratio), ratio
+
+    def transcribe(self, audio, output_path: str, model_name: str = None, verbose: bool = False, sample_rate=None):
+        """
+        Transcribe audio using Wav2Vec2 and save to output_path, with segment timestamps.
         
-        :param audio_path: Path to the audio file (e.g., vocals.wav).
+        :param audio: Path to the audio file (e.g., vocals.wav), or a float array of samples at sample_rate.
         :param output_path: Path to save the transcription (e.g., transcription.txt).
-        :param model_name: Not used (placeholder).
+        :param model_name: Hugging Face model name (e.g. "facebook/wav2vec2-base-960h"); defaults to the constructor's.
         :param verbose: If True, enable verbose output.
+        :param sample_rate: Rate of an in-memory array, which is downmixed to mono and resampled to 16 kHz.
         :return: True if successful, False otherwise.
         """
         try:
-            if not os.path.exists(audio_path):
-                raise FileNotFoundError(f"Audio file not found: {audio_path}")
+            if sample_rate is None and not os.path.exists(audio):
+                raise FileNotFoundError(f"Audio file not found: {audio}")
             
+            processor, model = self.load_model(model_name)
+
             # Load audio
-            audio, rate = librosa.load(audio_path, sr=16000)  # Wav2Vec2 expects 16kHz
+            if sample_rate is None:
+                audio, rate = librosa.load(audio, sr=16000)  # Wav2Vec2 expects 16kHz
+            else:
+                audio = transcription.speech_audio(audio, sample_rate)
             
-            # Process
-            inputs = self.processor(audio, sampling_rate=16_000, return_tensors="pt", padding=True)
-            with torch.no_grad():
-                logits = self.model(inputs.input_values).logits
+            # Windowed, batched inference; the stitched logits cover the whole song
+            logits, ratio = self.logits(audio, processor, model)
+            if verbose:
+                events.log("Wav2Vec2", f"{len(audio) / transcription.SPEECH_RATE:.1f}s of audio, {len(logits)} logit frames")
             
             # Decode
-            predicted_ids = torch.argmax(logits, dim=-1)
-            transcription = self.processor.batch_decode(predicted_ids)[0]
+            predicted_ids = np.argmax(logits, axis=-1)
+            decoded = processor.decode(predicted_ids, output_word_offsets=True)
+            segments = ctc.segments(decoded.word_offsets, ratio / transcription.SPEECH_RATE)
             
-            # Write to file (basic; timestamps not directly available)
+            # Write to file (same layout as the Whisper transcriptions)
             with open(output_path, "w", encoding="utf-8") as f:
-                f.write(f"Transcription (Wav2Vec2):\n{transcription}\n")
+                f.write(f"Transcription (Wav2Vec2):\n{decoded.text}\n\n")
+                if segments:
+                    f.write("Timestamps:\n")
+                    for seg in segments:
+                        f.write(f"{seg['start']:.2f}s - {seg['end']:.2f}s: {seg['text']}\n")
             
-            print(f"Wav2Vec2: Transcription saved to '{output_path}'.")
+            events.log("Wav2Vec2", f"Transcription saved to '{output_path}'.")
             return True
         
+        except cancellation.Cancelled:
+            raise  # Ends the job as canceled instead of as a failed transcription
         except Exception as e:
-            print(f"Wav2Vec2 transcription error: {e}")
-            return False
\ No newline at end of file
+            events.log("Wav2Vec2", f"Transcription error: {e}", level="error")
+            return False
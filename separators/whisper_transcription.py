@@ -1,56 +1,90 @@
 import os
-import whisper
+import importlib
+from separators.model_registry import get_registry
+from separators import cancellation, events, transcription, vad
 
 class WhisperTranscription:
     def __init__(self):
-       self.loaded_models = {}  # Cache loaded models to avoid reloading
+        self.registry = get_registry()  # Models are shared with every other transcription user
 
     def load_model(self, model_name: str):
-        """Load and cache the Whisper model if not already loaded."""
-        if model_name not in self.loaded_models:
-            try:
-                print(f"Whisper: Loading model '{model_name}'...")
-                self.loaded_models[model_name] = whisper.load_model(model_name)
-                print(f"Whisper: Model '{model_name}' loaded successfully.")
-            except Exception as e:
-                raise ValueError(f"Failed to load Whisper model '{model_name}': {e}")
-        return self.loaded_models[model_name]
+        """Load the Whisper model through the shared model registry if not already loaded."""
+        def loader():
+            import whisper
+            # Whisper reports decoded windows through tqdm; they become progress events
+            events.report_tqdm(importlib.import_module("whisper.transcribe"))
+            return whisper.load_model(model_name)
+        try:
+            return self.registry.get("whisper", model_name, loader)
+        except Exception as e:
+            raise ValueError(f"Failed to load Whisper model '{model_name}': {e}")
 
-    def transcribe(self, audio_path: str, output_path: str, model_name: str = "base", verbose: bool = False):
+    def transcribe(self, audio, output_path: str, model_name: str = "base", verbose: bool = False, sample_rate=None,
+                   use_vad: bool = True):
         """
-        Transcribe the audio file using the specified Whisper model and save to output_path.
+        Transcribe audio using the specified Whisper model and save to output_path.
        
-        :param audio_path: Path to the audio file (e.g., vocals.wav).
+        :param audio: Path to the audio file (e.g., vocals.wav), or a float array of samples at sample_rate.
         :param output_path: Path to save the transcription (e.g., transcription.txt).
         :param model_name: Whisper model name (e.g., "tiny", "base", "small", "medium", "large", "turbo").
         :param verbose: If True, enable verbose output during transcription.
+        :param sample_rate: Rate of an in-memory array, which is downmixed to mono and resampled to 16 kHz.
+        :param use_vad: Only transcribe the voiced spans of the audio (and nothing when it is silent).
         :return: True if successful, False otherwise.
         """
         try:
-            if not os.path.exists(audio_path):
-               raise FileNotFoundError(f"Audio file not found: {audio_path}")
+            if sample_rate is None:
+                if not os.path.exists(audio):
+                    raise FileNotFoundError(f"Audio file not found: {audio}")
+                import whisper
+                audio = whisper.load_audio(audio)  # 16 kHz mono through ffmpeg
+            else:
+                # In-memory samples skip Whisper's ffmpeg decode (and any MP3 artifacts of the written file)
+                audio = transcription.speech_audio(audio, sample_rate)
+            duration = len(audio) / transcription.SPEECH_RATE
+
+            offsets = None
+            if use_vad:
+                # Separated vocals are often mostly silence; the model only sees the voiced spans
+                spans = vad.voiced_spans(audio, transcription.SPEECH_RATE)
+                if len(spans) == 0:
+                    events.log("Whisper", f"No voice in {duration:.1f}s of audio, skipping transcription.")
+                    self._write(output_path, model_name, "", [])
+                    return True
+                audio, offsets = vad.pack(audio, spans, transcription.SPEECH_RATE)
+                events.log("Whisper", f"{len(spans)} voiced span(s), {len(audio) / transcription.SPEECH_RATE:.1f}s "
+                                      f"of {duration:.1f}s")
            
             # Load the model
             model = self.load_model(model_name)
                
             # Perform transcription
-            print(f"Whisper: Transcribing '{audio_path}' with model '{model_name}'...")
-            result = model.transcribe(audio_path, verbose=verbose)
-               
-            # Write the transcription to file
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(f"Transcription (Model: {model_name}):\n{result['text']}\n\n")
-                
-                # Optional: Add timestamps if available
-                if "segments" in result:
-                    f.write("Timestamps:\n")
-                    for seg in result["segments"]:
-                        f.write(f"{seg['start']:.2f}s - {seg['end']:.2f}s: {seg['text']}\n")
-               
-            print(f"Whisper: Transcription saved to '{output_path}'.")
+            events.log("Whisper", f"Transcribing {len(audio) / transcription.SPEECH_RATE:.1f}s of audio with model '{model_name}'...")
+            result = model.transcribe(audio, verbose=verbose)
+            segments = result.get("segments", [])
+            if offsets is not None and segments:
+                # Timestamps refer to the packed spans; map them back to the song's timeline
+                starts = vad.to_original([seg["start"] for seg in segments], offsets)
+                ends = vad.to_original([seg["end"] for seg in segments], offsets)
+                segments = [dict(seg, start=float(start), end=float(end))
+                            for seg, start, end in zip(segments, starts, ends)]
+
+            self._write(output_path, model_name, result["text"], segments)
+            events.log("Whisper", f"Transcription saved to '{output_path}'.")
             return True
            
+        except cancellation.Cancelled:
+            raise  # Ends the job as canceled instead of as a failed transcription
         except Exception as e:
-           print(f"Whisper transcription error: {e}")
+           events.log("Whisper", f"Transcription error: {e}", level="error")
            return False
-   
\ No newline at end of file
+
+    @staticmethod
+    def _write(output_path, model_name, text, segments):
+        """Write the transcription text and its timestamped segments."""
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(f"Transcription (Model: {model_name}):\n{text}\n\n")
+            if segments:
+                f.write("Timestamps:\n")
+                for seg in segments:
+                    f.write(f"{seg['start']:.2f}s - {seg['end']:.2f}s: {seg['text']}\n")